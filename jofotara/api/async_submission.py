@@ -0,0 +1,202 @@
+import asyncio
+import contextvars
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+import frappe
+
+from jofotara.api.client import (
+    circuit_open_result,
+    get_submission_target,
+    invalid_xml_result,
+    post_to_jofotara,
+    submission_target_error_result,
+)
+from jofotara.api.transport import get_session
+from jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox import schedule_retry
+from jofotara.jofotara.doctype.jofotara_submission_ledger.jofotara_submission_ledger import (
+    get_accepted_uuids,
+    record_acceptance,
+)
+from jofotara.utils.circuit_breaker import allow_request, record_result
+from jofotara.utils.invoice_status import mark_submission
+from jofotara.utils.invoice_uuid import get_invoice_uuid
+from jofotara.utils.metrics import record_submission
+from jofotara.utils.rate_limiter import reserve
+from jofotara.xml.generator import BATCH_CHUNK_SIZE, generate_xml_batch
+from jofotara.xml.validator import preflight
+
+# Requests kept in flight per JoFotara client ID
+DEFAULT_CONCURRENCY = 4
+
+# Results written back (and committed) together
+DEFAULT_WRITE_BATCH_SIZE = 50
+
+
+def submit_invoices(names, concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_WRITE_BATCH_SIZE, url=None):
+    """
+    Submit many Sales Invoices concurrently.
+
+    The HTTP requests run on a thread pool with at most ``concurrency``
+    requests in flight per company client ID. Database work - generating XML in
+    bulk and writing results back ``batch_size`` at a time - runs on one
+    further thread that owns the site's connection, so the event loop keeps
+    handing out requests while the next chunk is generated. Invoices already in
+    the submission ledger are skipped; invoices failing pre-flight validation,
+    or whose company cannot be submitted for, are rejected without a request.
+
+    Args:
+        names (Iterable[str]): Sales Invoice names, consumed lazily
+        concurrency (int): Requests in flight per JoFotara client ID
+        batch_size (int): Results written back per commit
+        url (str): Override the endpoint, e.g. to point at a local stand-in server
+
+    Returns:
+        dict: Counts of submitted, retried and rejected invoices, the elapsed
+            seconds and the latency of every request sent
+    """
+    return asyncio.run(_submit_invoices(names, concurrency, batch_size, url))
+
+
+async def _submit_invoices(names, concurrency, batch_size, url):
+    loop = asyncio.get_running_loop()
+    # frappe.local lives in a context variable, the database thread runs in a copy of this one
+    context = contextvars.copy_context()
+    limits = defaultdict(lambda: asyncio.Semaphore(concurrency))
+    # Bounds the XML held in memory while every client ID is saturated
+    pending = asyncio.Semaphore(concurrency * 8)
+    results = []
+    summary = {"submitted": 0, "retried": 0, "rejected": 0, "latencies": []}
+    tasks = set()
+    start = time.monotonic()
+
+    def run_db(fn, *args):
+        return loop.run_in_executor(db_executor, partial(context.run, fn, *args))
+
+    async def add_result(name, company, invoice_uuid, result):
+        results.append((name, company, invoice_uuid, result))
+        if len(results) >= batch_size:
+            batch = results[:]
+            results.clear()
+            await run_db(_write_results, batch, summary)
+
+    async def submit(name, company, invoice_uuid, target, xml):
+        endpoint, config, credentials = target
+        try:
+            async with limits[credentials.client_id]:
+                # Breaker and rate limiter live in Redis, so they are used here on the event loop thread
+                allowed, retry_after = allow_request(endpoint)
+                if allowed:
+                    wait = reserve(credentials.client_id, config.rate_limit, config.rate_burst)
+                    if wait:
+                        await asyncio.sleep(wait)
+                    sent = time.monotonic()
+                    result = await loop.run_in_executor(executor, post_to_jofotara, endpoint, credentials, xml)
+                    latency = time.monotonic() - sent
+                    summary["latencies"].append(latency)
+                    record_result(endpoint, result)
+                    record_submission(company, result, latency)
+                else:
+                    result = circuit_open_result(retry_after)
+                    record_submission(company, result)
+        finally:
+            pending.release()
+
+        await add_result(name, company, invoice_uuid, result)
+
+    with ThreadPoolExecutor(max_workers=concurrency * 8) as executor, ThreadPoolExecutor(max_workers=1) as db_executor:
+        names = iter(names)
+        chunk = list(islice(names, BATCH_CHUNK_SIZE))
+        prepared = run_db(_prepare_chunk, chunk, url)
+        while chunk:
+            invoices = await prepared
+            # Generate the next chunk while this one is sent
+            if chunk := list(islice(names, BATCH_CHUNK_SIZE)):
+                prepared = run_db(_prepare_chunk, chunk, url)
+
+            for name, company, invoice_uuid, target, xml, result in invoices:
+                if result:
+                    await add_result(name, company, invoice_uuid, result)
+                    continue
+
+                await pending.acquire()
+                task = asyncio.create_task(submit(name, company, invoice_uuid, target, xml))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        await run_db(_write_results, results, summary)
+
+    summary["elapsed"] = time.monotonic() - start
+    return summary
+
+
+def _prepare_chunk(names, url):
+    """
+    Generate the XML of a chunk of invoices and resolve where each one is sent.
+
+    Returns:
+        list[tuple]: ``(name, company, invoice_uuid, target, xml, result)``, where
+            ``result`` is set instead of ``target`` for an invoice rejected here
+    """
+    invoices = frappe.get_all(
+        "Sales Invoice", filters={"name": ["in", names]}, fields=["name", "company", "jofotara_uuid"]
+    )
+    accepted = get_accepted_uuids(row.jofotara_uuid for row in invoices)
+
+    # Invoices JoFotara already accepted are skipped; the rest get their UUID
+    # persisted before generation so the result can be recorded in the ledger
+    pending = {}
+    for row in invoices:
+        if row.jofotara_uuid not in accepted:
+            pending[row.name] = (row.company, get_invoice_uuid(row))
+
+    prepared = []
+    for name, xml in generate_xml_batch(name for name in names if name in pending):
+        company, invoice_uuid = pending[name]
+        if errors := preflight(xml):
+            result = invalid_xml_result(errors)
+            record_submission(company, result)
+            prepared.append((name, company, invoice_uuid, None, None, result))
+            continue
+
+        try:
+            config, credentials = get_submission_target(company)
+        except Exception as e:
+            # One misconfigured company must not abort the rest of the run
+            result = submission_target_error_result(e)
+            record_submission(company, result)
+            prepared.append((name, company, invoice_uuid, None, None, result))
+            continue
+
+        endpoint = url or config.endpoint
+        # Sessions read site config, so create them here rather than on a request thread
+        get_session(endpoint)
+        prepared.append((name, company, invoice_uuid, (endpoint, config, credentials), xml, None))
+
+    return prepared
+
+
+def _write_results(results, summary):
+    """Persist and commit a batch of results, then empty the list in place."""
+    for name, company, invoice_uuid, result in results:
+        if result["status"] == "success":
+            record_acceptance(invoice_uuid, name, company, result["response"])
+            mark_submission(name, "Submitted", response=result["response"])
+            summary["submitted"] += 1
+        elif result.get("retryable"):
+            schedule_retry(name, company, result)
+            summary["retried"] += 1
+        else:
+            mark_submission(name, "Rejected", error=result.get("error"))
+            frappe.log_error(f"JoFotara API Error for {name}: {result.get('error')}", "JoFotara Submission Failed")
+            summary["rejected"] += 1
+
+    if results:
+        frappe.db.commit()
+    results.clear()
@@ -0,0 +1,292 @@
+import bisect
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import as_completed
+
+import frappe
+from frappe.utils import now
+
+from jofotara.api.bulk_submission import get_worker_pool
+from jofotara.api.invoice import save_xml_streaming
+from jofotara.utils.filters import get_date_filter
+from jofotara.utils.invoice_status import mark_xml_generated
+from jofotara.utils.xml_store import has_xml, put_xml
+from jofotara.xml.generator import (
+    GENERATOR_VERSION,
+    HEADER_FIELDS,
+    generate_xml_batch,
+    get_streaming_threshold,
+)
+
+# Invoices handed to a worker process at a time; each finished chunk is committed and checkpointed
+DEFAULT_CHUNK_SIZE = 500
+
+# Directory below the site's private folder holding one checkpoint file per backfill
+CHECKPOINT_DIR = "jofotara_backfill"
+
+# Statuses whose XML is what JoFotara accepted, only regenerated on request
+ACCEPTED_STATUSES = ("Submitted", "Accepted")
+
+
+def get_backfill_invoices(company=None, from_date=None, to_date=None, include_submitted=False, modified_after=None):
+    """
+    Names of submitted Sales Invoices whose XML a backfill regenerates.
+
+    Only companies with the integration enabled are included. Invoices JoFotara
+    accepted keep the XML they were accepted with unless ``include_submitted``.
+    ``modified_after`` limits the result to invoices created or submitted since.
+
+    Returns:
+        list[str]: Sales Invoice names, sorted
+    """
+    company_filters = {"enable_jofotara_integration": 1}
+    if company:
+        company_filters["name"] = company
+    companies = frappe.get_all("Company", filters=company_filters, pluck="name")
+    if not companies:
+        return []
+
+    filters = {"docstatus": 1, "company": ["in", companies]}
+    if not include_submitted:
+        filters["jofotara_submission_status"] = ["not in", ACCEPTED_STATUSES]
+    if date_filter := get_date_filter(from_date, to_date):
+        filters["posting_date"] = date_filter
+    if modified_after:
+        filters["modified"] = [">", modified_after]
+
+    # Sorted here rather than by the database, so checkpoint ranges compare the same way on resume
+    return sorted(frappe.get_all("Sales Invoice", filters=filters, pluck="name"))
+
+
+def run_backfill(
+    company=None,
+    from_date=None,
+    to_date=None,
+    include_submitted=False,
+    workers=1,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    restart=False,
+    on_progress=None,
+):
+    """
+    Regenerate the stored XML of past Sales Invoices in parallel worker processes.
+
+    Names are split into chunks of ``chunk_size`` and fanned out to a pool of
+    spawned workers, each with its own database connection. A worker generates
+    its chunk with bulk queries, writes changed documents to the XML store and
+    commits. The name range of every finished chunk and the names that failed
+    in it are then added to a checkpoint file keyed on the arguments and
+    GENERATOR_VERSION, so running the same backfill again after a crash skips
+    what is already done. Failed invoices, and invoices created or submitted
+    since the checkpoint was started, are never skipped.
+
+    Args:
+        company (str): Limit to one Company
+        from_date (str): First posting date, inclusive
+        to_date (str): Last posting date, inclusive
+        include_submitted (bool): Also regenerate invoices JoFotara accepted
+        workers (int): Worker processes
+        chunk_size (int): Invoices handed to a worker at a time
+        restart (bool): Discard the checkpoint of a previous run
+        on_progress (callable): Called with the running summary after each chunk
+
+    Returns:
+        dict: Counts of regenerated, unchanged and failed invoices, the names
+            that failed, the invoices skipped as done by an earlier run, the
+            elapsed seconds and throughput
+    """
+    checkpoint = _Checkpoint(
+        {
+            "company": company,
+            "from_date": from_date,
+            "to_date": to_date,
+            "include_submitted": include_submitted,
+            "generator_version": GENERATOR_VERSION,
+        }
+    )
+    if restart:
+        checkpoint.clear()
+
+    names = get_backfill_invoices(company, from_date, to_date, include_submitted)
+    if checkpoint.ranges:
+        # A name range only covers the invoices that existed when it was finished
+        new = set(get_backfill_invoices(company, from_date, to_date, include_submitted, checkpoint.started))
+        names = [name for name in names if name in new or not checkpoint.is_done(name)]
+    summary = {
+        "total": len(names),
+        "skipped": checkpoint.done_count,
+        "done": 0,
+        "regenerated": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "failed_names": [],
+    }
+    start = time.monotonic()
+
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    with get_worker_pool(workers) as executor:
+        futures = {executor.submit(_regenerate_chunk, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            result = future.result()
+            checkpoint.add(chunk, result["failed_names"])
+            for key in ("regenerated", "unchanged", "failed"):
+                summary[key] += result[key]
+            summary["failed_names"].extend(result["failed_names"])
+            summary["done"] += len(chunk)
+
+            if on_progress:
+                on_progress(summary)
+
+    elapsed = time.monotonic() - start
+    summary["elapsed"] = elapsed
+    summary["throughput"] = summary["done"] / elapsed if elapsed else 0.0
+    return summary
+
+
+def regenerate_invoices(names):
+    """
+    Regenerate and store the XML of a list of Sales Invoices, then commit.
+
+    Documents whose input hash and stored file are unchanged are not written.
+    Invoices above the streaming threshold are generated by save_xml_streaming.
+
+    Args:
+        names (list[str]): Sales Invoice names
+
+    Returns:
+        dict: Counts of regenerated and unchanged invoices
+    """
+    result = {"regenerated": 0, "unchanged": 0}
+    stored = {
+        row.name: row
+        for row in frappe.get_all(
+            "Sales Invoice",
+            filters={"name": ["in", names]},
+            fields=["name", "jofotara_xml_hash", "jofotara_xml_digest"],
+        )
+    }
+
+    large = set(_get_large_invoices(names))
+    for name in large:
+        save_xml_streaming(frappe.db.get_value("Sales Invoice", name, list(HEADER_FIELDS), as_dict=True))
+        result["regenerated"] += 1
+
+    for name, xml, xml_hash in generate_xml_batch((name for name in names if name not in large), with_hash=True):
+        current = stored[name]
+        if current.jofotara_xml_hash == xml_hash and has_xml(current.jofotara_xml_digest):
+            result["unchanged"] += 1
+            continue
+
+        mark_xml_generated(name, put_xml(xml), xml_hash)
+        result["regenerated"] += 1
+
+    frappe.db.commit()
+    return result
+
+
+def _regenerate_chunk(names):
+    """Regenerate a chunk in bulk; if that fails, one invoice at a time so one bad invoice does not hold up the rest."""
+    result = {"regenerated": 0, "unchanged": 0, "failed": 0, "failed_names": []}
+    try:
+        return {**result, **regenerate_invoices(names)}
+    except Exception:
+        frappe.db.rollback()
+
+    for name in names:
+        try:
+            for key, count in regenerate_invoices([name]).items():
+                result[key] += count
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(f"JoFotara backfill failed for {name}", "JoFotara Backfill Error")
+            result["failed"] += 1
+            result["failed_names"].append(name)
+
+    return result
+
+
+def _get_large_invoices(names):
+    return frappe.db.sql_list(
+        """
+        select parent
+        from `tabSales Invoice Item`
+        where parenttype = 'Sales Invoice' and parent in %(names)s
+        group by parent
+        having count(*) > %(threshold)s
+        """,
+        {"names": names, "threshold": get_streaming_threshold()},
+    )
+
+
+class _Checkpoint:
+    """
+    Name ranges of finished chunks, kept in a JSON file under ``private/jofotara_backfill``.
+
+    Names that failed inside a finished range are kept apart and are not done
+    until a later run regenerates them. ``started`` is when the checkpoint was
+    first written; invoices modified after it may fall inside a finished range
+    without having been part of it. The file name is a hash of the backfill
+    arguments, so a run with the same arguments picks up where the last one
+    stopped, and a generator change starts a fresh backfill.
+    """
+
+    def __init__(self, params):
+        key = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        self.path = frappe.get_site_path("private", CHECKPOINT_DIR, f"{key}.json")
+        self.params = params
+        self.ranges, self.failed, self.done_count, self.started = [], set(), 0, now()
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.ranges = sorted(tuple(r) for r in data["ranges"])
+            self.failed = set(data["failed"])
+            self.done_count = data["done"]
+            self.started = data["started"]
+
+    def is_done(self, name):
+        if name in self.failed:
+            return False
+        i = bisect.bisect_right(self.ranges, name, key=lambda r: r[0]) - 1
+        return i >= 0 and name <= self.ranges[i][1]
+
+    def add(self, names, failed_names):
+        """Mark a finished chunk, ``names`` sorted, as done except for ``failed_names``."""
+        bisect.insort(self.ranges, (names[0], names[-1]))
+        # Chunks of retried names overlap earlier ranges, merged so is_done only has to look at one
+        merged = []
+        for first, last in self.ranges:
+            if merged and first <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        self.ranges = merged
+        self.failed.difference_update(names)
+        self.failed.update(failed_names)
+        self.done_count += len(names) - len(failed_names)
+        self._save()
+
+    def clear(self):
+        self.ranges, self.failed, self.done_count, self.started = [], set(), 0, now()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "params": self.params,
+                    "started": self.started,
+                    "ranges": self.ranges,
+                    "failed": sorted(self.failed),
+                    "done": self.done_count,
+                },
+                f,
+            )
+        # Atomic, a crash never leaves a half written checkpoint
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,139 @@
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frappe
+
+from jofotara.api.async_submission import DEFAULT_CONCURRENCY, DEFAULT_WRITE_BATCH_SIZE, submit_invoices
+from jofotara.utils.filters import get_date_filter
+
+# Invoices handed to a worker process at a time; results are committed as each one finishes
+DEFAULT_CHUNK_SIZE = 200
+
+# Statuses an invoice is never picked up again in: accepted, or owned by the outbox retry queue
+SKIP_STATUSES = ("Submitted", "Accepted", "Pending", "Retry")
+
+
+def get_pending_invoices(company=None, from_date=None, to_date=None):
+    """
+    Names of submitted Sales Invoices that were never sent or were rejected.
+
+    Only companies with the integration enabled are included. Submission results
+    are committed batch by batch, so selecting again after an interruption only
+    returns what is left.
+
+    Args:
+        company (str): Limit to one Company
+        from_date (str): First posting date, inclusive
+        to_date (str): Last posting date, inclusive
+
+    Returns:
+        list[str]: Sales Invoice names in posting order
+    """
+    company_filters = {"enable_jofotara_integration": 1}
+    if company:
+        company_filters["name"] = company
+    companies = frappe.get_all("Company", filters=company_filters, pluck="name")
+    if not companies:
+        return []
+
+    filters = {
+        "docstatus": 1,
+        "company": ["in", companies],
+        "jofotara_submission_status": ["not in", SKIP_STATUSES],
+    }
+    if date_filter := get_date_filter(from_date, to_date):
+        filters["posting_date"] = date_filter
+
+    return frappe.get_all("Sales Invoice", filters=filters, pluck="name", order_by="posting_date asc, name asc")
+
+
+def submit_pending(
+    names,
+    workers=1,
+    concurrency=DEFAULT_CONCURRENCY,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    batch_size=DEFAULT_WRITE_BATCH_SIZE,
+    on_progress=None,
+):
+    """
+    Generate and submit Sales Invoices in parallel worker processes.
+
+    Each worker connects to the current site on its own and runs the concurrent
+    submission engine over one chunk of invoices at a time.
+
+    Args:
+        names (list[str]): Sales Invoice names
+        workers (int): Worker processes
+        concurrency (int): Requests in flight per JoFotara client ID in each worker
+        chunk_size (int): Invoices handed to a worker at a time
+        batch_size (int): Results written back per commit
+        on_progress (callable): Called with the running summary after each chunk
+
+    Returns:
+        dict: Counts of submitted, retried and rejected invoices, throughput and latency percentiles
+    """
+    summary = {"total": len(names), "done": 0, "submitted": 0, "retried": 0, "rejected": 0}
+    latencies = []
+    start = time.monotonic()
+
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    with get_worker_pool(workers) as executor:
+        futures = {executor.submit(_submit_chunk, chunk, concurrency, batch_size): len(chunk) for chunk in chunks}
+        for future in as_completed(futures):
+            result = future.result()
+            for key in ("submitted", "retried", "rejected"):
+                summary[key] += result[key]
+            summary["done"] += futures[future]
+            latencies.extend(result["latencies"])
+
+            if on_progress:
+                on_progress(summary)
+
+    elapsed = time.monotonic() - start
+    summary["elapsed"] = elapsed
+    summary["throughput"] = summary["done"] / elapsed if elapsed else 0.0
+    summary["p50"] = get_percentile(latencies, 50)
+    summary["p95"] = get_percentile(latencies, 95)
+    return summary
+
+
+def get_percentile(values, percentile):
+    """
+    Nearest-rank percentile.
+
+    Returns:
+        float: The percentile, or None for no values
+    """
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(math.ceil(percentile / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def get_worker_pool(workers):
+    """Process pool of ``workers`` processes, each with its own connection to the current site."""
+    # Workers are spawned rather than forked so none of them inherits this process' database connection
+    return ProcessPoolExecutor(
+        max_workers=max(workers, 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(frappe.local.site, frappe.local.sites_path),
+    )
+
+
+def init_worker(site, sites_path):
+    """Process pool initializer: give a spawned worker its own connection to the site."""
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+
+
+def _submit_chunk(names, concurrency, batch_size):
+    try:
+        return submit_invoices(names, concurrency=concurrency, batch_size=batch_size)
+    except Exception:
+        frappe.db.rollback()
+        raise
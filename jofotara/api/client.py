@@ -1,7 +1,30 @@
 import frappe
 import requests
-import base64
-from frappe.utils.password import get_decrypted_password
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from jofotara.api.transport import post_invoice
+from jofotara.jofotara.doctype.jofotara_submission_ledger.jofotara_submission_ledger import (
+    get_accepted,
+    record_acceptance,
+)
+from jofotara.utils.circuit_breaker import allow_request, record_result
+from jofotara.utils.company_config import get_company_config
+from jofotara.utils.credentials import get_credentials
+from jofotara.utils.invoice_uuid import get_invoice_uuid
+from jofotara.utils.metrics import record_submission
+from jofotara.utils.rate_limiter import reserve
+from jofotara.utils.timing import span
+from jofotara.xml.payload import BASE64_JSON
+from jofotara.xml.validator import preflight
+
+# Seconds to wait for the JoFotara API before giving up on a submission
+SUBMIT_TIMEOUT = 15
+
+# 4xx responses that mean "try again later" rather than "this invoice is invalid"
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
 
 def send_invoice_to_jofotara(sales_invoice, xml_string):
     """
@@ -9,69 +32,168 @@ def send_invoice_to_jofotara(sales_invoice, xml_string):
 
     Args:
         sales_invoice (Document): The Sales Invoice document
-        xml_string (str): The generated UBL XML string
+        xml_string (str | bytes | file): The generated UBL XML, or a binary file object to stream it from
 
     Returns:
         dict: Response from JoFotara API
     """
-    try:
-        company = frappe.get_doc("Company", sales_invoice.company)
+    name, company_name = sales_invoice.name, sales_invoice.company
 
-        if not company.enable_jofotara_integration:
-            frappe.throw("JoFotara integration is not enabled for this company.")
+    # Never send an invoice twice: a retry after a timeout may find the first attempt already landed
+    with span("ledger", name, company_name):
+        invoice_uuid = get_invoice_uuid(sales_invoice)
+        accepted = get_accepted(invoice_uuid)
+    if accepted is not None:
+        result = {"status": "success", "http_status": None, "response": accepted, "duplicate": True}
+        record_submission(company_name, result)
+        return result
 
-        # Get API config
-        url = company.jofotara_api_url or company.jofotara_api_endpoint or "https://backend.jofotara.gov.jo/core/invoices/"
-        client_id = company.jofotara_client_id
-        
-        # Try to get encrypted secret key first, fallback to regular field
-        secret_key = get_decrypted_password("Company", company.name, "jofotara_secret_key", raise_exception=False)
-        if not secret_key:
-            secret_key = company.get("jofotara_secret_key")
+    # A malformed invoice is rejected here instead of by a round trip to JoFotara
+    with span("validate", name, company_name):
+        errors = preflight(xml_string)
+    if errors:
+        result = invalid_xml_result(errors)
+        record_submission(company_name, result)
+        return result
 
-        if not client_id or not secret_key:
-            frappe.throw("JoFotara Client ID or Secret Key is missing. Please configure them in Company settings.")
+    with span("credentials", name, company_name):
+        company, credentials = get_submission_target(company_name)
+    url = company.endpoint
 
-        # Encode XML as base64
-        xml_bytes = xml_string.encode('utf-8')
-        encoded_invoice = base64.b64encode(xml_bytes).decode('utf-8')
+    # Fail fast while the endpoint is down, the caller hands the invoice to the retry queue
+    allowed, retry_after = allow_request(url)
+    if not allowed:
+        result = circuit_open_result(retry_after)
+        record_submission(company_name, result)
+        return result
 
-        payload = {
-            "invoice": encoded_invoice
-        }
+    # Stay under the upstream limit shared by every worker using this Client ID
+    with span("rate_limit", name, company_name):
+        wait = reserve(credentials.client_id, company.rate_limit, company.rate_burst)
+        if wait:
+            time.sleep(wait)
 
-        headers = {
-            "Client-Id": client_id.strip(),
-            "Secret-Key": secret_key.strip(),
-            "Content-Type": "application/json"
-        }
+    with span("post", name, company_name):
+        sent = time.monotonic()
+        result = post_to_jofotara(url, credentials, xml_string)
+    record_result(url, result)
+    record_submission(company_name, result, time.monotonic() - sent)
 
-        # Debug output
-        print("📤 Sending invoice to JoFotara...")
-        print("URL:", url)
-        print("Headers:", headers)
-        print("Payload (truncated):", encoded_invoice[:100] + "...")  # Show start only
+    with span("record", name, company_name):
+        if result["status"] == "success":
+            # The caller stores the QR code together with the rest of the submitted stage
+            record_acceptance(invoice_uuid, name, company_name, result["response"])
+        else:
+            frappe.log_error(f"JoFotara API Error: {result['error']}", "JoFotara Submission Failed")
 
-        # Send request
-        response = requests.post(url.strip(), json=payload, headers=headers, timeout=15)
-        response.raise_for_status()
+    return result
+
+
+def get_submission_target(company):
+    """
+    Resolve where and with which credentials invoices of a Company are submitted.
 
-        # Optionally, extract and save QR code
-        response_json = response.json()
-        qr_code = response_json.get("EINV_QR")
-        if qr_code:
-            sales_invoice.db_set("jofotara_qr_code", qr_code)
+    Args:
+        company (str): Name of the Company
+
+    Returns:
+        tuple: ``(CompanyConfig, Credentials)``
+    """
+    company = get_company_config(company)
+
+    if not company.enabled:
+        frappe.throw("JoFotara integration is not enabled for this company.")
+
+    return company, get_credentials(company)
+
+
+def post_to_jofotara(url, credentials, xml_string):
+    """
+    POST one invoice to the JoFotara API without touching the database, so it
+    is safe to call from worker threads.
+
+    Args:
+        url (str): Endpoint URL
+        credentials (Credentials): Credentials from ``get_submission_target``
+        xml_string (str | bytes | file): The generated UBL XML, or a binary file object to stream it from
+
+    Returns:
+        dict: Response from JoFotara API
+    """
+    try:
+        # Send request, the XML is base64 encoded into a JSON body by the encoder
+        response = post_invoice(url, xml_string, BASE64_JSON, credentials.headers, timeout=SUBMIT_TIMEOUT)
+        response.raise_for_status()
 
         return {
             "status": "success",
             "http_status": response.status_code,
-            "response": response_json
+            "response": response.json()
         }
 
     except requests.exceptions.RequestException as e:
-        frappe.log_error(f"JoFotara API Error: {str(e)}", "JoFotara Submission Failed")
+        http_status = getattr(e.response, 'status_code', None)
         return {
             "status": "error",
             "error": str(e),
-            "http_status": getattr(e.response, 'status_code', None)
+            "http_status": http_status,
+            # Network errors, throttling and 5xx are worth retrying; other 4xx are validation rejections
+            "retryable": http_status is None or http_status in RETRYABLE_STATUS_CODES or http_status >= 500,
+            "retry_after": get_retry_after(e.response),
         }
+
+
+def circuit_open_result(retry_after):
+    """Result returned instead of a request while the endpoint's circuit breaker is open."""
+    return {
+        "status": "error",
+        "error": "JoFotara endpoint is unavailable, submission deferred by the circuit breaker",
+        "http_status": None,
+        "retryable": True,
+        "retry_after": retry_after,
+        "circuit_open": True,
+    }
+
+
+def invalid_xml_result(errors):
+    """Result returned instead of a request for an invoice that failed pre-flight validation."""
+    return {
+        "status": "error",
+        "error": "JoFotara pre-flight validation failed: " + "; ".join(errors),
+        "http_status": None,
+        "retryable": False,
+        "invalid": True,
+    }
+
+
+def submission_target_error_result(error):
+    """Result returned instead of a request when a Company's endpoint or credentials cannot be resolved."""
+    return {
+        "status": "error",
+        "error": f"JoFotara submission target unavailable: {error}",
+        "http_status": None,
+        "retryable": False,
+    }
+
+
+def get_retry_after(response):
+    """
+    Read the ``Retry-After`` header of a 429/503 response.
+
+    Returns:
+        float: Seconds to wait, or None if the server did not say
+    """
+    if response is None or response.status_code not in (429, 503):
+        return None
+
+    value = (response.headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -1,86 +1,123 @@
-import os
 import uuid
 
 import frappe
 from frappe.model.document import Document
 
 from jofotara.api.client import send_invoice_to_jofotara
-from jofotara.xml.generator import generate_jofotara_invoice_xml as generate_xml
+from jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox import schedule_retry
+from jofotara.utils.invoice_status import mark_submission, mark_xml_generated
+from jofotara.utils.timing import span
+from jofotara.utils.xml_store import has_xml, open_xml, put_xml, put_xml_stream
+from jofotara.xml.generator import generate_xml, generate_xml_with_hash, write_xml_streaming
 
 
 @frappe.whitelist()
 def generate_and_view_xml(doctype, docname):
     """
-    Generate JoFotara XML for viewing and download.
+    Generate indented JoFotara XML for viewing.
+
+    Nothing is stored: the XML store keeps the compact document that is submitted.
     """
     if doctype != "Sales Invoice":
         frappe.throw("Only Sales Invoice is supported")
 
     doc = frappe.get_doc(doctype, docname)
-    xml_content = generate_xml(doc)
-
-    # Save XML as attachment
-    filename = f"{doc.name}_jofotara.xml"
-    filepath = frappe.get_site_path("public", "files", filename)
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(xml_content)
-
-    doc.db_set("jofotara_xml_file", f"/files/{filename}")
-    doc.db_set("jofotara_xml_generated", 1)
-
-    return xml_content
+    return generate_xml(doc, pretty=True)
 
 
 def generate_jofotara_invoice_xml(docname):
     """
     Generate UBL-compliant XML for the given Sales Invoice.
     Uses the improved XML generator and saves the file.
+
+    Returns:
+        str: Digest of the stored XML
     """
     doc = frappe.get_doc("Sales Invoice", docname)
-    xml_content = generate_xml(doc)
+    return save_xml(doc)
 
-    filename = f"{doc.name}_jofotara.xml"
-    filepath = frappe.get_site_path("public", "files", filename)
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(xml_content)
+def save_xml(doc, comment=None):
+    """
+    Generate the XML of a Sales Invoice and save it to the JoFotara XML store.
+
+    The input hash is compared with the one stored on the invoice before
+    rendering. When they match, the stored file is current and nothing is
+    rendered or written; only its existence is checked.
+
+    Returns:
+        str: Digest of the stored XML
+    """
+    digest = doc.get("jofotara_xml_digest")
+    current_hash = doc.get("jofotara_xml_hash") if has_xml(digest) else None
+
+    xml_content, xml_hash = generate_xml_with_hash(doc, current_hash=current_hash)
+    if xml_content is None:
+        return digest
+
+    with span("store", doc, doc.company):
+        digest = put_xml(xml_content)
+        mark_xml_generated(doc, digest, xml_hash, comment)
+    return digest
+
+
+def save_xml_streaming(sales_invoice, comment=None):
+    """
+    Generate the XML of a very large Sales Invoice straight into the XML store.
 
-    doc.db_set("jofotara_xml_file", f"/files/{filename}")
-    return xml_content
+    Memory use does not depend on the number of lines. No input hash is kept,
+    computing it would need every item row at once.
+
+    Args:
+        sales_invoice (dict): Sales Invoice header with HEADER_FIELDS
+
+    Returns:
+        str: Digest of the stored XML
+    """
+    with span("render", sales_invoice.name, sales_invoice.company):
+        digest = put_xml_stream(lambda sink: write_xml_streaming(sales_invoice, sink))
+    mark_xml_generated(sales_invoice.name, digest, "", comment)
+    return digest
 
 
 @frappe.whitelist()
-def submit_to_jofotara(docname):
+def download_xml(docname):
     """
-    Submit Sales Invoice XML to JoFotara and store response.
+    Serve the stored JoFotara XML of a Sales Invoice as a file download.
     """
     doc = frappe.get_doc("Sales Invoice", docname)
+    doc.check_permission("read")
 
-    # Generate XML if not already attached
-    if not doc.jofotara_xml_file:
-        xml = generate_jofotara_invoice_xml(docname)
-    else:
-        xml_path = doc.jofotara_xml_file
+    if not has_xml(doc.get("jofotara_xml_digest")):
+        frappe.throw("No JoFotara XML has been generated for this invoice")
+
+    with open_xml(doc.jofotara_xml_digest) as f:
+        frappe.local.response.filecontent = f.read()
+    frappe.local.response.filename = f"{doc.name}_jofotara.xml"
+    frappe.local.response.type = "download"
 
-        if xml_path.startswith("/private/files/"):
-            full_path = frappe.get_site_path("private", "files", os.path.basename(xml_path))
-        else:
-            full_path = frappe.get_site_path("public", "files", os.path.basename(xml_path))
 
-        with open(full_path, "r", encoding="utf-8") as f:
-            xml = f.read()
+@frappe.whitelist()
+def submit_to_jofotara(docname):
+    """
+    Submit Sales Invoice XML to JoFotara and store response.
+    """
+    doc = frappe.get_doc("Sales Invoice", docname)
+
+    # Generate XML if not already stored, invoices from before the XML store included
+    if not has_xml(doc.get("jofotara_xml_digest")):
+        save_xml(doc)
 
-    # Submit to JoFotara
-    result = send_invoice_to_jofotara(doc, xml)
+    # Submit to JoFotara, the payload is encoded straight from the compressed file
+    with open_xml(doc.jofotara_xml_digest) as xml:
+        result = send_invoice_to_jofotara(doc, xml)
 
     if result["status"] == "success":
-        doc.db_set("jofotara_submission_status", "Submitted")
-        doc.db_set("jofotara_submission_time", frappe.utils.now())
-        doc.db_set("jofotara_submission_response", str(result["response"]))
+        mark_submission(doc, "Submitted", response=result["response"])
+    elif result.get("retryable"):
+        # Network errors, throttling and 5xx are re-driven by the retry scheduler
+        schedule_retry(doc.name, doc.company, result)
     else:
-        doc.db_set("jofotara_submission_status", "Rejected")
-        doc.db_set("jofotara_submission_time", frappe.utils.now())
-        doc.db_set("jofotara_submission_response", result.get("error") or "Unknown error")
+        mark_submission(doc, "Rejected", error=result.get("error"))
 
     return result
@@ -0,0 +1,18 @@
+import frappe
+from werkzeug.wrappers import Response
+
+from jofotara.utils.metrics import render_metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@frappe.whitelist()
+def get_metrics():
+    """
+    Prometheus scrape target for the JoFotara integration.
+
+    Scrape ``/api/method/jofotara.api.metrics.get_metrics`` with the API key of
+    a System Manager. Everything is read from Redis aggregates.
+    """
+    frappe.only_for("System Manager")
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
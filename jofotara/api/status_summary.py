@@ -0,0 +1,25 @@
+import frappe
+
+from jofotara.jofotara.doctype.jofotara_status_summary.jofotara_status_summary import (
+    get_status_summary as _get_status_summary,
+)
+
+
+@frappe.whitelist()
+def get_status_summary(company=None, from_date=None, to_date=None):
+    """
+    Invoice counts per company, posting date and JoFotara status.
+
+    Read from the JoFotara Status Summary, so the cost does not grow with the
+    number of Sales Invoices.
+
+    Args:
+        company (str): Limit to one Company
+        from_date (str): First posting date, inclusive
+        to_date (str): Last posting date, inclusive
+
+    Returns:
+        list[dict]: Rows with company, posting_date, status and invoice_count
+    """
+    frappe.has_permission("JoFotara Status Summary", "read", throw=True)
+    return _get_status_summary(company, from_date, to_date)
@@ -1,10 +1,20 @@
 import frappe
-import requests
 from frappe import _
-from frappe.utils import now
-from frappe.utils.file_manager import get_file
 from frappe.utils.password import get_decrypted_password
 
+from jofotara.api.client import RETRYABLE_STATUS_CODES, get_retry_after
+from jofotara.api.invoice import save_xml
+from jofotara.api.transport import post_invoice
+from jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox import schedule_retry
+from jofotara.jofotara.doctype.jofotara_submission_ledger.jofotara_submission_ledger import (
+    get_accepted,
+    record_acceptance,
+)
+from jofotara.utils.invoice_status import mark_submission
+from jofotara.utils.invoice_uuid import get_invoice_uuid
+from jofotara.utils.xml_store import has_xml, open_xml
+from jofotara.xml.payload import RAW_XML
+
 
 @frappe.whitelist()  # <-- ADD THIS TO MAKE IT CALLABLE FROM JS
 def submit_to_jofotara(docname):
@@ -19,11 +29,15 @@ def submit_to_jofotara(docname):
     """
     doc = frappe.get_doc("Sales Invoice", docname)
 
-    if not doc.jofotara_xml_file:
-        frappe.throw(_("No XML file found to submit."))
+    # Invoices from before the XML store only have the legacy attachment, regenerate theirs
+    if not has_xml(doc.get("jofotara_xml_digest")):
+        save_xml(doc)
 
-    file_doc = frappe.get_doc("File", {"file_url": doc.jofotara_xml_file})
-    file_content = get_file(file_doc.file_url)[1]
+    # Never send an invoice twice, whichever path got it accepted first
+    invoice_uuid = get_invoice_uuid(doc)
+    if get_accepted(invoice_uuid) is not None:
+        frappe.msgprint(_("JoFotara already accepted this invoice, it was not submitted again."))
+        return "success"
 
     company = frappe.get_doc("Company", doc.company)
     endpoint = company.get("jofotara_api_url")
@@ -38,20 +52,41 @@ def submit_to_jofotara(docname):
     }
 
     try:
-        response = requests.post(endpoint, data=file_content, headers=headers, timeout=10)
-
-        doc.db_set("jofotara_submission_status", "Success" if response.status_code == 200 else "Failed")
-        doc.db_set("jofotara_submission_time", now())
-        doc.db_set("jofotara_submission_response", response.text[:2000])  # limit long responses
-
-        frappe.msgprint(_("✅ JoFotara submission complete: Status Code {0}").format(response.status_code))
-
-        return "success" if response.status_code == 200 else f"Error: {response.text[:200]}"
+        with open_xml(doc.jofotara_xml_digest) as xml:
+            response = post_invoice(endpoint, xml, RAW_XML, headers, timeout=10)
 
     except Exception as e:
         error = f"Submission failed: {str(e)}"
-        doc.db_set("jofotara_submission_status", "Error")
-        doc.db_set("jofotara_submission_response", error)
         frappe.log_error(error, "JoFotara Submission Error")
+        # Network errors are re-driven by the retry scheduler
+        schedule_retry(doc.name, doc.company, {"status": "error", "error": error, "retryable": True})
         frappe.msgprint(_("❌ JoFotara submission failed. See error log."))
         return error
+
+    if response.status_code == 200:
+        data = _get_response_json(response)
+        record_acceptance(invoice_uuid, doc.name, doc.company, data)
+        mark_submission(doc, "Submitted", response=data)
+    elif response.status_code in RETRYABLE_STATUS_CODES or response.status_code >= 500:
+        # Throttling and 5xx are re-driven by the retry scheduler
+        schedule_retry(doc.name, doc.company, {
+            "status": "error",
+            "error": response.text[:2000],  # limit long responses
+            "http_status": response.status_code,
+            "retryable": True,
+            "retry_after": get_retry_after(response),
+        })
+    else:
+        mark_submission(doc, "Rejected", error=response.text[:2000])
+
+    frappe.msgprint(_("✅ JoFotara submission complete: Status Code {0}").format(response.status_code))
+
+    return "success" if response.status_code == 200 else f"Error: {response.text[:200]}"
+
+
+def _get_response_json(response):
+    try:
+        data = response.json()
+    except ValueError:
+        data = response.text[:2000]
+    return data if isinstance(data, dict) else {"response": data}
@@ -0,0 +1,87 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import frappe
+import requests
+from frappe.utils import cint
+from requests.adapters import HTTPAdapter
+
+# Connections kept open per endpoint, overridable with `jofotara_http_pool_size` in site config
+DEFAULT_POOL_SIZE = 10
+
+# (pid, scheme://host) -> requests.Session
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(url):
+    """
+    Get the pooled keep-alive session for the host of ``url``.
+
+    Sessions are created once per endpoint and process, so every submission
+    made by a worker reuses the same TCP/TLS connections.
+
+    Args:
+        url (str): Endpoint URL
+
+    Returns:
+        requests.Session: Shared session for the endpoint
+    """
+    parts = urlsplit(url)
+    key = (os.getpid(), f"{parts.scheme}://{parts.netloc}")
+
+    session = _sessions.get(key)
+    if session:
+        return session
+
+    with _lock:
+        session = _sessions.get(key)
+        if not session:
+            session = _sessions[key] = _create_session()
+
+    return session
+
+
+def post_invoice(url, xml, encoder, headers, timeout):
+    """
+    Encode an invoice with ``encoder`` and POST it over the pooled session.
+
+    Args:
+        url (str): Endpoint URL
+        xml (str | bytes | file): The generated UBL XML, or a binary file object to stream it from
+        encoder: Payload encoder such as ``BASE64_JSON`` or ``RAW_XML``
+        headers (dict): Request headers, ``Content-Type`` defaults to the encoder's
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        requests.Response: The HTTP response
+    """
+    if "Content-Type" not in headers:
+        headers = {**headers, "Content-Type": encoder.content_type}
+
+    return get_session(url).post(url, data=encoder.encode(xml), headers=headers, timeout=timeout)
+
+
+def close_sessions():
+    """Close every pooled connection of this process."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _create_session():
+    pool_size = cint(frappe.conf.get("jofotara_http_pool_size")) or DEFAULT_POOL_SIZE
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # Keep-alive is on by default; `jofotara_http_keep_alive: 0` closes connections after each request
+    if not cint(frappe.conf.get("jofotara_http_keep_alive", 1)):
+        session.headers["Connection"] = "close"
+
+    return session
+
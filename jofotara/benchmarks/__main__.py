@@ -0,0 +1,40 @@
+"""
+Run the XML generation benchmarks without a bench or database:
+
+    python -m jofotara.benchmarks
+    python -m jofotara.benchmarks --lines 1,100 --currencies JOD,USD --json results.json
+"""
+
+import argparse
+import json
+
+from jofotara.benchmarks import frappe_shim
+
+frappe_shim.install()
+
+from jofotara.benchmarks.factory import CURRENCIES, LINE_COUNTS
+from jofotara.benchmarks.xml_generation import format_results, run
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m jofotara.benchmarks", description="Benchmark JoFotara XML generation")
+    parser.add_argument("--lines", default=",".join(map(str, LINE_COUNTS)), help="Comma separated item line counts")
+    parser.add_argument("--currencies", default="JOD", help=f"Comma separated currencies, e.g. {','.join(CURRENCIES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage, the fastest is reported")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(
+        line_counts=[int(lines) for lines in args.lines.split(",")],
+        currencies=args.currencies.split(","),
+        repeat=args.repeat,
+    )
+    print(format_results(results))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Synthetic Sales Invoices for the benchmarks.
+
+Invoices are deterministic for a given line count and currency, so numbers
+from different releases are comparable.
+"""
+
+import random
+import uuid
+
+from jofotara.benchmarks.frappe_shim import Document, _dict, add_document
+
+# Line counts benchmarked by default
+LINE_COUNTS = (1, 10, 100, 1000, 10000)
+
+CURRENCIES = ("JOD", "USD", "EUR", "SAR", "AED")
+
+ITEM_NAMES = (
+    "قهوة عربية محمصة",
+    "زيت زيتون بكر ممتاز",
+    "تمر مجدول فاخر",
+    "شاي أخضر",
+    "أرز بسمتي",
+    "خدمات شحن ونقل",
+    "صيانة أجهزة حاسوب",
+    "Office chair",
+    "كتاب \"البرمجة\" & الحوسبة",
+    "استشارات <قانونية>",
+)
+
+COMPANY = "Benchmark Company"
+
+
+def make_company(name=COMPANY):
+    """Register a JoFotara-enabled Company and the benchmark currencies in the shim."""
+    for currency in CURRENCIES:
+        add_document("Currency", _dict(name=currency))
+
+    return add_document("Company", _dict(
+        name=name,
+        company_name=name,
+        tax_id="JO-12345678",
+        jofotara_activity_number="12345678",
+        jofotara_client_id="benchmark-client",
+        enable_jofotara_integration=1,
+    ))
+
+
+def make_invoice(lines, currency="JOD", company=COMPANY):
+    """
+    Build and register a Sales Invoice with ``lines`` item rows.
+
+    Args:
+        lines (int): Number of item rows
+        currency (str): Invoice currency
+        company (str): Company, see make_company
+
+    Returns:
+        Document: The invoice, usable wherever the generator expects a document
+    """
+    rng = random.Random(f"{lines}-{currency}")
+    items = []
+    for idx in range(1, lines + 1):
+        qty = rng.randint(1, 50)
+        rate = round(rng.uniform(0.25, 500), 3)
+        items.append(_dict(
+            idx=idx,
+            item_name=ITEM_NAMES[idx % len(ITEM_NAMES)],
+            qty=qty,
+            rate=rate,
+            amount=round(qty * rate, 3),
+        ))
+
+    return add_document("Sales Invoice", Document(
+        name=f"ACC-SINV-{currency}-{lines:05d}",
+        company=company,
+        posting_date="2025-01-15",
+        currency=currency,
+        customer_name="شركة العميل التجارية",
+        jofotara_uuid=str(uuid.UUID(int=rng.getrandbits(128))),
+        items=items,
+    ))
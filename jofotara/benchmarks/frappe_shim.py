@@ -0,0 +1,182 @@
+"""
+In-memory stand-in for the parts of ``frappe`` the XML generator uses.
+
+It lets the generator run without a bench, a site or a database, so the
+benchmarks measure the generator itself. Documents live in a dict, the cache is
+a dict and every field exists in every DocType. It is not a test double for
+anything else.
+"""
+
+import sys
+import types
+import uuid
+from datetime import date, datetime
+from itertools import islice
+
+# (doctype, name) -> document
+documents = {}
+
+
+class _dict(dict):
+    """Same attribute access as ``frappe._dict``."""
+
+    def __getattr__(self, key):
+        return self.get(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+class Document:
+    """Attribute bag with ``get``, like ``frappe.model.document.Document`` (a dict would shadow ``items``)."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def get(self, key, default=None):
+        return self.__dict__.get(key, default)
+
+
+class DoesNotExistError(Exception):
+    pass
+
+
+class ValidationError(Exception):
+    pass
+
+
+class _Meta:
+    def has_field(self, fieldname):
+        return True
+
+
+class _Cache(dict):
+    def get_value(self, key, generator=None):
+        if key not in self and generator:
+            self[key] = generator()
+        return self.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self[key] = value
+
+    def delete_value(self, key):
+        self.pop(key, None)
+
+    def make_key(self, key):
+        return f"benchmark|{key}"
+
+
+_cache = _Cache()
+
+
+def install():
+    """
+    Register the shim as ``frappe`` and ``frappe.utils`` in ``sys.modules``.
+
+    Must run before any ``jofotara`` module that imports frappe is imported.
+    """
+    frappe = types.ModuleType("frappe")
+    frappe._dict = _dict
+    frappe.local = _dict(site="benchmark")
+    # Metrics would need Redis and are not what is being measured
+    frappe.conf = _dict(jofotara_metrics=0)
+    frappe.DoesNotExistError = DoesNotExistError
+    frappe.ValidationError = ValidationError
+    frappe._ = lambda message: message
+    frappe.cache = lambda: _cache
+    frappe.get_meta = lambda doctype: _Meta()
+    frappe.get_doc = get_doc
+    frappe.get_all = get_all
+    frappe.throw = throw
+    frappe.generate_hash = lambda txt=None, length=10: uuid.uuid4().hex[:length]
+    frappe.whitelist = lambda *args, **kwargs: (args[0] if args and callable(args[0]) else (lambda fn: fn))
+
+    utils = types.ModuleType("frappe.utils")
+    utils.getdate = getdate
+    utils.cint = cint
+    utils.flt = flt
+    frappe.utils = utils
+
+    sys.modules["frappe"] = frappe
+    sys.modules["frappe.utils"] = utils
+    return frappe
+
+
+def add_document(doctype, doc):
+    documents[(doctype, doc.name)] = doc
+    return doc
+
+
+def get_doc(doctype, name=None):
+    if isinstance(doctype, dict):
+        return _dict(doctype)
+    try:
+        return documents[(doctype, name)]
+    except KeyError:
+        throw(f"{doctype} {name} not found", DoesNotExistError)
+
+
+def get_all(doctype, filters=None, fields=None, order_by=None, pluck=None, limit=None, **kwargs):
+    rows = []
+    for (dt, _name), doc in documents.items():
+        if dt == doctype and _matches(doc, filters or {}):
+            rows.append(doc)
+
+    # Child rows are kept on their parent, as ``items`` of a Sales Invoice
+    if doctype == "Sales Invoice Item":
+        filters = dict(filters or {})
+        filters.pop("parenttype", None)
+        parents = {"name": filters.pop("parent")} if "parent" in filters else {}
+        for (dt, name), doc in documents.items():
+            if dt == "Sales Invoice" and _matches(doc, parents):
+                matching = (_dict(item, parent=name) for item in doc.get("items", []) if _matches(item, filters))
+                rows.extend(islice(matching, limit))
+
+    if limit:
+        rows = rows[:limit]
+    if pluck:
+        return [row.get(pluck) for row in rows]
+    return [_dict({field: row.get(field) for field in fields}) if fields else row for row in rows]
+
+
+def throw(message, exc=ValidationError, title=None):
+    raise exc(message)
+
+
+def getdate(value=None):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def cint(value):
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def flt(value, precision=None):
+    try:
+        value = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return round(value, precision) if precision is not None else value
+
+
+def _matches(doc, filters):
+    for field, condition in filters.items():
+        value = doc.get(field)
+        if isinstance(condition, (list, tuple)):
+            operator, operand = condition
+            if operator == "in" and value not in operand:
+                return False
+            if operator == ">" and not value > operand:
+                return False
+        elif value != condition:
+            return False
+    return True
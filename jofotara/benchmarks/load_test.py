@@ -0,0 +1,117 @@
+"""
+Load driver for the real submission path.
+
+Runs ``send_invoice_to_jofotara`` - ledger lookup, circuit breaker, rate
+limiter, pooled HTTP post - at a target request rate against the company's
+configured endpoint, which must be a stand-in such as ``mock_server``. Use a
+staging site: Redis state is real, database writes are rolled back after
+every request. The invoices are synthetic, so the ledger entry of an accepted
+one is written without checking its Sales Invoice link.
+
+    bench --site staging execute jofotara.benchmarks.load_test.run \\
+        --kwargs "{'company': 'Test Company', 'rps': 50, 'duration': 60, 'workers': 16}"
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import partial
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+import frappe
+
+from jofotara.api.bulk_submission import get_percentile
+from jofotara.api.client import send_invoice_to_jofotara
+from jofotara.benchmarks.factory import make_invoice
+from jofotara.jofotara.doctype.jofotara_submission_ledger.jofotara_submission_ledger import record_acceptance
+from jofotara.utils.company_config import get_company_config
+from jofotara.utils.metrics import get_outcome
+from jofotara.xml.generator import render_xml
+
+# Hosts the driver refuses to load
+PRODUCTION_HOSTS = ("backend.jofotara.gov.jo",)
+
+
+def run(company, rps=10, duration=30, workers=8, lines=10):
+    """
+    Submit synthetic invoices at ``rps`` for ``duration`` seconds.
+
+    Requests are scheduled open-loop: a slow endpoint does not lower the offered
+    rate, it shows up as lag (time between a request's slot and a worker being
+    free to send it) once every worker is busy.
+
+    Args:
+        company (str): Company whose endpoint and credentials are used
+        rps (float): Target requests per second
+        duration (float): Seconds to offer load for
+        workers (int): Threads sending requests, each with its own site connection
+        lines (int): Item lines of the synthetic invoice
+
+    Returns:
+        dict: Throughput, latency and lag percentiles in seconds, and outcomes
+            other than accepted by kind, see ``get_outcome``
+    """
+    config = get_company_config(company)
+    if urlsplit(config.endpoint).hostname in PRODUCTION_HOSTS:
+        frappe.throw(f"{company} points at the production JoFotara endpoint, use a stand-in server")
+
+    invoice = make_invoice(lines, company=company)
+    xml = render_xml(invoice, invoice.items, config)
+
+    slots = queue.Queue()
+    samples = []
+    lock = threading.Lock()
+    site, sites_path = frappe.local.site, frappe.local.sites_path
+
+    def work():
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+        try:
+            while (slot := slots.get()) is not None:
+                invoice = frappe._dict(name=f"LOAD-{uuid.uuid4().hex[:10]}", company=company, jofotara_uuid=str(uuid.uuid4()))
+                start = time.monotonic()
+                result = send_invoice_to_jofotara(invoice, xml)
+                latency = time.monotonic() - start
+                # Nothing of a load run is meant to be kept
+                frappe.db.rollback()
+                with lock:
+                    samples.append((latency, start - slot, get_outcome(result)))
+        finally:
+            frappe.destroy()
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    ledger = partial(record_acceptance, ignore_links=True)
+    with patch("jofotara.api.client.record_acceptance", ledger):
+        for thread in threads:
+            thread.start()
+
+        begin = time.monotonic()
+        interval = 1 / rps
+        for i in range(int(rps * duration)):
+            slot = begin + i * interval
+            time.sleep(max(slot - time.monotonic(), 0))
+            slots.put(slot)
+        for _ in threads:
+            slots.put(None)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - begin
+
+    latencies = [latency for latency, _lag, _outcome in samples]
+    lags = [lag for _latency, lag, _outcome in samples]
+    outcomes = Counter(outcome for _latency, _lag, outcome in samples)
+    return {
+        "requests": len(samples),
+        "elapsed": elapsed,
+        "target_rps": rps,
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "accepted": outcomes.pop("accepted", 0),
+        "errors": dict(outcomes),
+        "latency": {f"p{p}": get_percentile(latencies, p) for p in (50, 95, 99)},
+        "max_latency": max(latencies, default=None),
+        "lag": {f"p{p}": get_percentile(lags, p) for p in (50, 95, 99)},
+    }
+
@@ -0,0 +1,150 @@
+"""
+Local stand-in for the JoFotara ``/core/invoices/`` endpoint.
+
+It follows the same contract as the real API: a JSON body ``{"invoice": "<base64
+XML>"}`` with ``Client-Id`` and ``Secret-Key`` headers, answered with a JSON
+result carrying ``EINV_QR``. Latency, the share of failing requests and a per
+Client-Id rate limit (answered with 429 and ``Retry-After``) are configurable,
+so workers can be sized without touching the government endpoint:
+
+    python -m jofotara.benchmarks.mock_server --port 8089 --latency 0.2 --jitter 0.1 --error-rate 0.01 --rate-limit 20
+
+Then point the ``JoFotara API URL`` of a test company at ``http://127.0.0.1:8089/core/invoices/``.
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INVOICE_PATH = "/core/invoices/"
+
+
+class MockJoFotaraServer(ThreadingHTTPServer):
+    """
+    Args:
+        address (tuple): ``(host, port)``, port 0 picks a free one
+        latency (float): Seconds every request takes
+        jitter (float): Up to this many seconds are added at random
+        error_rate (float): Share of requests answered with a 500
+        rate_limit (float): Requests per second allowed per Client-Id, 0 for no limit
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0.0):
+        super().__init__(address, _InvoiceHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.counts = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{INVOICE_PATH}"
+
+    def start(self):
+        """Serve from a daemon thread and return the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, status):
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def take_token(self, client_id):
+        """Token bucket per Client-Id holding one second of requests."""
+        if self.rate_limit <= 0:
+            return True
+
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(client_id, (self.rate_limit, now))
+            tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+            allowed = tokens >= 1
+            self._buckets[client_id] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+
+class _InvoiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        server = self.server
+
+        if self.path.split("?")[0] != INVOICE_PATH:
+            return self._reply(404, {"EINV_STATUS": "NOT_FOUND"})
+
+        client_id = self.headers.get("Client-Id")
+        if not client_id or not self.headers.get("Secret-Key"):
+            return self._reply(401, {"EINV_STATUS": "UNAUTHORIZED", "EINV_RESULTS": "Missing Client-Id or Secret-Key"})
+
+        try:
+            xml = base64.b64decode(json.loads(body)["invoice"], validate=True)
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            return self._reply(400, {"EINV_STATUS": "NOT_SUBMITTED", "EINV_RESULTS": "Invalid invoice payload"})
+
+        if not server.take_token(client_id):
+            return self._reply(429, {"EINV_STATUS": "THROTTLED"}, {"Retry-After": "1"})
+
+        time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        if random.random() < server.error_rate:
+            return self._reply(500, {"EINV_STATUS": "ERROR", "EINV_RESULTS": "Simulated server error"})
+
+        invoice_uuid = str(uuid.uuid4())
+        self._reply(200, {
+            "EINV_STATUS": "SUBMITTED",
+            "EINV_INV_UUID": invoice_uuid,
+            "EINV_NUM": len(xml),
+            "EINV_QR": base64.b64encode(f"QR|{client_id}|{invoice_uuid}".encode()).decode("ascii"),
+        })
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.server.count(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m jofotara.benchmarks.mock_server", description="Local JoFotara stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds every request takes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many seconds are added at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second per Client-Id, 0 for no limit")
+    args = parser.parse_args()
+
+    server = MockJoFotaraServer((args.host, args.port), args.latency, args.jitter, args.error_rate, args.rate_limit)
+    print(f"Mock JoFotara listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Time and peak memory of the XML pipeline per invoice size.
+
+Stages:
+    generate   generate_xml_with_hash: input hash and render
+    serialize  render_xml, the writer on its own encoding straight to UTF-8 bytes
+    base64     the JSON envelope with the base64 encoded XML, as sent to JoFotara
+    validate   the pre-flight business rules, without the UBL schema
+
+Must be imported after ``frappe_shim.install()``, see ``__main__``.
+"""
+
+import time
+import tracemalloc
+
+from jofotara.benchmarks.factory import LINE_COUNTS, make_company, make_invoice
+from jofotara.utils.company_config import get_company_config
+from jofotara.xml.generator import GENERATOR_VERSION, generate_xml_with_hash, render_xml
+from jofotara.xml.payload import BASE64_JSON
+from jofotara.xml.validator import validate_xml
+
+
+def run(line_counts=LINE_COUNTS, currencies=("JOD",), repeat=5):
+    """
+    Benchmark every stage for every invoice size and currency.
+
+    Args:
+        line_counts (Iterable[int]): Item rows per invoice
+        currencies (Iterable[str]): Invoice currencies
+        repeat (int): Timed runs per stage, the fastest one is reported
+
+    Returns:
+        list[dict]: One result per size, currency and stage
+    """
+    make_company()
+    results = []
+
+    for lines in line_counts:
+        for currency in currencies:
+            invoice = make_invoice(lines, currency)
+            company = get_company_config(invoice.company)
+            xml = generate_xml_with_hash(invoice)[0]
+
+            stages = {
+                "generate": lambda: generate_xml_with_hash(invoice),
+                "serialize": lambda: render_xml(invoice, invoice.items, company),
+                "base64": lambda: BASE64_JSON.encode(xml),
+                "validate": lambda: validate_xml(xml),
+            }
+            for stage, fn in stages.items():
+                seconds, peak = measure(fn, repeat)
+                results.append({
+                    "generator_version": GENERATOR_VERSION,
+                    "lines": lines,
+                    "currency": currency,
+                    "stage": stage,
+                    "seconds": seconds,
+                    "peak_bytes": peak,
+                    "xml_bytes": len(xml),
+                })
+
+    return results
+
+
+def measure(fn, repeat=5):
+    """
+    Returns:
+        tuple[float, int]: Fastest of ``repeat`` runs in seconds, and peak traced memory of one run in bytes
+    """
+    timings = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # Traced separately, tracemalloc slows allocation down too much to time under it
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def format_results(results):
+    """Render results as a fixed-width table."""
+    lines = [f"{'lines':>6}  {'currency':<8}  {'stage':<10}  {'time ms':>10}  {'µs/line':>9}  {'peak KiB':>10}  {'XML KiB':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['lines']:>6}  {result['currency']:<8}  {result['stage']:<10}  "
+            f"{result['seconds'] * 1000:>10.3f}  {result['seconds'] * 1e6 / result['lines']:>9.2f}  "
+            f"{result['peak_bytes'] / 1024:>10.1f}  {result['xml_bytes'] / 1024:>9.1f}"
+        )
+    return "\n".join(lines)
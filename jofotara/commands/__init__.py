@@ -35,6 +35,143 @@ def setup_jofotara(context):
     finally:
         frappe.destroy()
 
+@click.command('jofotara-submit-pending')
+@click.option('--company', help='Only submit invoices of this company')
+@click.option('--from-date', help='First posting date (YYYY-MM-DD)')
+@click.option('--to-date', help='Last posting date (YYYY-MM-DD)')
+@click.option('--workers', default=4, type=int, help='Worker processes')
+@click.option('--concurrency', default=4, type=int, help='Requests in flight per worker and JoFotara client ID')
+@click.option('--chunk-size', default=200, type=int, help='Invoices handed to a worker at a time')
+@pass_context
+def submit_pending(context, company=None, from_date=None, to_date=None, workers=4, concurrency=4, chunk_size=200):
+    """Submit unsubmitted and rejected Sales Invoices to JoFotara.
+
+    Results are committed as they come in; after an interruption simply run the
+    command again to continue with the invoices that are left."""
+    from jofotara.api.bulk_submission import get_pending_invoices, submit_pending
+
+    site = context.sites[0]
+    frappe.init(site=site)
+    frappe.connect()
+
+    try:
+        names = get_pending_invoices(company, from_date, to_date)
+        if not names:
+            click.echo("No pending invoices found.")
+            return
+
+        click.echo(f"Submitting {len(names)} invoices with {workers} workers...")
+
+        def on_progress(summary):
+            click.echo(
+                f"{summary['done']}/{summary['total']} done - "
+                f"{summary['submitted']} submitted, {summary['retried']} retried, {summary['rejected']} rejected"
+            )
+
+        result = submit_pending(
+            names, workers=workers, concurrency=concurrency, chunk_size=chunk_size, on_progress=on_progress
+        )
+
+        click.echo(f"\nFinished in {result['elapsed']:.1f}s ({result['throughput']:.1f} invoices/s)")
+        if result['p50'] is not None:
+            click.echo(f"Latency p50: {result['p50'] * 1000:.0f} ms, p95: {result['p95'] * 1000:.0f} ms")
+
+    except KeyboardInterrupt:
+        click.echo("\nInterrupted. Run the command again to resume with the remaining invoices.")
+    finally:
+        frappe.destroy()
+
+@click.command('jofotara-validate')
+@click.option('--company', help='Only validate invoices of this company')
+@click.option('--from-date', help='First posting date (YYYY-MM-DD)')
+@click.option('--to-date', help='Last posting date (YYYY-MM-DD)')
+@pass_context
+def validate_pending(context, company=None, from_date=None, to_date=None):
+    """Check the XML of unsubmitted and rejected Sales Invoices without sending anything."""
+    import time
+
+    from jofotara.api.bulk_submission import get_pending_invoices
+    from jofotara.xml.validator import validate_batch
+
+    site = context.sites[0]
+    frappe.init(site=site)
+    frappe.connect()
+
+    try:
+        names = get_pending_invoices(company, from_date, to_date)
+        if not names:
+            click.echo("No pending invoices found.")
+            return
+
+        start = time.monotonic()
+        checked = invalid = 0
+        for name, errors in validate_batch(names):
+            checked += 1
+            if errors:
+                invalid += 1
+                click.echo(f"{name}:")
+                for error in errors:
+                    click.echo(f"  - {error}")
+
+        elapsed = time.monotonic() - start
+        click.echo(f"\n{checked} invoices checked, {invalid} invalid, in {elapsed:.1f}s ({checked / elapsed:.0f} invoices/s)")
+    finally:
+        frappe.destroy()
+
+@click.command('jofotara-backfill-xml')
+@click.option('--company', help='Only regenerate invoices of this company')
+@click.option('--from-date', help='First posting date (YYYY-MM-DD)')
+@click.option('--to-date', help='Last posting date (YYYY-MM-DD)')
+@click.option('--include-submitted', is_flag=True, help='Also regenerate invoices JoFotara already accepted')
+@click.option('--workers', default=4, type=int, help='Worker processes')
+@click.option('--chunk-size', default=500, type=int, help='Invoices handed to a worker at a time')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an earlier run with the same options')
+@pass_context
+def backfill_xml(
+    context, company=None, from_date=None, to_date=None, include_submitted=False, workers=4, chunk_size=500, restart=False
+):
+    """Regenerate the stored JoFotara XML of past Sales Invoices after a generator change.
+
+    Progress is checkpointed per chunk; after an interruption run the same
+    command again to continue where it stopped."""
+    from jofotara.api.backfill import run_backfill
+
+    site = context.sites[0]
+    frappe.init(site=site)
+    frappe.connect()
+
+    def on_progress(summary):
+        click.echo(
+            f"{summary['done']}/{summary['total']} done - "
+            f"{summary['regenerated']} regenerated, {summary['unchanged']} unchanged, {summary['failed']} failed"
+        )
+
+    try:
+        result = run_backfill(
+            company,
+            from_date,
+            to_date,
+            include_submitted=include_submitted,
+            workers=workers,
+            chunk_size=chunk_size,
+            restart=restart,
+            on_progress=on_progress,
+        )
+
+        if result['skipped']:
+            click.echo(f"Skipped {result['skipped']} invoices finished by an earlier run.")
+        click.echo(f"\nFinished in {result['elapsed']:.1f}s ({result['throughput']:.1f} invoices/s)")
+        if result['failed_names']:
+            click.echo("Failed, see the Error Log: " + ", ".join(result['failed_names']))
+
+    except KeyboardInterrupt:
+        click.echo("\nInterrupted. Run the command again to resume with the remaining invoices.")
+    finally:
+        frappe.destroy()
+
 commands = [
-    setup_jofotara
+    setup_jofotara,
+    submit_pending,
+    validate_pending,
+    backfill_xml
 ]
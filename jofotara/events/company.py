@@ -0,0 +1,13 @@
+from jofotara.utils.company_config import clear_company_config
+from jofotara.utils.credentials import clear_credentials
+
+
+def clear_jofotara_settings_cache(doc, method):
+    """
+    Invalidate the cached JoFotara settings snapshot when a Company changes,
+    and the cached credentials when its client ID or secret key was rotated.
+    """
+    clear_company_config(doc.name)
+
+    if doc.has_value_changed("jofotara_client_id") or doc.has_value_changed("jofotara_secret_key"):
+        clear_credentials(doc.name)
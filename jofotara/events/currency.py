@@ -0,0 +1,9 @@
+from jofotara.xml.validator import clear_currency_codes
+
+
+def clear_currency_codes_cache(doc, method, *args, **kwargs):
+    """
+    Invalidate the currency codes the pre-flight validator accepts when a
+    Currency is added, renamed or deleted.
+    """
+    clear_currency_codes()
@@ -1,78 +1,68 @@
 import frappe
 from frappe import _
 import traceback
-from datetime import datetime
-from jofotara.xml.generator import generate_jofotara_invoice_xml
+from jofotara.api.invoice import save_xml
+from jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox import cancel_invoice, enqueue_invoice
+from jofotara.jofotara.doctype.jofotara_status_summary.jofotara_status_summary import move_invoice
+from jofotara.utils.company_config import get_company_config
+from jofotara.utils.invoice_status import update_jofotara_fields
+from jofotara.utils.invoice_uuid import set_invoice_uuid
+from jofotara.utils.timing import span
+
+
+def assign_jofotara_uuid(doc, method):
+    """
+    Give the Sales Invoice its stable JoFotara UUID as part of submitting it.
+    """
+    set_invoice_uuid(doc)
 
 
 def auto_generate_jofotara_xml(doc, method):
     """
-    Generate and attach JoFotara XML when a Sales Invoice is submitted.
-    Also attempt to submit it to JoFotara API.
+    Queue JoFotara XML generation and submission when a Sales Invoice is submitted.
+
+    Only a JoFotara Outbox row is written here, inside the submit transaction.
+    A background worker generates, attaches and submits the XML after commit.
     """
-    try:
-        print(f"Generating JoFotara XML for Sales Invoice: {doc.name}")
-
-        # Generate the XML
-        xml_content = generate_jofotara_invoice_xml(doc)
-
-        # Save XML as a private file attachment
-        attachment = frappe.get_doc({
-            "doctype": "File",
-            "file_name": f"{doc.name}_jofotara.xml",
-            "attached_to_doctype": "Sales Invoice",
-            "attached_to_name": doc.name,
-            "content": xml_content,
-            "is_private": 1
-        })
-        attachment.insert()
-
-        # Update XML-related custom fields
-        if frappe.get_meta("Sales Invoice").has_field("jofotara_xml_generated"):
-            doc.db_set("jofotara_xml_generated", 1)
-        if frappe.get_meta("Sales Invoice").has_field("jofotara_xml_file"):
-            doc.db_set("jofotara_xml_file", attachment.file_url)
-
-        doc.add_comment("Info", _("JoFotara XML has been generated and attached."))
-
-        # Attempt to submit the XML to the JoFotara API
-        try:
-            company = frappe.get_doc("Company", doc.company)
-            response = submit_to_jofotara_api(xml_content, company)
-
-            if response.get("success"):
-                doc.db_set("jofotara_submission_status", "Success")
-                doc.db_set("jofotara_submission_date", datetime.now())
-                doc.add_comment("Info", _("✅ XML submitted to JoFotara successfully."))
-                frappe.msgprint(_("✅ JoFotara XML successfully submitted."))
-            else:
-                raise Exception(response.get("error") or "Unknown submission error")
-
-        except Exception as api_error:
-            doc.db_set("jofotara_submission_status", "Failed")
-            doc.add_comment("Info", _("❌ XML was not submitted to JoFotara: {0}").format(str(api_error)))
-            frappe.log_error(f"JoFotara submission failed for {doc.name}: {str(api_error)}", "JoFotara Submission Error")
-            frappe.msgprint(_("⚠️ JoFotara XML was generated but submission failed."))
-
-    except Exception as e:
-        error_details = traceback.format_exc()
-        frappe.log_error(f"Error generating XML for {doc.name}:\n{error_details}", "JoFotara XML Generation Error")
-        frappe.msgprint(_("❌ JoFotara XML was not generated. See Error Log for details."))
-        doc.db_set("jofotara_xml_generated", 0)
-        doc.add_comment("Info", _("❌ Failed to generate JoFotara XML."))
+    if not get_company_config(doc.company).enabled:
+        return
+
+    with span("enqueue", doc, doc.company):
+        enqueue_invoice(doc)
+
+
+def remove_from_status_summary(doc, method):
+    """
+    Stop counting a cancelled Sales Invoice in the JoFotara Status Summary.
+    """
+    # The cancel holds the row lock: a status written since the document was loaded is seen,
+    # and status updates still waiting for the lock find the invoice cancelled
+    status = frappe.db.get_value("Sales Invoice", doc.name, "jofotara_submission_status", for_update=True)
+    if status:
+        move_invoice(doc.company, doc.posting_date, status, None)
 
 
-def submit_to_jofotara_api(xml_content, company):
+def close_jofotara_outbox(doc, method):
+    """
+    Keep a cancelled Sales Invoice from being sent by the outbox.
     """
-    Placeholder for sending XML to JoFotara API.
-    Replace this with actual API call logic.
+    cancel_invoice(doc.name)
+
+
+def generate_and_attach_jofotara_xml(doc):
     """
-    print("Sending XML to JoFotara...")
-    # Sample simulation
-    return {
-        "success": True,
-        # "error": "Authentication failed"  # use this to simulate failure
-    }
+    Generate the JoFotara XML of a Sales Invoice and save it to the JoFotara XML store.
+
+    Returns:
+        str: Digest of the stored XML, or None if generation failed
+    """
+    try:
+        return save_xml(doc, comment=_("JoFotara XML has been generated and attached."))
+
+    except Exception:
+        error_details = traceback.format_exc()
+        frappe.log_error(f"Error generating XML for {doc.name}:\n{error_details}", "JoFotara XML Generation Error")
+        update_jofotara_fields(doc, {"jofotara_xml_generated": 0}, comment=_("❌ Failed to generate JoFotara XML."))
 
 
 # Hook-compatible alias
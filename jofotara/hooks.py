@@ -86,6 +86,7 @@ doctype_js = {
 
 before_install = "jofotara.install.before_install"
 after_install = "jofotara.install.after_install"
+after_migrate = "jofotara.install.after_migrate"
 
 # Uninstallation
 # ------------
@@ -141,13 +142,36 @@ after_install = "jofotara.install.after_install"
 
 doc_events = {
 	"Sales Invoice": {
-		"on_submit": "jofotara.events.sales_invoice.auto_generate_jofotara_xml"
+		"before_submit": "jofotara.events.sales_invoice.assign_jofotara_uuid",
+		"on_submit": "jofotara.events.sales_invoice.auto_generate_jofotara_xml",
+		"on_cancel": [
+			"jofotara.events.sales_invoice.remove_from_status_summary",
+			"jofotara.events.sales_invoice.close_jofotara_outbox"
+		]
+	},
+	"Company": {
+		"on_update": "jofotara.events.company.clear_jofotara_settings_cache",
+		"on_trash": "jofotara.events.company.clear_jofotara_settings_cache"
+	},
+	"Currency": {
+		"on_update": "jofotara.events.currency.clear_currency_codes_cache",
+		"after_rename": "jofotara.events.currency.clear_currency_codes_cache",
+		"on_trash": "jofotara.events.currency.clear_currency_codes_cache"
 	}
 }
 
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox.process_outbox",
+			"jofotara.utils.metrics.refresh_outbox_gauges"
+		]
+	}
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"jofotara.tasks.all"
@@ -23,3 +23,12 @@ def after_install():
     except Exception as e:
         frappe.logger().error(f"Error during JoFotara app installation: {cstr(e)}")
         frappe.log_error(f"JoFotara: Installation Error: {cstr(e)}", "JoFotara Installation Error")
+
+def after_migrate():
+    """
+    Create the JoFotara custom fields and indexes added since the app was installed.
+
+    Existing fields are left as they are, so upgraded sites get new fields such as
+    ``jofotara_uuid`` on a plain ``bench migrate``.
+    """
+    setup_jofotara_custom_fields()
@@ -0,0 +1,275 @@
+import random
+import time
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, get_datetime, now_datetime
+
+from jofotara.utils.invoice_status import mark_submission
+from jofotara.utils.timing import span
+
+# Rows claimed per transaction by a worker; each one is re-stamped just before delivery
+CLAIM_BATCH_SIZE = 5
+
+# process_outbox stops claiming after this many seconds and leaves the rest to the
+# next run, well inside the 300s timeout of the queue the scheduler runs it on
+DRAIN_SECONDS = 180
+
+# Rows left "In Flight" longer than this are assumed orphaned by a dead worker
+STALE_CLAIM_MINUTES = 10
+
+# Rows a worker still has to deliver
+OPEN_STATUSES = ("Queued", "In Flight", "Retry")
+
+# Retryable failures are re-driven with exponential backoff until RETRY_DEADLINE_HOURS
+# after the row was queued, overridable with `jofotara_retry_deadline_hours` in site config
+RETRY_DEADLINE_HOURS = 24
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 3600
+
+
+class JoFotaraOutbox(Document):
+    pass
+
+
+def enqueue_invoice(doc):
+    """
+    Append a Sales Invoice to the outbox within the current transaction and wake
+    a worker once that transaction commits.
+    """
+    frappe.get_doc({
+        "doctype": "JoFotara Outbox",
+        "sales_invoice": doc.name,
+        "company": doc.company,
+        "status": "Queued",
+    }).insert(ignore_permissions=True)
+
+    mark_submission(doc, "Pending")
+
+    frappe.enqueue(
+        "jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox.process_outbox",
+        queue="long",
+        enqueue_after_commit=True,
+    )
+
+
+def process_outbox():
+    """
+    Deliver queued invoices and re-drive due retries until nothing is left to
+    claim or DRAIN_SECONDS have passed.
+
+    Runs as a background job after each invoice submission and every minute from
+    the scheduler; any number of workers can run it at once. A backlog larger
+    than one run can deliver is picked up by the next scheduler tick.
+    """
+    deadline = time.monotonic() + DRAIN_SECONDS
+    while time.monotonic() < deadline and (rows := claim_rows()):
+        for row in rows:
+            refresh_claim(row.name)
+            deliver(row)
+
+
+def refresh_claim(name):
+    """
+    Re-stamp a claimed row just before it is delivered, so rows waiting behind
+    slow deliveries of the same batch are never taken for orphaned ones.
+    """
+    frappe.db.set_value("JoFotara Outbox", name, "claimed_at", now_datetime(), update_modified=False)
+    frappe.db.commit()
+
+
+def claim_rows(limit=CLAIM_BATCH_SIZE):
+    """
+    Claim due outbox rows with ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent
+    workers never pick the same row, and mark them "In Flight".
+
+    Returns:
+        list: Claimed rows with ``name``, ``sales_invoice`` and the ``attempts`` made before
+    """
+    claimed_at = now_datetime()
+    rows = frappe.db.sql(
+        """
+        select name, sales_invoice, attempts
+        from `tabJoFotara Outbox`
+        where (status in ('Queued', 'Retry') and (next_attempt_at is null or next_attempt_at <= %(now)s))
+            or (status = 'In Flight' and claimed_at < %(stale)s)
+        order by creation
+        limit %(limit)s
+        for update skip locked
+        """,
+        {
+            "now": claimed_at,
+            "stale": add_to_date(claimed_at, minutes=-STALE_CLAIM_MINUTES),
+            "limit": limit,
+        },
+        as_dict=True,
+    )
+
+    if rows:
+        frappe.db.sql(
+            """
+            update `tabJoFotara Outbox`
+            set status = 'In Flight', claimed_at = %(now)s, attempts = attempts + 1
+            where name in %(names)s
+            """,
+            {"now": claimed_at, "names": tuple(row.name for row in rows)},
+        )
+
+    frappe.db.commit()
+    return rows
+
+
+def deliver(row):
+    """
+    Generate, attach and submit the XML of one claimed outbox row.
+
+    Any exception, from generation included, is treated as retryable: lock
+    waits, deadlocks, a full disk and Redis errors pass, and the retry deadline
+    bounds the rest.
+    """
+    from jofotara.api.client import send_invoice_to_jofotara
+    from jofotara.api.invoice import save_xml, save_xml_streaming
+    from jofotara.jofotara.doctype.jofotara_submission_ledger.jofotara_submission_ledger import get_accepted
+    from jofotara.utils.xml_store import open_xml
+    from jofotara.xml.generator import HEADER_FIELDS, use_streaming
+
+    try:
+        # The invoice may have been cancelled while the row waited
+        if frappe.db.get_value("Sales Invoice", row.sales_invoice, "docstatus") != 1:
+            close_row(row.name, "Sales Invoice is not submitted")
+            frappe.db.commit()
+            return
+
+        # Very large invoices are never loaded as a whole, their lines are streamed into the XML store
+        streaming = use_streaming(row.sales_invoice)
+        with span("load", row.sales_invoice):
+            if streaming:
+                doc = frappe.db.get_value("Sales Invoice", row.sales_invoice, list(HEADER_FIELDS), as_dict=True)
+            else:
+                doc = frappe.get_doc("Sales Invoice", row.sales_invoice)
+
+        accepted = get_accepted(doc.get("jofotara_uuid"))
+        if accepted is not None:
+            # Already accepted through another path, no need to generate or send anything
+            result = {"status": "success", "response": accepted, "duplicate": True}
+        else:
+            if streaming:
+                digest = save_xml_streaming(doc)
+            else:
+                digest = save_xml(doc, comment=_("JoFotara XML has been generated and attached."))
+            with open_xml(digest) as xml:
+                result = send_invoice_to_jofotara(doc, xml)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"JoFotara delivery failed for {row.sales_invoice}", "JoFotara Submission Error")
+        result = {"status": "error", "error": str(e), "retryable": True}
+
+    if result["status"] == "success":
+        mark_submission(row.sales_invoice, "Submitted", response=result["response"])
+        frappe.db.set_value("JoFotara Outbox", row.name, {"status": "Submitted", "last_error": None})
+    elif result.get("circuit_open"):
+        # No request was sent, so the claim does not count as an attempt
+        record_failure(row.name, row.sales_invoice, row.attempts, result)
+    else:
+        record_failure(row.name, row.sales_invoice, row.attempts + 1, result)
+
+    frappe.db.commit()
+
+
+def record_failure(name, sales_invoice, attempts, result):
+    """
+    Schedule another attempt for a retryable failure, or reject the invoice for
+    good once it is a validation error or the next attempt would fall after the
+    retry deadline.
+
+    The deadline is counted from when the row was queued, so an outage of any
+    length up to it is ridden out whatever the number of attempts.
+    """
+    error = result.get("error") or "Unknown error"
+    next_attempt_at = None
+    if result.get("circuit_open"):
+        # Back when the breaker lets a probe through, the backoff is for failed requests
+        next_attempt_at = add_to_date(now_datetime(), seconds=max(result.get("retry_after") or 0, 1))
+    elif result.get("retryable"):
+        next_attempt_at = add_to_date(now_datetime(), seconds=get_retry_delay(attempts, result.get("retry_after")))
+
+    if next_attempt_at and next_attempt_at <= get_retry_deadline(name):
+        status = "Retry"
+    else:
+        status = "Rejected"
+        next_attempt_at = None
+
+    mark_submission(sales_invoice, status, error=error)
+    frappe.db.set_value("JoFotara Outbox", name, {
+        "status": status,
+        "attempts": attempts,
+        "next_attempt_at": next_attempt_at,
+        "last_error": error,
+    })
+
+
+def close_row(name, reason):
+    """Take an outbox row out of delivery without sending its invoice."""
+    frappe.db.set_value("JoFotara Outbox", name, {"status": "Cancelled", "next_attempt_at": None, "last_error": reason})
+
+
+def cancel_invoice(sales_invoice):
+    """
+    Close the open outbox rows of a cancelled Sales Invoice.
+
+    Rows a worker has in flight are left to it, deliver checks the invoice's
+    docstatus before every attempt.
+    """
+    for name in frappe.get_all(
+        "JoFotara Outbox",
+        filters={"sales_invoice": sales_invoice, "status": ["in", ["Queued", "Retry"]]},
+        pluck="name",
+    ):
+        close_row(name, "Sales Invoice was cancelled")
+
+
+def schedule_retry(sales_invoice, company, result):
+    """
+    Hand a failed submission made outside the outbox (e.g. the manual button)
+    over to the retry scheduler, unless the invoice is already queued.
+    """
+    if frappe.db.exists("JoFotara Outbox", {
+        "sales_invoice": sales_invoice,
+        "status": ["in", OPEN_STATUSES],
+    }):
+        return
+
+    outbox = frappe.get_doc({
+        "doctype": "JoFotara Outbox",
+        "sales_invoice": sales_invoice,
+        "company": company,
+        "status": "In Flight",
+    }).insert(ignore_permissions=True)
+    record_failure(outbox.name, sales_invoice, 1, result)
+
+
+def get_retry_deadline(name):
+    """Time after which a retryable failure of an outbox row is rejected for good."""
+    hours = cint(frappe.conf.get("jofotara_retry_deadline_hours")) or RETRY_DEADLINE_HOURS
+    return add_to_date(get_datetime(frappe.db.get_value("JoFotara Outbox", name, "creation")), hours=hours)
+
+
+def get_retry_delay(attempts, retry_after=None):
+    """
+    Exponential backoff with equal jitter, never shorter than the server's
+    ``Retry-After``.
+
+    Half of the backoff is fixed and half random, so attempts still spread out
+    after an outage but never come back almost immediately the way full jitter can.
+
+    Args:
+        attempts (int): Attempts made so far
+        retry_after (float): Seconds the server asked us to wait, if any
+
+    Returns:
+        float: Seconds until the next attempt
+    """
+    backoff = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    delay = backoff / 2 + random.uniform(0, backoff / 2)
+    return max(delay, retry_after or 0, 1)
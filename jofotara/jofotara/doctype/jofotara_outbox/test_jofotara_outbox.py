@@ -0,0 +1,120 @@
+import random
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime, now_datetime
+
+from jofotara.jofotara.doctype.jofotara_outbox.jofotara_outbox import (
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    STALE_CLAIM_MINUTES,
+    cancel_invoice,
+    claim_rows,
+    deliver,
+    get_retry_delay,
+    record_failure,
+)
+
+
+class TestJoFotaraOutbox(FrappeTestCase):
+    def setUp(self):
+        self.names = []
+        # claim_rows and deliver commit, so rows are removed explicitly
+        self.addCleanup(self.delete_rows)
+
+    def delete_rows(self):
+        if self.names:
+            frappe.db.delete("JoFotara Outbox", {"name": ["in", self.names]})
+            frappe.db.commit()
+
+    def make_row(self, status="Queued", sales_invoice=None, **values):
+        row = frappe.get_doc({
+            "doctype": "JoFotara Outbox",
+            "sales_invoice": sales_invoice or f"_Test JoFotara {frappe.generate_hash(length=8)}",
+            "status": status,
+            **values,
+        }).insert(ignore_permissions=True, ignore_links=True)
+        self.names.append(row.name)
+        return row.name
+
+    def get_row(self, name):
+        return frappe.db.get_value("JoFotara Outbox", name, ["status", "attempts", "claimed_at"], as_dict=True)
+
+    def test_claim_takes_due_and_orphaned_rows(self):
+        now = now_datetime()
+        queued = self.make_row("Queued")
+        due = self.make_row("Retry", next_attempt_at=add_to_date(now, minutes=-1), attempts=2)
+        later = self.make_row("Retry", next_attempt_at=add_to_date(now, hours=1), attempts=2)
+        fresh = self.make_row("In Flight", claimed_at=now, attempts=1)
+        stale = self.make_row("In Flight", claimed_at=add_to_date(now, minutes=-STALE_CLAIM_MINUTES - 1), attempts=1)
+        done = self.make_row("Submitted", attempts=1)
+
+        claimed = {row.name: row for row in claim_rows(limit=100)}
+
+        self.assertTrue({queued, due, stale} <= set(claimed))
+        self.assertFalse({later, fresh, done} & set(claimed))
+        # Rows report the attempts made before this claim, the claim itself is counted in the table
+        self.assertEqual(claimed[due].attempts, 2)
+        self.assertEqual(self.get_row(due).attempts, 3)
+        for name in (queued, due, stale):
+            self.assertEqual(self.get_row(name).status, "In Flight")
+        self.assertEqual(self.get_row(later).status, "Retry")
+
+    def test_claimed_rows_are_not_claimed_again(self):
+        queued = self.make_row("Queued")
+        self.assertIn(queued, [row.name for row in claim_rows(limit=100)])
+        self.assertNotIn(queued, [row.name for row in claim_rows(limit=100)])
+
+    def test_unsubmitted_invoice_is_not_delivered(self):
+        # No such Sales Invoice, so its docstatus is not 1
+        sales_invoice = f"_Test JoFotara {frappe.generate_hash(length=8)}"
+        name = self.make_row("In Flight", sales_invoice, attempts=1)
+        deliver(frappe._dict(name=name, sales_invoice=sales_invoice, attempts=0))
+        self.assertEqual(self.get_row(name).status, "Cancelled")
+
+    def test_cancel_invoice_closes_open_rows(self):
+        sales_invoice = f"_Test JoFotara {frappe.generate_hash(length=8)}"
+        queued = self.make_row("Queued", sales_invoice)
+        retry = self.make_row("Retry", sales_invoice)
+        submitted = self.make_row("Submitted", sales_invoice)
+        other = self.make_row("Queued")
+
+        cancel_invoice(sales_invoice)
+
+        self.assertEqual(self.get_row(queued).status, "Cancelled")
+        self.assertEqual(self.get_row(retry).status, "Cancelled")
+        self.assertEqual(self.get_row(submitted).status, "Submitted")
+        self.assertEqual(self.get_row(other).status, "Queued")
+
+    def test_circuit_open_is_not_an_attempt(self):
+        name = self.make_row("In Flight", attempts=3)
+        sales_invoice = frappe.db.get_value("JoFotara Outbox", name, "sales_invoice")
+        result = {"status": "error", "error": "open", "retryable": True, "retry_after": 42, "circuit_open": True}
+
+        before = now_datetime()
+        record_failure(name, sales_invoice, 2, result)
+
+        row = frappe.db.get_value("JoFotara Outbox", name, ["status", "attempts", "next_attempt_at"], as_dict=True)
+        self.assertEqual(row.status, "Retry")
+        # The claim's increment is given back, and the row comes back when the breaker lets a probe through
+        self.assertEqual(row.attempts, 2)
+        self.assertAlmostEqual((get_datetime(row.next_attempt_at) - before).total_seconds(), 42, delta=2)
+
+    def test_retry_delay_uses_equal_jitter(self):
+        random.seed(7)
+        for attempts in range(1, 12):
+            backoff = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+            delays = [get_retry_delay(attempts) for _ in range(200)]
+
+            # Never sooner than half the backoff, never later than all of it
+            self.assertGreaterEqual(min(delays), backoff / 2)
+            self.assertLessEqual(max(delays), backoff)
+            # And actually spread out
+            self.assertGreater(max(delays) - min(delays), backoff / 4)
+
+    def test_retry_delay_is_capped(self):
+        self.assertLessEqual(max(get_retry_delay(50) for _ in range(100)), RETRY_MAX_DELAY)
+
+    def test_retry_delay_honours_retry_after(self):
+        self.assertEqual(get_retry_delay(1, retry_after=RETRY_MAX_DELAY * 2), RETRY_MAX_DELAY * 2)
+        self.assertGreaterEqual(get_retry_delay(1, retry_after=0), RETRY_BASE_DELAY / 2)
@@ -0,0 +1,101 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate, now
+
+from jofotara.utils.filters import get_date_filter
+
+# Every Sales Invoice with a JoFotara submission status is counted once, under its current status
+SUMMARY_KEY = ("company", "posting_date", "status")
+
+
+class JoFotaraStatusSummary(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique("JoFotara Status Summary", list(SUMMARY_KEY), constraint_name="unique_company_date_status")
+
+
+def move_invoice(company, posting_date, old_status, new_status):
+    """
+    Move one invoice between status buckets of its company and posting date.
+
+    Callers run it in the transaction that changes the invoice's status, after
+    reading the status being left with the invoice row locked, so concurrent
+    updates cannot move the same invoice twice. Writes to Sales Invoice that
+    bypass update_jofotara_fields are not seen; rebuild_status_summary
+    repairs the summary after those.
+    """
+    if old_status == new_status:
+        return
+
+    if old_status:
+        _add(company, posting_date, old_status, -1)
+    if new_status:
+        _add(company, posting_date, new_status, 1)
+
+
+def get_status_summary(company=None, from_date=None, to_date=None):
+    """
+    Invoice counts per company, posting date and JoFotara status.
+
+    Args:
+        company (str): Limit to one Company
+        from_date (str): First posting date, inclusive
+        to_date (str): Last posting date, inclusive
+
+    Returns:
+        list[dict]: Rows with company, posting_date, status and invoice_count
+    """
+    filters = {"invoice_count": [">", 0]}
+    if company:
+        filters["company"] = company
+    if date_filter := get_date_filter(from_date, to_date):
+        filters["posting_date"] = date_filter
+
+    return frappe.get_all(
+        "JoFotara Status Summary",
+        filters=filters,
+        fields=["company", "posting_date", "status", "invoice_count"],
+        order_by="posting_date asc, company asc, status asc",
+    )
+
+
+def rebuild_status_summary():
+    """
+    Recount the whole summary from Sales Invoice.
+
+    Only needed once for invoices submitted before the summary existed, or to
+    repair it; this is the one place that scans Sales Invoice.
+    """
+    frappe.db.delete("JoFotara Status Summary")
+    rows = frappe.db.sql(
+        """
+        select company, posting_date, jofotara_submission_status, count(*)
+        from `tabSales Invoice`
+        where docstatus = 1 and ifnull(jofotara_submission_status, '') != ''
+        group by company, posting_date, jofotara_submission_status
+        """
+    )
+    for company, posting_date, status, count in rows:
+        _add(company, posting_date, status, count)
+
+
+def _add(company, posting_date, status, count):
+    timestamp = now()
+    frappe.db.sql(
+        """
+        insert into `tabJoFotara Status Summary`
+            (name, creation, modified, modified_by, owner, company, posting_date, status, invoice_count)
+        values (%(name)s, %(now)s, %(now)s, 'Administrator', 'Administrator', %(company)s, %(posting_date)s, %(status)s, %(count)s)
+        on duplicate key update invoice_count = invoice_count + values(invoice_count), modified = values(modified)
+        """,
+        {
+            "name": frappe.generate_hash(length=10),
+            "now": timestamp,
+            "company": company,
+            "posting_date": getdate(posting_date),
+            "status": status,
+            "count": count,
+        },
+    )
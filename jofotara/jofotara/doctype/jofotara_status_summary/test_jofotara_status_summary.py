@@ -0,0 +1,85 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.jofotara.doctype.jofotara_status_summary.jofotara_status_summary import (
+    get_status_summary,
+    move_invoice,
+    rebuild_status_summary,
+)
+from jofotara.utils.invoice_status import update_jofotara_fields
+
+POSTING_DATE = "2025-01-15"
+
+
+class TestJoFotaraStatusSummary(FrappeTestCase):
+    def setUp(self):
+        # The summary is written with raw SQL, a made up company keeps the buckets of this test apart
+        self.company = f"_Test JoFotara {frappe.generate_hash(length=8)}"
+
+    def get_counts(self, company=None, posting_date=POSTING_DATE):
+        return {
+            row.status: row.invoice_count
+            for row in get_status_summary(company or self.company, posting_date, posting_date)
+        }
+
+    def test_move(self):
+        move_invoice(self.company, POSTING_DATE, None, "Pending")
+        move_invoice(self.company, POSTING_DATE, None, "Pending")
+        self.assertEqual(self.get_counts(), {"Pending": 2})
+
+        move_invoice(self.company, POSTING_DATE, "Pending", "Submitted")
+        self.assertEqual(self.get_counts(), {"Pending": 1, "Submitted": 1})
+
+        move_invoice(self.company, POSTING_DATE, "Submitted", "Submitted")
+        self.assertEqual(self.get_counts(), {"Pending": 1, "Submitted": 1})
+
+        # Emptied buckets are left out
+        move_invoice(self.company, POSTING_DATE, "Pending", None)
+        self.assertEqual(self.get_counts(), {"Submitted": 1})
+
+    def test_rebuild_matches_sales_invoice(self):
+        move_invoice(self.company, POSTING_DATE, None, "Pending")
+        rebuild_status_summary()
+
+        expected = frappe.db.sql(
+            """
+            select company, posting_date, jofotara_submission_status, count(*)
+            from `tabSales Invoice`
+            where docstatus = 1 and ifnull(jofotara_submission_status, '') != ''
+            group by company, posting_date, jofotara_submission_status
+            """
+        )
+        rows = frappe.get_all(
+            "JoFotara Status Summary",
+            filters={"invoice_count": [">", 0]},
+            fields=["company", "posting_date", "status", "invoice_count"],
+        )
+        self.assertEqual(
+            {(row.company, row.posting_date, row.status): row.invoice_count for row in rows},
+            {(company, posting_date, status): count for company, posting_date, status, count in expected},
+        )
+        self.assertEqual(self.get_counts(), {})
+
+    def test_status_update_moves_the_invoice(self):
+        invoice = frappe.db.get_value(
+            "Sales Invoice",
+            {"docstatus": 1},
+            ["name", "company", "posting_date", "jofotara_submission_status"],
+            as_dict=True,
+        )
+        if not invoice:
+            self.skipTest("No submitted Sales Invoice on this site")
+
+        rebuild_status_summary()
+        expected = self.get_counts(invoice.company, invoice.posting_date)
+        expected["_Test Status"] = 1
+        if invoice.jofotara_submission_status:
+            expected[invoice.jofotara_submission_status] -= 1
+        expected = {status: count for status, count in expected.items() if count}
+
+        # A stale copy of the invoice must not decide which bucket is left
+        stale = frappe.get_doc("Sales Invoice", invoice.name)
+        stale.jofotara_submission_status = "_Test Stale Status"
+        update_jofotara_fields(stale, {"jofotara_submission_status": "_Test Status"})
+
+        self.assertEqual(self.get_counts(invoice.company, invoice.posting_date), expected)
@@ -0,0 +1,61 @@
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+
+class JoFotaraSubmissionLedger(Document):
+    pass
+
+
+def get_accepted(invoice_uuid):
+    """
+    Look up an invoice UUID that JoFotara already accepted.
+
+    Returns:
+        dict: The stored API response, or None if the UUID was never accepted
+    """
+    if not invoice_uuid:
+        return None
+
+    response = frappe.db.get_value("JoFotara Submission Ledger", invoice_uuid, "response")
+    if response is None:
+        return None
+    return json.loads(response or "{}")
+
+
+def get_accepted_uuids(invoice_uuids):
+    """
+    Returns:
+        set: The given invoice UUIDs that JoFotara already accepted
+    """
+    invoice_uuids = [invoice_uuid for invoice_uuid in invoice_uuids if invoice_uuid]
+    if not invoice_uuids:
+        return set()
+
+    return set(frappe.get_all(
+        "JoFotara Submission Ledger",
+        filters={"name": ["in", invoice_uuids]},
+        pluck="name",
+    ))
+
+
+def record_acceptance(invoice_uuid, sales_invoice, company, response, ignore_links=False):
+    """
+    Remember that JoFotara accepted ``invoice_uuid`` so no path submits it again.
+
+    ``ignore_links`` skips the Sales Invoice link check, for the load driver's
+    synthetic invoices.
+    """
+    doc = frappe.get_doc({
+        "doctype": "JoFotara Submission Ledger",
+        "invoice_uuid": invoice_uuid,
+        "sales_invoice": sales_invoice,
+        "company": company,
+        "accepted_at": now(),
+        "qr_code": response.get("EINV_QR"),
+        "response": json.dumps(response, default=str),
+    })
+    doc.flags.ignore_links = ignore_links
+    doc.insert(ignore_permissions=True, ignore_if_duplicate=True)
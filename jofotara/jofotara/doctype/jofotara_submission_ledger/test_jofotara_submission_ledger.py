@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.api.client import send_invoice_to_jofotara
+from jofotara.jofotara.doctype.jofotara_submission_ledger.jofotara_submission_ledger import (
+    get_accepted,
+    get_accepted_uuids,
+    record_acceptance,
+)
+
+SALES_INVOICE = "_Test JoFotara Invoice"
+
+
+class TestJoFotaraSubmissionLedger(FrappeTestCase):
+    def record(self, response, invoice_uuid=None):
+        invoice_uuid = invoice_uuid or frappe.generate_hash()
+        record_acceptance(invoice_uuid, SALES_INVOICE, "_Test Company", response, ignore_links=True)
+        return invoice_uuid
+
+    def test_accepted_response_is_kept(self):
+        invoice_uuid = self.record({"EINV_QR": "qr", "EINV_RESULTS": {"status": "PASS"}})
+
+        self.assertEqual(get_accepted(invoice_uuid), {"EINV_QR": "qr", "EINV_RESULTS": {"status": "PASS"}})
+        self.assertEqual(frappe.db.get_value("JoFotara Submission Ledger", invoice_uuid, "qr_code"), "qr")
+
+    def test_unknown_uuid(self):
+        self.assertIsNone(get_accepted(frappe.generate_hash()))
+        self.assertIsNone(get_accepted(None))
+
+    def test_second_acceptance_is_ignored(self):
+        invoice_uuid = self.record({"EINV_QR": "first"})
+        self.record({"EINV_QR": "second"}, invoice_uuid)
+
+        self.assertEqual(frappe.db.count("JoFotara Submission Ledger", {"name": invoice_uuid}), 1)
+        self.assertEqual(get_accepted(invoice_uuid), {"EINV_QR": "first"})
+
+    def test_accepted_uuids(self):
+        accepted = self.record({})
+        unknown = frappe.generate_hash()
+
+        self.assertEqual(get_accepted_uuids([accepted, unknown, None]), {accepted})
+        self.assertEqual(get_accepted_uuids([None, ""]), set())
+
+    def test_accepted_invoice_is_not_sent_again(self):
+        invoice_uuid = self.record({"EINV_QR": "qr"})
+        invoice = frappe._dict(name=SALES_INVOICE, company="_Test Company", jofotara_uuid=invoice_uuid)
+
+        with (
+            patch("jofotara.api.client.record_submission"),
+            patch("jofotara.api.client.post_to_jofotara") as post,
+        ):
+            result = send_invoice_to_jofotara(invoice, "<Invoice/>")
+
+        post.assert_not_called()
+        self.assertEqual(result["status"], "success")
+        self.assertTrue(result["duplicate"])
+        self.assertEqual(result["response"], {"EINV_QR": "qr"})
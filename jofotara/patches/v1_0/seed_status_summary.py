@@ -0,0 +1,6 @@
+from jofotara.jofotara.doctype.jofotara_status_summary.jofotara_status_summary import rebuild_status_summary
+
+
+def execute():
+    # Invoices submitted before the summary existed are only counted by a full recount
+    rebuild_status_summary()
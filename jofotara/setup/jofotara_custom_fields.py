@@ -64,6 +64,24 @@ JOFOTARA_CUSTOM_FIELDS = {
             "insert_after": "jofotara_api_endpoint",
             "default": "0",
             "depends_on": "eval:doc.enable_jofotara_integration"
+        },
+        {
+            "fieldname": "jofotara_rate_limit",
+            "label": "Rate Limit (Requests per Second)",
+            "fieldtype": "Float",
+            "insert_after": "jofotara_is_sandbox",
+            "default": "0",
+            "description": "Maximum submissions per second for this Client ID across all workers. 0 means unlimited.",
+            "depends_on": "eval:doc.enable_jofotara_integration"
+        },
+        {
+            "fieldname": "jofotara_rate_burst",
+            "label": "Rate Limit Burst",
+            "fieldtype": "Int",
+            "insert_after": "jofotara_rate_limit",
+            "default": "1",
+            "description": "Submissions allowed back to back before the rate limit applies.",
+            "depends_on": "eval:doc.enable_jofotara_integration"
         }
     ],
     "Sales Invoice": [
@@ -74,11 +92,20 @@ JOFOTARA_CUSTOM_FIELDS = {
             "insert_after": "against_income_account",
             "collapsible": 1
         },
+        {
+            "fieldname": "jofotara_uuid",
+            "label": "JoFotara UUID",
+            "fieldtype": "Data",
+            "insert_after": "jofotara_section",
+            "read_only": 1,
+            "no_copy": 1,
+            "print_hide": 1
+        },
         {
             "fieldname": "jofotara_xml_generated",
             "label": "JoFotara XML Generated",
             "fieldtype": "Check",
-            "insert_after": "jofotara_section",
+            "insert_after": "jofotara_uuid",
             "read_only": 1,
             "no_copy": 1,
             "print_hide": 1
@@ -92,12 +119,32 @@ JOFOTARA_CUSTOM_FIELDS = {
             "no_copy": 1,
             "print_hide": 1
         },
+        {
+            "fieldname": "jofotara_xml_hash",
+            "label": "JoFotara XML Hash",
+            "fieldtype": "Data",
+            "insert_after": "jofotara_xml_file",
+            "hidden": 1,
+            "read_only": 1,
+            "no_copy": 1,
+            "print_hide": 1
+        },
+        {
+            "fieldname": "jofotara_xml_digest",
+            "label": "JoFotara XML Digest",
+            "fieldtype": "Data",
+            "insert_after": "jofotara_xml_hash",
+            "hidden": 1,
+            "read_only": 1,
+            "no_copy": 1,
+            "print_hide": 1
+        },
         {
             "fieldname": "jofotara_submission_status",
             "label": "JoFotara Submission Status",
             "fieldtype": "Select",
-            "insert_after": "jofotara_xml_file",
-            "options": "\nPending\nSubmitted\nAccepted\nRejected",
+            "insert_after": "jofotara_xml_digest",
+            "options": "\nPending\nRetry\nSubmitted\nAccepted\nRejected",
             "read_only": 1,
             "no_copy": 1,
             "print_hide": 1
@@ -114,6 +161,30 @@ JOFOTARA_CUSTOM_FIELDS = {
     ]
 }
 
+# Composite indexes on JoFotara fields: (index name, columns)
+JOFOTARA_INDEXES = {
+    "Sales Invoice": [
+        # Pending/failed invoices of a company in a date range, e.g. bench jofotara-submit-pending
+        ("jofotara_company_status_date", ["company", "jofotara_submission_status", "posting_date"]),
+        # Recently submitted or failed invoices across companies
+        ("jofotara_status_time", ["jofotara_submission_status", "jofotara_submission_time"]),
+        ("jofotara_uuid", ["jofotara_uuid"]),
+    ]
+}
+
+def setup_jofotara_indexes():
+    """
+    Add the indexes of JOFOTARA_INDEXES, skipping ones that already exist or whose
+    fields are missing.
+    """
+    for doctype, indexes in JOFOTARA_INDEXES.items():
+        columns = set(frappe.db.get_table_columns(doctype))
+        for index_name, fields in indexes:
+            if not columns.issuperset(fields):
+                print(f"Skipped index {index_name}: missing fields")
+                continue
+            frappe.db.add_index(doctype, fields, index_name)
+
 def setup_jofotara_custom_fields():
     """
     Add JoFotara custom fields to the Company DocType.
@@ -131,6 +202,8 @@ def setup_jofotara_custom_fields():
                         print(f"Field {field['fieldname']} already exists")
                     else:
                         print(f"Error creating {field['fieldname']}: {str(e)}")
+
+        setup_jofotara_indexes()
         
         # Commit changes to database
         frappe.db.commit()
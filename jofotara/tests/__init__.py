@@ -0,0 +1,51 @@
+import os
+
+from frappe import _dict
+
+from jofotara.utils.company_config import CompanyConfig
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Output of the minidom based generator before UBLWriter, for the invoice of make_baseline_invoice
+BASELINE_XML_PATH = os.path.join(FIXTURES_DIR, "baseline_invoice.xml")
+
+
+def make_baseline_invoice():
+    """
+    The invoice BASELINE_XML_PATH was generated from, with escaping and Arabic text in every free text field.
+
+    Returns:
+        tuple: ``(invoice, items, CompanyConfig)`` as taken by render_xml
+    """
+    items = [
+        _dict(qty=2.0, rate=12.5, amount=25.0, item_name="قهوة عربية محمصة"),
+        _dict(qty=1.0, rate=7.25, amount=7.25, item_name='كتاب "البرمجة" & الحوسبة'),
+        _dict(qty=3.0, rate=4.0, amount=12.0, item_name="استشارات <قانونية>"),
+    ]
+    invoice = _dict(
+        name="ACC-SINV-2025-00001",
+        company="Test JoFotara Company",
+        posting_date="2025-01-15",
+        currency="JOD",
+        customer_name="شركة العميل & الشركاء",
+        jofotara_uuid="7f1c2d9e-3b4a-4c5d-8e6f-0a1b2c3d4e5f",
+        items=items,
+    )
+    company = CompanyConfig(
+        company="Test JoFotara Company",
+        company_name="Test <JoFotara> Company",
+        tax_id="12345678",
+        activity_number="4567890",
+        endpoint="https://jofotara.invalid/core/invoices/",
+        client_id=None,
+        device_id=None,
+        enabled=True,
+        rate_limit=10.0,
+        rate_burst=10,
+    )
+    return invoice, items, company
+
+
+def read_baseline_xml():
+    with open(BASELINE_XML_PATH, encoding="utf-8") as f:
+        return f.read()
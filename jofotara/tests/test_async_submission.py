@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import Counter
+from unittest.mock import call, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.api import async_submission
+from jofotara.api.async_submission import _write_results, submit_invoices
+from jofotara.tests import make_baseline_invoice
+
+ENDPOINT = "https://jofotara.invalid/core/invoices/"
+
+
+class TestSubmitInvoices(FrappeTestCase):
+    def setUp(self):
+        self.config = make_baseline_invoice()[2]
+        self.written = []
+        self.inflight = Counter()
+        self.max_inflight = Counter()
+        self.lock = threading.Lock()
+
+        for target, kwargs in (
+            ("_prepare_chunk", {"side_effect": self.prepare_chunk}),
+            ("_write_results", {"side_effect": self.write_results}),
+            ("post_to_jofotara", {"side_effect": self.post}),
+            ("allow_request", {"return_value": (True, None)}),
+            ("reserve", {"return_value": 0}),
+            ("record_result", {}),
+            ("record_submission", {}),
+        ):
+            patcher = patch.object(async_submission, target, **kwargs)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def prepare_chunk(self, names, url):
+        # Invoices named "bad-…" fail pre-flight validation, the rest alternate between two client IDs
+        prepared = []
+        for i, name in enumerate(names):
+            if name.startswith("bad-"):
+                prepared.append((name, "A", f"uuid-{name}", None, None, {"status": "error", "invalid": True}))
+            else:
+                target = (url, self.config, frappe._dict(client_id=f"client-{i % 2}"))
+                prepared.append((name, "A", f"uuid-{name}", target, name.encode(), None))
+        return prepared
+
+    def write_results(self, results, summary):
+        self.written.append([name for name, _company, _uuid, _result in results])
+        for *_args, result in results:
+            summary["submitted" if result["status"] == "success" else "rejected"] += 1
+        results.clear()
+
+    def post(self, endpoint, credentials, xml):
+        with self.lock:
+            self.inflight[credentials.client_id] += 1
+            self.max_inflight[credentials.client_id] = max(
+                self.max_inflight[credentials.client_id], self.inflight[credentials.client_id]
+            )
+        time.sleep(0.01)
+        with self.lock:
+            self.inflight[credentials.client_id] -= 1
+        return {"status": "success", "http_status": 200, "response": {"EINV_QR": xml.decode()}}
+
+    def test_every_invoice_is_written_once(self):
+        names = [f"SINV-{i}" for i in range(25)] + ["bad-1"]
+        summary = submit_invoices(names, concurrency=3, batch_size=10, url=ENDPOINT)
+
+        written = [name for batch in self.written for name in batch]
+        self.assertCountEqual(written, names)
+        self.assertTrue(all(len(batch) == 10 for batch in self.written[:-1]))
+        self.assertEqual((summary["submitted"], summary["rejected"]), (25, 1))
+        self.assertEqual(len(summary["latencies"]), 25)
+        self.assertEqual(self.post_to_jofotara.call_count, 25)
+
+    def test_concurrency_per_client_id(self):
+        submit_invoices([f"SINV-{i}" for i in range(40)], concurrency=3, url=ENDPOINT)
+
+        self.assertEqual(set(self.max_inflight), {"client-0", "client-1"})
+        for client_id, count in self.max_inflight.items():
+            self.assertLessEqual(count, 3, client_id)
+
+    def test_open_circuit_sends_nothing(self):
+        self.allow_request.return_value = (False, 30)
+        summary = submit_invoices(["SINV-1", "SINV-2"], url=ENDPOINT)
+
+        self.post_to_jofotara.assert_not_called()
+        self.assertEqual(summary["rejected"], 2)
+        self.assertEqual(summary["latencies"], [])
+
+
+class TestWriteResults(FrappeTestCase):
+    def test_results_are_routed_by_outcome(self):
+        accepted = {"status": "success", "response": {"EINV_QR": "qr"}}
+        retry = {"status": "error", "error": "503", "retryable": True}
+        rejected = {"status": "error", "error": "400", "retryable": False}
+        results = [
+            ("SINV-1", "A", "uuid-1", accepted),
+            ("SINV-2", "A", "uuid-2", retry),
+            ("SINV-3", "A", "uuid-3", rejected),
+        ]
+        summary = {"submitted": 0, "retried": 0, "rejected": 0}
+
+        with (
+            patch.object(async_submission, "record_acceptance") as record_acceptance,
+            patch.object(async_submission, "mark_submission") as mark_submission,
+            patch.object(async_submission, "schedule_retry") as schedule_retry,
+            patch.object(async_submission.frappe, "log_error"),
+            patch.object(async_submission.frappe.db, "commit") as commit,
+        ):
+            _write_results(results, summary)
+
+        record_acceptance.assert_called_once_with("uuid-1", "SINV-1", "A", {"EINV_QR": "qr"})
+        schedule_retry.assert_called_once_with("SINV-2", "A", retry)
+        self.assertEqual(mark_submission.call_args_list, [
+            call("SINV-1", "Submitted", response={"EINV_QR": "qr"}),
+            call("SINV-3", "Rejected", error="400"),
+        ])
+        commit.assert_called_once()
+        self.assertEqual(summary, {"submitted": 1, "retried": 1, "rejected": 1})
+        self.assertEqual(results, [])
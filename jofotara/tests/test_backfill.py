@@ -0,0 +1,65 @@
+import os
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.api.backfill import _Checkpoint
+
+
+class TestBackfillCheckpoint(FrappeTestCase):
+    def setUp(self):
+        # A key of its own, so no checkpoint of a real backfill is touched
+        self.params = {"test": frappe.generate_hash(length=10)}
+        self.checkpoint = _Checkpoint(self.params)
+        self.addCleanup(self.checkpoint.clear)
+
+    def test_finished_range_is_done(self):
+        self.checkpoint.add(["SINV-003", "SINV-004", "SINV-006"], [])
+
+        self.assertTrue(self.checkpoint.is_done("SINV-003"))
+        self.assertTrue(self.checkpoint.is_done("SINV-005"))
+        self.assertTrue(self.checkpoint.is_done("SINV-006"))
+        self.assertFalse(self.checkpoint.is_done("SINV-002"))
+        self.assertFalse(self.checkpoint.is_done("SINV-007"))
+        self.assertEqual(self.checkpoint.done_count, 3)
+
+    def test_failed_names_are_not_done(self):
+        self.checkpoint.add(["SINV-001", "SINV-002", "SINV-003"], ["SINV-002"])
+        self.assertFalse(self.checkpoint.is_done("SINV-002"))
+        self.assertTrue(self.checkpoint.is_done("SINV-003"))
+        self.assertEqual(self.checkpoint.done_count, 2)
+
+        # Retried by a later run
+        self.checkpoint.add(["SINV-002"], [])
+        self.assertTrue(self.checkpoint.is_done("SINV-002"))
+        self.assertEqual(self.checkpoint.done_count, 3)
+
+    def test_overlapping_ranges_are_merged(self):
+        self.checkpoint.add(["SINV-000", "SINV-003"], [])
+        self.checkpoint.add(["SINV-004", "SINV-007"], ["SINV-005"])
+        self.checkpoint.add(["SINV-005", "SINV-0055"], [])
+
+        self.assertEqual(self.checkpoint.ranges, [("SINV-000", "SINV-003"), ("SINV-004", "SINV-007")])
+        for name in ("SINV-005", "SINV-0055", "SINV-006", "SINV-007"):
+            self.assertTrue(self.checkpoint.is_done(name), name)
+
+    def test_resume(self):
+        self.checkpoint.add(["SINV-001", "SINV-002"], ["SINV-001"])
+        self.assertTrue(os.path.exists(self.checkpoint.path))
+
+        resumed = _Checkpoint(self.params)
+        self.assertEqual(resumed.ranges, self.checkpoint.ranges)
+        self.assertEqual(resumed.failed, {"SINV-001"})
+        self.assertEqual(resumed.done_count, 1)
+        self.assertEqual(resumed.started, self.checkpoint.started)
+
+        # Other arguments, other checkpoint
+        self.assertEqual(_Checkpoint({**self.params, "company": "Other"}).ranges, [])
+
+    def test_clear(self):
+        self.checkpoint.add(["SINV-001"], [])
+        self.checkpoint.clear()
+
+        self.assertFalse(os.path.exists(self.checkpoint.path))
+        self.assertFalse(self.checkpoint.is_done("SINV-001"))
+        self.assertEqual(_Checkpoint(self.params).ranges, [])
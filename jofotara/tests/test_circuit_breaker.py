@@ -0,0 +1,93 @@
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.utils.circuit_breaker import (
+    CLOSED,
+    DEFAULT_COOLDOWN,
+    DEFAULT_FAILURE_THRESHOLD,
+    HALF_OPEN,
+    OPEN,
+    PROBE_TIMEOUT,
+    allow_request,
+    get_state,
+    record_result,
+    record_success,
+)
+
+OUTAGE = {"status": "error", "http_status": None}
+SERVER_ERROR = {"status": "error", "http_status": 503}
+REJECTED = {"status": "error", "http_status": 400}
+ACCEPTED = {"status": "success", "http_status": 200}
+
+
+class TestCircuitBreaker(FrappeTestCase):
+    def setUp(self):
+        # An endpoint of its own, so no real breaker state is touched
+        self.endpoint = f"https://jofotara.invalid/{frappe.generate_hash(length=10)}"
+        self.addCleanup(record_success, self.endpoint)
+
+        conf = patch.dict(
+            frappe.conf,
+            {"jofotara_breaker_threshold": DEFAULT_FAILURE_THRESHOLD, "jofotara_breaker_cooldown": DEFAULT_COOLDOWN},
+        )
+        conf.start()
+        self.addCleanup(conf.stop)
+
+    def open_breaker(self):
+        for _ in range(DEFAULT_FAILURE_THRESHOLD):
+            record_result(self.endpoint, OUTAGE)
+
+    def after_cooldown(self):
+        return patch("jofotara.utils.circuit_breaker.time.time", return_value=time.time() + DEFAULT_COOLDOWN + 1)
+
+    def test_opens_after_threshold_failures(self):
+        for _ in range(DEFAULT_FAILURE_THRESHOLD - 1):
+            record_result(self.endpoint, SERVER_ERROR)
+        self.assertEqual(get_state(self.endpoint), CLOSED)
+        self.assertEqual(allow_request(self.endpoint), (True, 0))
+
+        record_result(self.endpoint, OUTAGE)
+        self.assertEqual(get_state(self.endpoint), OPEN)
+        allowed, retry_after = allow_request(self.endpoint)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, DEFAULT_COOLDOWN, delta=2)
+
+    def test_success_and_rejections_reset_the_count(self):
+        for result in (ACCEPTED, REJECTED):
+            for _ in range(DEFAULT_FAILURE_THRESHOLD - 1):
+                record_result(self.endpoint, OUTAGE)
+            # A 4xx proves the endpoint is up just as well as an acceptance
+            record_result(self.endpoint, result)
+            record_result(self.endpoint, OUTAGE)
+            self.assertEqual(get_state(self.endpoint), CLOSED, result)
+
+    def test_one_probe_after_cooldown(self):
+        self.open_breaker()
+
+        with self.after_cooldown():
+            self.assertEqual(get_state(self.endpoint), HALF_OPEN)
+            self.assertEqual(allow_request(self.endpoint), (True, 0))
+            # Every other worker waits for the probe's outcome
+            self.assertEqual(allow_request(self.endpoint), (False, PROBE_TIMEOUT))
+
+    def test_successful_probe_closes(self):
+        self.open_breaker()
+        with self.after_cooldown():
+            allow_request(self.endpoint)
+
+        record_result(self.endpoint, ACCEPTED)
+        self.assertEqual(get_state(self.endpoint), CLOSED)
+        self.assertEqual(allow_request(self.endpoint), (True, 0))
+
+    def test_failed_probe_reopens(self):
+        self.open_breaker()
+        with self.after_cooldown():
+            allow_request(self.endpoint)
+
+        # One failure is enough, the cooldown starts over
+        record_result(self.endpoint, OUTAGE)
+        self.assertEqual(get_state(self.endpoint), OPEN)
+        self.assertFalse(allow_request(self.endpoint)[0])
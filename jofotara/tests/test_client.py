@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from frappe.tests.utils import FrappeTestCase
+from requests.models import Response
+
+from jofotara.api.client import get_retry_after
+
+
+def make_response(status_code, retry_after=None):
+    response = Response()
+    response.status_code = status_code
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+class TestGetRetryAfter(FrappeTestCase):
+    def test_seconds(self):
+        self.assertEqual(get_retry_after(make_response(429, "120")), 120.0)
+        self.assertEqual(get_retry_after(make_response(503, " 5 ")), 5.0)
+
+    def test_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+        seconds = get_retry_after(make_response(503, format_datetime(retry_at, usegmt=True)))
+        self.assertAlmostEqual(seconds, 60, delta=2)
+
+    def test_http_date_in_the_past(self):
+        retry_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        self.assertEqual(get_retry_after(make_response(429, format_datetime(retry_at, usegmt=True))), 0.0)
+
+    def test_not_given(self):
+        self.assertIsNone(get_retry_after(None))
+        self.assertIsNone(get_retry_after(make_response(429)))
+        self.assertIsNone(get_retry_after(make_response(429, "")))
+        self.assertIsNone(get_retry_after(make_response(429, "soon")))
+
+    def test_only_read_for_throttling_and_unavailable(self):
+        self.assertIsNone(get_retry_after(make_response(500, "120")))
+        self.assertIsNone(get_retry_after(make_response(400, "120")))
@@ -0,0 +1,79 @@
+import pickle
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.utils import company_config
+from jofotara.utils.company_config import (
+    DEFAULT_API_URL,
+    VERSION_CACHE_KEY,
+    clear_company_config,
+    get_company_config,
+    get_company_configs,
+)
+
+
+class TestCompanyConfig(FrappeTestCase):
+    def setUp(self):
+        self.company = f"_Test JoFotara {frappe.generate_hash(length=8)}"
+        self.row = frappe._dict(
+            name=self.company,
+            company_name="Test JoFotara Company",
+            jofotara_api_url=" https://jofotara.invalid/core/invoices/ ",
+            enable_jofotara_integration=1,
+            jofotara_rate_limit="2.5",
+        )
+        self.addCleanup(company_config._configs.pop, (frappe.local.site, self.company), None)
+
+        # Company rows are served from memory, counting the queries that reach them
+        self.queries = 0
+        get_all = patch.object(company_config.frappe, "get_all", side_effect=self.get_all)
+        get_fields = patch.object(company_config, "_get_fields", return_value=list(self.row))
+        get_all.start()
+        get_fields.start()
+        self.addCleanup(get_all.stop)
+        self.addCleanup(get_fields.stop)
+
+    def get_all(self, doctype, filters, fields):
+        self.queries += 1
+        return [self.row] if self.company in filters["name"][1] else []
+
+    def test_snapshot(self):
+        config = get_company_config(self.company)
+
+        self.assertEqual(config.endpoint, "https://jofotara.invalid/core/invoices/")
+        self.assertTrue(config.enabled)
+        self.assertEqual(config.rate_limit, 2.5)
+        self.assertEqual(config.rate_burst, 1)
+        self.assertIsNone(config.client_id)
+
+        self.row.jofotara_api_url = None
+        clear_company_config(self.company)
+        self.assertEqual(get_company_config(self.company).endpoint, DEFAULT_API_URL)
+
+    def test_cached_until_cleared(self):
+        config = get_company_config(self.company)
+        self.assertIs(get_company_config(self.company), config)
+        self.assertEqual(self.queries, 1)
+
+        self.row.company_name = "Renamed"
+        clear_company_config(self.company)
+        self.assertEqual(get_company_config(self.company).company_name, "Renamed")
+        self.assertEqual(self.queries, 2)
+
+    def test_bump_by_another_process(self):
+        # Leaves a request-local copy of the version behind, as in a long job that saved a Company
+        clear_company_config(self.company)
+        get_company_config(self.company)
+
+        # Another worker saved a Company: its set_value reached Redis but not this request's copy
+        cache = frappe.cache()
+        cache.set(cache.make_key(VERSION_CACHE_KEY), pickle.dumps(frappe.generate_hash()))
+
+        get_company_config(self.company)
+        self.assertEqual(self.queries, 2)
+
+    def test_missing_company(self):
+        self.assertEqual(get_company_configs(["_Test Missing Company"]), {})
+        self.assertRaises(frappe.DoesNotExistError, get_company_config, "_Test Missing Company")
@@ -0,0 +1,80 @@
+import pickle
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.tests import make_baseline_invoice
+from jofotara.utils import credentials as credentials_module
+from jofotara.utils.credentials import (
+    DEFAULT_CREDENTIALS_TTL,
+    VERSION_CACHE_KEY,
+    clear_credentials,
+    get_credentials,
+)
+
+
+class TestCredentials(FrappeTestCase):
+    def setUp(self):
+        self.company = make_baseline_invoice()[2]._replace(
+            company=f"_Test JoFotara {frappe.generate_hash(length=8)}",
+            client_id=" client ",
+        )
+        self.addCleanup(credentials_module._credentials.pop, (frappe.local.site, self.company.company), None)
+
+        self.secret = " secret "
+        decrypt = patch.object(credentials_module, "get_decrypted_password", side_effect=self.get_secret)
+        self.decrypt = decrypt.start()
+        self.addCleanup(decrypt.stop)
+
+        # Leaves a request-local copy of the version behind, as in a long job that saved a Company
+        clear_credentials(self.company.company)
+
+    def get_secret(self, *args, **kwargs):
+        return self.secret
+
+    def test_headers(self):
+        credentials = get_credentials(self.company)
+
+        self.assertEqual((credentials.client_id, credentials.secret_key), ("client", "secret"))
+        self.assertEqual(credentials.headers["Client-Id"], "client")
+        self.assertEqual(credentials.headers["Secret-Key"], "secret")
+
+    def test_decrypted_once(self):
+        credentials = get_credentials(self.company)
+        self.assertIs(get_credentials(self.company), credentials)
+        self.assertEqual(self.decrypt.call_count, 1)
+
+    def test_cleared(self):
+        get_credentials(self.company)
+        self.secret = "rotated"
+        clear_credentials(self.company.company)
+
+        self.assertEqual(get_credentials(self.company).secret_key, "rotated")
+
+    def test_bump_by_another_process(self):
+        get_credentials(self.company)
+
+        # Another worker saved the secret: its set_value reached Redis but not this request's copy
+        cache = frappe.cache()
+        cache.set(cache.make_key(VERSION_CACHE_KEY), pickle.dumps(frappe.generate_hash()))
+
+        get_credentials(self.company)
+        self.assertEqual(self.decrypt.call_count, 2)
+
+    def test_client_id_change(self):
+        get_credentials(self.company)
+        self.assertEqual(get_credentials(self.company._replace(client_id="other")).client_id, "other")
+        self.assertEqual(self.decrypt.call_count, 2)
+
+    def test_expiry(self):
+        get_credentials(self.company)
+        later = credentials_module.time.monotonic() + DEFAULT_CREDENTIALS_TTL + 1
+        with patch.object(credentials_module.time, "monotonic", return_value=later):
+            get_credentials(self.company)
+        self.assertEqual(self.decrypt.call_count, 2)
+
+    def test_missing_secret(self):
+        self.secret = None
+        with patch.object(credentials_module.frappe.db, "get_value", return_value=None):
+            self.assertRaises(frappe.ValidationError, get_credentials, self.company)
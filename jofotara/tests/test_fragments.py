@@ -0,0 +1,36 @@
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.tests import make_baseline_invoice
+from jofotara.xml.generator import _get_company_fragments, render_xml
+
+
+class TestCompanyFragments(FrappeTestCase):
+    def setUp(self):
+        self.invoice, self.items, self.company = make_baseline_invoice()
+
+    def test_rendered_once_per_config(self):
+        _get_company_fragments.cache_clear()
+        render_xml(self.invoice, self.items, self.company)
+        # An equal snapshot, as a reload without changes produces, hits the cache
+        render_xml(self.invoice, self.items, self.company._replace())
+
+        info = _get_company_fragments.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+
+    def test_pretty_and_compact_are_kept_apart(self):
+        compact = render_xml(self.invoice, self.items, self.company).decode("utf-8")
+        pretty = render_xml(self.invoice, self.items, self.company, pretty=True).decode("utf-8")
+
+        self.assertNotIn("\n", compact)
+        self.assertIn("\n  <cbc:ProfileID>", pretty)
+
+    def test_changed_settings_are_rendered(self):
+        before = render_xml(self.invoice, self.items, self.company).decode("utf-8")
+        changed = self.company._replace(company_name="Renamed & Co", tax_id="87654321")
+        after = render_xml(self.invoice, self.items, changed).decode("utf-8")
+
+        self.assertIn("Test &lt;JoFotara&gt; Company", before)
+        self.assertNotIn("Test &lt;JoFotara&gt; Company", after)
+        self.assertIn("Renamed &amp; Co", after)
+        self.assertIn("<cbc:CompanyID>87654321</cbc:CompanyID>", after)
+        self.assertNotIn("12345678", after)
@@ -0,0 +1,44 @@
+import io
+from unittest.mock import patch
+
+from frappe import _dict
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.tests import make_baseline_invoice
+from jofotara.xml import generator
+from jofotara.xml.generator import render_xml, write_xml_streaming
+
+
+class TestStreamingGeneration(FrappeTestCase):
+    def setUp(self):
+        self.invoice, items, self.company = make_baseline_invoice()
+        # Carriage returns are kept as-is in element text, any newline translation would show
+        self.items = [
+            *items,
+            _dict(qty=1.0, rate=2.0, amount=2.0, item_name="first line\r\nsecond line"),
+            _dict(qty=1.0, rate=3.0, amount=3.0, item_name="old mac\rline"),
+            _dict(qty=1.0, rate=4.0, amount=4.0, item_name="trailing\n"),
+        ]
+
+    def stream(self, pretty):
+        sink = io.StringIO(newline="")
+        with (
+            patch.object(generator, "get_company_config", return_value=self.company),
+            patch.object(generator, "iter_items", return_value=iter(self.items)),
+        ):
+            write_xml_streaming(self.invoice, sink, pretty=pretty)
+        return sink.getvalue()
+
+    def assert_same_as_in_memory(self):
+        for pretty in (False, True):
+            with self.subTest(pretty=pretty):
+                expected = render_xml(self.invoice, self.items, self.company, pretty).decode("utf-8")
+                self.assertIn("first line\r\nsecond line", expected)
+                self.assertEqual(self.stream(pretty), expected)
+
+    def test_streaming_matches_in_memory(self):
+        self.assert_same_as_in_memory()
+
+    def test_streaming_matches_in_memory_once_spooled_to_disk(self):
+        with patch.object(generator, "SPOOL_MAX_SIZE", 1):
+            self.assert_same_as_in_memory()
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.utils import metrics
+from jofotara.utils.metrics import (
+    LATENCY_BUCKETS,
+    METRICS,
+    observe_generation,
+    record_submission,
+    refresh_outbox_gauges,
+    render_metrics,
+)
+
+
+class TestMetrics(FrappeTestCase):
+    def setUp(self):
+        # Counters live in Redis for the whole site, a company of its own keeps the series of this test apart
+        self.company = f'_Test "JoFotara" {frappe.generate_hash(length=8)}'
+        self.label = f'company="{metrics._escape(self.company)}"'
+        conf = patch.dict(frappe.conf, {"jofotara_metrics": 1})
+        conf.start()
+        self.addCleanup(conf.stop)
+
+    def render(self):
+        # No Company has the integration enabled, breaker and limiter gauges stay empty
+        with patch.object(metrics.frappe, "get_all", return_value=[]):
+            return render_metrics().splitlines()
+
+    def test_every_metric_is_declared(self):
+        lines = self.render()
+        for name, (kind, _help) in METRICS.items():
+            self.assertIn(f"# TYPE {name} {kind}", lines)
+
+    def test_submissions(self):
+        record_submission(self.company, {"status": "success", "http_status": 200}, 0.03)
+        record_submission(self.company, {"status": "success", "duplicate": True})
+        record_submission(self.company, {"status": "error", "http_status": 503, "retryable": True}, 2)
+        record_submission(self.company, {"status": "error", "circuit_open": True, "retryable": True})
+
+        lines = self.render()
+        for outcome, count in (("accepted", 1), ("duplicate", 1), ("retry", 1), ("circuit_open", 1)):
+            self.assertIn(f'jofotara_submissions_total{{{self.label},outcome="{outcome}"}} {count}', lines)
+        self.assertNotIn(f'jofotara_submissions_total{{{self.label},outcome="rejected"}} 1', lines)
+
+        # Buckets are cumulative, the +Inf bucket equals the count
+        series = [line for line in lines if line.startswith("jofotara_submission_seconds") and self.label in line]
+        self.assertEqual(len(series), len(LATENCY_BUCKETS) + 3)
+        self.assertIn(f'jofotara_submission_seconds_bucket{{{self.label},le="0.025"}} 0', series)
+        self.assertIn(f'jofotara_submission_seconds_bucket{{{self.label},le="0.05"}} 1', series)
+        self.assertIn(f'jofotara_submission_seconds_bucket{{{self.label},le="2.5"}} 2', series)
+        self.assertIn(f'jofotara_submission_seconds_bucket{{{self.label},le="+Inf"}} 2', series)
+        self.assertIn(f"jofotara_submission_seconds_sum{{{self.label}}} 2.03", series)
+        self.assertIn(f"jofotara_submission_seconds_count{{{self.label}}} 2", series)
+
+    def test_generation(self):
+        observe_generation(self.company, 0.002)
+        self.assertIn(f"jofotara_generation_seconds_count{{{self.label}}} 1", self.render())
+
+    def test_disabled(self):
+        with patch.dict(frappe.conf, {"jofotara_metrics": 0}):
+            record_submission(self.company, {"status": "success"}, 0.1)
+        self.assertFalse([line for line in self.render() if self.label in line])
+
+    def test_gauges_are_replaced(self):
+        def refresh(outbox, invoices):
+            with patch.object(metrics.frappe.db, "sql", side_effect=[outbox, invoices]):
+                refresh_outbox_gauges()
+
+        refresh([(self.company, "Retry", 3)], [(self.company, "Pending", 5), (self.company, "Rejected", 2)])
+        lines = self.render()
+        self.assertIn(f'jofotara_outbox_invoices{{{self.label},status="Retry"}} 3', lines)
+        self.assertIn(f'jofotara_invoices{{{self.label},status="Pending"}} 5', lines)
+        self.assertIn(f'jofotara_invoices{{{self.label},status="Rejected"}} 2', lines)
+
+        refresh([], [(self.company, "Submitted", 7)])
+        lines = [line for line in self.render() if self.label in line]
+        self.assertEqual(lines, [f'jofotara_invoices{{{self.label},status="Submitted"}} 7'])
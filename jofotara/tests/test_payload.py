@@ -0,0 +1,46 @@
+import base64
+import io
+import json
+import random
+
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.xml.payload import BASE64_JSON, RAW_XML, READ_CHUNK_SIZE, _read_chunks
+
+
+class ShortReader(io.BytesIO):
+    """File object returning fewer bytes than asked for, like a gzip file or a socket."""
+
+    def __init__(self, data, seed=0):
+        super().__init__(data)
+        self.rng = random.Random(seed)
+
+    def read(self, size=-1):
+        return super().read(self.rng.randint(1, size) if size and size > 0 else size)
+
+
+class TestPayload(FrappeTestCase):
+    def test_read_chunks_split_on_base64_boundaries(self):
+        data = random.Random(1).randbytes(READ_CHUNK_SIZE * 5 + 7)
+        for f in (io.BytesIO(data), ShortReader(data)):
+            chunks = list(_read_chunks(f))
+            self.assertEqual(b"".join(chunks), data)
+            for chunk in chunks[:-1]:
+                self.assertEqual(len(chunk) % 3, 0)
+                self.assertGreaterEqual(len(chunk), READ_CHUNK_SIZE)
+
+    def test_read_chunks_small_and_empty(self):
+        self.assertEqual(list(_read_chunks(io.BytesIO(b"ab"))), [b"ab"])
+        self.assertEqual(list(_read_chunks(io.BytesIO(b""))), [])
+
+    def test_base64_json_from_file_matches_bytes(self):
+        xml = ('<?xml version="1.0" encoding="UTF-8"?><Invoice>' + "قهوة & شاي" * 20000 + "</Invoice>").encode()
+        body = BASE64_JSON.encode(xml)
+
+        self.assertEqual(BASE64_JSON.encode(ShortReader(xml, seed=2)), body)
+        self.assertEqual(BASE64_JSON.encode(xml.decode("utf-8")), body)
+        self.assertEqual(base64.b64decode(json.loads(body)["invoice"]), xml)
+
+    def test_raw_xml(self):
+        self.assertEqual(RAW_XML.encode("<Invoice>قهوة</Invoice>"), "<Invoice>قهوة</Invoice>".encode())
+        self.assertEqual(RAW_XML.encode(io.BytesIO(b"<Invoice/>")), b"<Invoice/>")
@@ -0,0 +1,40 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.utils.rate_limiter import get_tokens, reserve
+
+
+class TestRateLimiter(FrappeTestCase):
+    def setUp(self):
+        # A bucket of its own, so no real client ID is throttled
+        self.client_id = f"_test-{frappe.generate_hash(length=10)}"
+        cache = frappe.cache()
+        self.addCleanup(cache.delete, cache.make_key(f"jofotara_rate_limit|{self.client_id}"))
+
+    def test_burst_is_free(self):
+        self.assertIsNone(get_tokens(self.client_id))
+        for _ in range(5):
+            self.assertEqual(reserve(self.client_id, 1, 5), 0.0)
+        self.assertAlmostEqual(get_tokens(self.client_id), 0, delta=0.01)
+
+    def test_callers_over_the_burst_are_queued(self):
+        rate, burst = 2, 3
+        for _ in range(burst):
+            reserve(self.client_id, rate, burst)
+
+        # Each further caller waits one refill interval longer than the one before
+        waits = [reserve(self.client_id, rate, burst) for _ in range(4)]
+        for i, wait in enumerate(waits, 1):
+            self.assertAlmostEqual(wait, i / rate, delta=0.05)
+        self.assertAlmostEqual(get_tokens(self.client_id), -4, delta=0.1)
+
+    def test_bucket_expires_once_full_again(self):
+        reserve(self.client_id, 10, 2)
+        cache = frappe.cache()
+        ttl = cache.ttl(cache.make_key(f"jofotara_rate_limit|{self.client_id}"))
+        # One token short, refilled in 0.1s, rounded up plus a second
+        self.assertTrue(0 < ttl <= 2, ttl)
+
+    def test_disabled(self):
+        self.assertEqual(reserve(self.client_id, 0, 5), 0.0)
+        self.assertIsNone(get_tokens(self.client_id))
@@ -0,0 +1,149 @@
+import io
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.events.currency import clear_currency_codes_cache
+from jofotara.tests import make_baseline_invoice
+from jofotara.xml import validator
+from jofotara.xml.generator import render_xml
+from jofotara.xml.validator import MAX_ERRORS, TAX_ID_MAX_LENGTH, get_currency_codes, validate_xml
+
+
+class TestValidator(FrappeTestCase):
+    def setUp(self):
+        patcher = patch("jofotara.xml.validator.get_currency_codes", return_value=["JOD", "USD"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        invoice, items, company = make_baseline_invoice()
+        self.xml = render_xml(invoice, items, company).decode("utf-8")
+
+    def validate(self, old, new, count=1):
+        self.assertEqual(self.xml.count(old), count, old)
+        return validate_xml(self.xml.replace(old, new))
+
+    def test_valid_invoice(self):
+        self.assertEqual(validate_xml(self.xml), [])
+        self.assertEqual(validate_xml(self.xml.encode("utf-8")), [])
+
+    def test_file_object_is_checked_the_same_way(self):
+        xml = self.xml.replace("<cbc:CompanyID>12345678</cbc:CompanyID>", "<cbc:CompanyID>12-34</cbc:CompanyID>")
+        self.assertEqual(validate_xml(io.BytesIO(xml.encode("utf-8"))), validate_xml(xml))
+        self.assertEqual(validate_xml(io.BytesIO(self.xml.encode("utf-8"))), [])
+
+    def test_seller_tax_number(self):
+        errors = self.validate("<cbc:CompanyID>12345678</cbc:CompanyID>", "<cbc:CompanyID>JO12345678</cbc:CompanyID>")
+        self.assertEqual(errors, [f"Seller tax number 'JO12345678' must be up to {TAX_ID_MAX_LENGTH} digits"])
+
+        too_long = "1" * (TAX_ID_MAX_LENGTH + 1)
+        errors = self.validate("<cbc:CompanyID>12345678</cbc:CompanyID>", f"<cbc:CompanyID>{too_long}</cbc:CompanyID>")
+        self.assertEqual(len(errors), 1)
+
+        errors = self.validate("<cbc:CompanyID>12345678</cbc:CompanyID>", "")
+        self.assertEqual(errors, ["Seller tax number is missing"])
+
+    def test_activity_number(self):
+        errors = self.validate("<cbc:ID>4567890</cbc:ID>", "<cbc:ID>ACT-1</cbc:ID>")
+        self.assertEqual(errors, ["Activity number 'ACT-1' must be digits only"])
+
+    def test_currencies(self):
+        errors = self.validate(
+            "<cbc:DocumentCurrencyCode>JOD</cbc:DocumentCurrencyCode>",
+            "<cbc:DocumentCurrencyCode>XYZ</cbc:DocumentCurrencyCode>",
+        )
+        self.assertIn("Unknown currency code 'XYZ'", errors)
+
+        xml = self.xml.replace('<cbc:PriceAmount currencyID="JOD">', '<cbc:PriceAmount currencyID="USD">', 1)
+        self.assertEqual(validate_xml(xml), ["PriceAmount currencyID 'USD' differs from the document currency 'JOD'"])
+
+    def test_line_amount(self):
+        errors = self.validate(
+            '<cbc:LineExtensionAmount currencyID="JOD">25.0</cbc:LineExtensionAmount>',
+            '<cbc:LineExtensionAmount currencyID="JOD">26.0</cbc:LineExtensionAmount>',
+        )
+        self.assertEqual(
+            errors,
+            [
+                "Line 1: amount 26.0 does not match quantity 2.0 times price 12.5",
+                "TaxExclusiveAmount 44.2 does not match the sum of the lines 45.200",
+            ],
+        )
+
+    def test_printed_rounding_is_tolerated(self):
+        # 1.0 x 7.25 is printed as 7.2 for both the price and the amount
+        self.assertIn('<cbc:LineExtensionAmount currencyID="JOD">7.2</cbc:LineExtensionAmount>', self.xml)
+        self.assertEqual(
+            self.validate(
+                '<cbc:PriceAmount currencyID="JOD">7.2</cbc:PriceAmount>',
+                '<cbc:PriceAmount currencyID="JOD">7.24</cbc:PriceAmount>',
+            ),
+            [],
+        )
+
+    def test_payable_amount(self):
+        errors = self.validate(
+            '<cbc:PayableAmount currencyID="JOD">44.2</cbc:PayableAmount>',
+            '<cbc:PayableAmount currencyID="JOD">40.0</cbc:PayableAmount>',
+        )
+        self.assertEqual(errors, ["PayableAmount 40.0 does not match TaxInclusiveAmount 44.2 less PrepaidAmount 0.0"])
+
+    def test_amount_not_a_number(self):
+        errors = self.validate(
+            '<cbc:InvoicedQuantity unitCode="PCE">2.0</cbc:InvoicedQuantity>',
+            '<cbc:InvoicedQuantity unitCode="PCE">two</cbc:InvoicedQuantity>',
+        )
+        self.assertIn("Line 1: InvoicedQuantity 'two' is not a number", errors)
+
+    def test_missing_parts(self):
+        start = self.xml.index("<cac:InvoiceLine>")
+        end = self.xml.rindex("</cac:InvoiceLine>") + len("</cac:InvoiceLine>")
+        errors = validate_xml(self.xml[:start] + self.xml[end:])
+        self.assertIn("Invoice has no lines", errors)
+
+        start = self.xml.index("<cac:SellerSupplierParty>")
+        end = self.xml.index("</cac:SellerSupplierParty>") + len("</cac:SellerSupplierParty>")
+        errors = validate_xml(self.xml[:start] + self.xml[end:])
+        self.assertEqual(errors, ["SellerSupplierParty (activity number) is missing"])
+
+    def test_root_element(self):
+        errors = validate_xml('<CreditNote xmlns="urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2"/>')
+        self.assertIn(
+            "Root element is {urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote, not a UBL Invoice",
+            errors,
+        )
+
+    def test_errors_are_capped(self):
+        line = self.xml[self.xml.index("<cac:InvoiceLine>") : self.xml.index("</cac:InvoiceLine>") + 18]
+        bad_line = line.replace(">25.0<", ">99.0<")
+        xml = self.xml.replace(line, bad_line * (MAX_ERRORS + 5))
+        self.assertEqual(len(validate_xml(xml)), MAX_ERRORS)
+
+    def test_malformed_xml(self):
+        errors = validate_xml(self.xml[:-10])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("Invalid XML: "))
+
+
+class TestCurrencyCodes(FrappeTestCase):
+    def setUp(self):
+        self.codes = ["JOD", "USD"]
+        get_all = patch.object(validator.frappe, "get_all", side_effect=lambda *args, **kw: list(self.codes))
+        self.get_all = get_all.start()
+        self.addCleanup(get_all.stop)
+        self.addCleanup(validator.clear_currency_codes)
+        validator.clear_currency_codes()
+
+    def test_cached(self):
+        self.assertEqual(get_currency_codes(), ["JOD", "USD"])
+        self.assertEqual(get_currency_codes(), ["JOD", "USD"])
+        self.assertEqual(self.get_all.call_count, 1)
+
+    def test_cleared_when_a_currency_changes(self):
+        get_currency_codes()
+        self.codes.append("EUR")
+        clear_currency_codes_cache(frappe._dict(name="EUR"), "on_update")
+
+        self.assertEqual(get_currency_codes(), ["JOD", "USD", "EUR"])
+        self.assertEqual(self.get_all.call_count, 2)
@@ -0,0 +1,54 @@
+import io
+from xml.etree import ElementTree
+
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.tests import make_baseline_invoice, read_baseline_xml
+from jofotara.xml.generator import render_xml
+from jofotara.xml.writer import UBLWriter
+
+
+class TestUBLWriter(FrappeTestCase):
+    def test_pretty_output_matches_baseline(self):
+        invoice, items, company = make_baseline_invoice()
+        xml = render_xml(invoice, items, company, pretty=True).decode("utf-8")
+        baseline = read_baseline_xml()
+
+        # Only the declaration differs, minidom did not name the encoding
+        self.assertEqual(baseline.splitlines()[0], '<?xml version="1.0" ?>')
+        self.assertEqual(xml.splitlines()[0], '<?xml version="1.0" encoding="UTF-8"?>')
+        self.assertEqual(xml.splitlines()[1:], baseline.splitlines()[1:])
+
+    def test_compact_output_is_the_baseline_document(self):
+        invoice, items, company = make_baseline_invoice()
+        xml = render_xml(invoice, items, company).decode("utf-8")
+
+        self.assertNotIn("\n", xml)
+        self.assertEqual(
+            ElementTree.canonicalize(xml, strip_text=True),
+            ElementTree.canonicalize(read_baseline_xml(), strip_text=True),
+        )
+
+    def test_escaping(self):
+        sink = io.StringIO()
+        writer = UBLWriter(sink)
+        writer.start("Invoice", {"note": 'a "b"\n<c>\t&'})
+        writer.element("cbc:Name", 'كتاب "البرمجة" & <الحوسبة>')
+        writer.end("Invoice")
+
+        self.assertEqual(
+            sink.getvalue(),
+            '<Invoice note="a &quot;b&quot;&#10;&lt;c&gt;&#09;&amp;">'
+            "<cbc:Name>كتاب &quot;البرمجة&quot; &amp; &lt;الحوسبة&gt;</cbc:Name>"
+            "</Invoice>",
+        )
+
+    def test_empty_element_is_self_closing(self):
+        sink = io.StringIO()
+        writer = UBLWriter(sink, pretty=True)
+        writer.start("cac:Party")
+        writer.element("cbc:Name", "")
+        writer.element("cbc:ID", None, {"schemeID": "TN"})
+        writer.end("cac:Party")
+
+        self.assertEqual(sink.getvalue(), '<cac:Party>\n  <cbc:Name/>\n  <cbc:ID schemeID="TN"/>\n</cac:Party>\n')
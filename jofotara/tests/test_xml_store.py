@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from jofotara.utils.xml_store import (
+    STORE_DIR,
+    WRITE_CHUNK_SIZE,
+    get_xml_path,
+    has_xml,
+    open_xml,
+    put_xml,
+    put_xml_stream,
+)
+
+
+class TestXMLStore(FrappeTestCase):
+    def setUp(self):
+        # Unique content, so every test stores files of its own
+        self.xml = f"<Invoice><cbc:Note>{frappe.generate_hash()} فاتورة</cbc:Note></Invoice>"
+
+    def store(self, put, *args):
+        digest = put(*args)
+        self.addCleanup(self.remove, digest)
+        return digest
+
+    def remove(self, digest):
+        path = get_xml_path(digest)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def get_tmp_files(self):
+        root = frappe.get_site_path("private", STORE_DIR)
+        return [name for name in os.listdir(root) if name.endswith(".tmp")]
+
+    def test_round_trip(self):
+        digest = self.store(put_xml, self.xml)
+
+        self.assertEqual(digest, hashlib.sha256(self.xml.encode()).hexdigest())
+        self.assertTrue(has_xml(digest))
+        self.assertTrue(get_xml_path(digest).endswith(f"{digest[:2]}/{digest[2:4]}/{digest}.xml.gz"))
+        with open_xml(digest) as f:
+            self.assertEqual(f.read().decode(), self.xml)
+
+    def test_identical_content_is_stored_once(self):
+        digest = self.store(put_xml, self.xml)
+        mtime = os.stat(get_xml_path(digest)).st_mtime_ns
+
+        self.assertEqual(put_xml(self.xml.encode()), digest)
+        self.assertEqual(self.store(put_xml_stream, lambda sink: sink.write(self.xml)), digest)
+        self.assertEqual(os.stat(get_xml_path(digest)).st_mtime_ns, mtime)
+        self.assertEqual(self.get_tmp_files(), [])
+
+    def test_stream_matches_put(self):
+        lines = [f"<cac:InvoiceLine>{i} بند</cac:InvoiceLine>" for i in range(WRITE_CHUNK_SIZE // 20)]
+        xml = self.xml + "".join(lines)
+
+        def write(sink):
+            sink.write(self.xml)
+            for line in lines:
+                sink.write(line)
+
+        digest = self.store(put_xml_stream, write)
+        self.assertEqual(digest, hashlib.sha256(xml.encode()).hexdigest())
+        with open_xml(digest) as f:
+            self.assertEqual(f.read().decode(), xml)
+
+    def test_failed_stream_leaves_nothing_behind(self):
+        def write(sink):
+            sink.write(self.xml)
+            raise ValueError("generation failed")
+
+        with self.assertRaises(ValueError):
+            put_xml_stream(write)
+        self.assertEqual(self.get_tmp_files(), [])
+
+    def test_missing(self):
+        self.assertFalse(has_xml(None))
+        self.assertFalse(has_xml(""))
+        self.assertFalse(has_xml(hashlib.sha256(frappe.generate_hash().encode()).hexdigest()))
@@ -0,0 +1,99 @@
+import time
+
+import frappe
+from frappe.utils import cint
+
+# Consecutive outage failures that open the breaker, overridable with `jofotara_breaker_threshold`
+DEFAULT_FAILURE_THRESHOLD = 5
+
+# Seconds the breaker stays open before a probe is let through, overridable with `jofotara_breaker_cooldown`
+DEFAULT_COOLDOWN = 60
+
+# Seconds a half-open probe may take before another worker is allowed to probe
+PROBE_TIMEOUT = 30
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def allow_request(endpoint):
+    """
+    Check whether a request to ``endpoint`` may be sent.
+
+    The breaker state lives in Redis so it is shared by every worker of the site.
+    While open every request is refused; once the cooldown is over exactly one
+    worker wins the probe slot and the others keep being refused until the
+    probe's outcome closes or re-opens the breaker.
+
+    Args:
+        endpoint (str): Endpoint URL
+
+    Returns:
+        tuple[bool, float]: Whether to send, and if not the seconds left until the next probe
+    """
+    cache = frappe.cache()
+    opened_at = cache.get(_key(endpoint, "opened_at"))
+    if opened_at is None:
+        return True, 0
+
+    remaining = float(opened_at) + _cooldown() - time.time()
+    if remaining > 0:
+        return False, remaining
+
+    if cache.set(_key(endpoint, "probe"), 1, nx=True, ex=PROBE_TIMEOUT):
+        return True, 0
+    return False, PROBE_TIMEOUT
+
+
+def record_result(endpoint, result):
+    """
+    Feed the outcome of a submission into the breaker.
+
+    Timeouts, connection errors and 5xx responses count as outage failures;
+    anything else, including 4xx rejections, proves the endpoint is up.
+    """
+    http_status = result.get("http_status")
+    if result["status"] == "error" and (http_status is None or http_status >= 500):
+        record_failure(endpoint)
+    else:
+        record_success(endpoint)
+
+
+def record_failure(endpoint):
+    cache = frappe.cache()
+    failures = cache.incr(_key(endpoint, "failures"))
+
+    # A failed probe re-opens the breaker straight away
+    if failures >= _threshold() or cache.get(_key(endpoint, "opened_at")) is not None:
+        cache.set(_key(endpoint, "opened_at"), time.time())
+        cache.delete(_key(endpoint, "probe"))
+
+
+def record_success(endpoint):
+    frappe.cache().delete(_key(endpoint, "failures"), _key(endpoint, "opened_at"), _key(endpoint, "probe"))
+
+
+def get_state(endpoint):
+    """
+    Returns:
+        str: ``closed``, ``open`` or ``half-open``
+    """
+    opened_at = frappe.cache().get(_key(endpoint, "opened_at"))
+    if opened_at is None:
+        return CLOSED
+    if float(opened_at) + _cooldown() > time.time():
+        return OPEN
+    return HALF_OPEN
+
+
+def _key(endpoint, name):
+    return frappe.cache().make_key(f"jofotara_breaker|{endpoint}|{name}")
+
+
+def _threshold():
+    return cint(frappe.conf.get("jofotara_breaker_threshold")) or DEFAULT_FAILURE_THRESHOLD
+
+
+def _cooldown():
+    return cint(frappe.conf.get("jofotara_breaker_cooldown")) or DEFAULT_COOLDOWN
@@ -0,0 +1,123 @@
+from typing import NamedTuple
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+DEFAULT_API_URL = "https://backend.jofotara.gov.jo/core/invoices/"
+
+# Bumped in Redis whenever a Company is saved so every worker drops its snapshots
+VERSION_CACHE_KEY = "jofotara_company_config_version"
+
+# (site, company) -> (version, CompanyConfig), kept per process
+_configs = {}
+
+
+class CompanyConfig(NamedTuple):
+    """Immutable snapshot of the JoFotara settings of one Company."""
+
+    company: str
+    company_name: str
+    tax_id: str | None
+    activity_number: str | None
+    endpoint: str
+    client_id: str | None
+    device_id: str | None
+    enabled: bool
+    rate_limit: float
+    rate_burst: int
+
+
+def get_company_config(company):
+    """
+    Get the JoFotara settings snapshot of a Company.
+
+    Args:
+        company (str): Name of the Company
+
+    Returns:
+        CompanyConfig: Cached settings snapshot
+    """
+    config = get_company_configs([company]).get(company)
+    if not config:
+        frappe.throw(_("Company {0} not found").format(company), frappe.DoesNotExistError)
+    return config
+
+
+def get_company_configs(companies):
+    """
+    Get the JoFotara settings snapshots of several Companies, loading the ones
+    not cached yet with a single query.
+
+    Args:
+        companies (Iterable[str]): Company names
+
+    Returns:
+        dict: Company name -> CompanyConfig, missing companies are left out
+    """
+    version = _get_version()
+    site = frappe.local.site
+    configs = {}
+    missing = []
+
+    for company in set(companies):
+        cached = _configs.get((site, company))
+        if cached and cached[0] == version:
+            configs[company] = cached[1]
+        else:
+            missing.append(company)
+
+    if missing:
+        for row in frappe.get_all("Company", filters={"name": ["in", missing]}, fields=_get_fields()):
+            config = _build_config(row)
+            _configs[(site, row.name)] = (version, config)
+            configs[row.name] = config
+
+    return configs
+
+
+def clear_company_config(company):
+    """
+    Drop the cached snapshot of a Company in this process and tell the other
+    workers of the site to reload theirs.
+    """
+    _configs.pop((frappe.local.site, company), None)
+    frappe.cache().set_value(VERSION_CACHE_KEY, frappe.generate_hash(length=12))
+
+
+def _get_fields():
+    meta = frappe.get_meta("Company")
+    fields = [
+        "tax_id",
+        "jofotara_activity_number",
+        "jofotara_api_url",
+        "jofotara_api_endpoint",
+        "jofotara_client_id",
+        "jofotara_device_id",
+        "enable_jofotara_integration",
+        "jofotara_rate_limit",
+        "jofotara_rate_burst",
+    ]
+    return ["name", "company_name"] + [field for field in fields if meta.has_field(field)]
+
+
+def _build_config(row):
+    return CompanyConfig(
+        company=row.name,
+        company_name=row.company_name,
+        tax_id=row.get("tax_id"),
+        activity_number=row.get("jofotara_activity_number"),
+        endpoint=(row.get("jofotara_api_url") or row.get("jofotara_api_endpoint") or DEFAULT_API_URL).strip(),
+        client_id=row.get("jofotara_client_id"),
+        device_id=row.get("jofotara_device_id"),
+        enabled=bool(cint(row.get("enable_jofotara_integration"))),
+        rate_limit=flt(row.get("jofotara_rate_limit")),
+        rate_burst=cint(row.get("jofotara_rate_burst")) or 1,
+    )
+
+
+def _get_version():
+    # Read from Redis on every call: get_value would answer from the request-local copy
+    # and miss a bump made by another process while a long job runs
+    cache = frappe.cache()
+    return cache.get(cache.make_key(VERSION_CACHE_KEY))
@@ -0,0 +1,95 @@
+import time
+from typing import NamedTuple
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+from frappe.utils.password import get_decrypted_password
+
+# Seconds a decrypted secret is reused, overridable with `jofotara_credentials_ttl` in site config
+DEFAULT_CREDENTIALS_TTL = 300
+
+# Bumped in Redis when a Company's client ID or secret changes so every worker drops its copy
+VERSION_CACHE_KEY = "jofotara_credentials_version"
+
+# (site, company) -> Credentials, kept per process
+_credentials = {}
+
+
+class Credentials(NamedTuple):
+    """Decrypted JoFotara credentials of one Company with its ready-made request headers."""
+
+    client_id: str
+    secret_key: str
+    headers: dict
+    version: bytes | None
+    expires_at: float
+
+
+def get_credentials(company):
+    """
+    Get the decrypted JoFotara credentials of a Company.
+
+    The secret is decrypted at most once per TTL per process. The returned
+    ``headers`` dict is shared between calls and must not be modified.
+
+    Args:
+        company (CompanyConfig): Settings snapshot of the Company
+
+    Returns:
+        Credentials: Cached credentials
+    """
+    key = (frappe.local.site, company.company)
+    version = _get_version()
+    cached = _credentials.get(key)
+
+    if (
+        cached
+        and cached.version == version
+        and cached.client_id == (company.client_id or "").strip()
+        and cached.expires_at > time.monotonic()
+    ):
+        return cached
+
+    client_id = company.client_id
+
+    # Try to get encrypted secret key first, fallback to regular field
+    secret_key = get_decrypted_password("Company", company.company, "jofotara_secret_key", raise_exception=False)
+    if not secret_key:
+        secret_key = frappe.db.get_value("Company", company.company, "jofotara_secret_key")
+
+    if not client_id or not secret_key:
+        frappe.throw(_("JoFotara Client ID or Secret Key is missing. Please configure them in Company settings."))
+
+    client_id, secret_key = client_id.strip(), secret_key.strip()
+    ttl = cint(frappe.conf.get("jofotara_credentials_ttl")) or DEFAULT_CREDENTIALS_TTL
+
+    credentials = Credentials(
+        client_id=client_id,
+        secret_key=secret_key,
+        headers={
+            "Client-Id": client_id,
+            "Secret-Key": secret_key,
+            "Content-Type": "application/json",
+        },
+        version=version,
+        expires_at=time.monotonic() + ttl,
+    )
+    _credentials[key] = credentials
+    return credentials
+
+
+def clear_credentials(company):
+    """
+    Drop the cached credentials of a Company in this process and tell the other
+    workers of the site to decrypt them again.
+    """
+    _credentials.pop((frappe.local.site, company), None)
+    frappe.cache().set_value(VERSION_CACHE_KEY, frappe.generate_hash(length=12))
+
+
+def _get_version():
+    # Read from Redis on every call: get_value would answer from the request-local copy
+    # and miss a bump made by another process while a long job runs
+    cache = frappe.cache()
+    return cache.get(cache.make_key(VERSION_CACHE_KEY))
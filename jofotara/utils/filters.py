@@ -0,0 +1,14 @@
+def get_date_filter(from_date=None, to_date=None):
+    """
+    Filter value for a date field between two dates, both inclusive and both optional.
+
+    Returns:
+        list: The value for ``frappe.get_all`` filters, or None if neither date is given
+    """
+    if from_date and to_date:
+        return ["between", [from_date, to_date]]
+    if from_date:
+        return [">=", from_date]
+    if to_date:
+        return ["<=", to_date]
+    return None
@@ -0,0 +1,95 @@
+from urllib.parse import quote
+
+import frappe
+from frappe.utils import cint, now
+
+from jofotara.jofotara.doctype.jofotara_status_summary.jofotara_status_summary import move_invoice
+
+# Sales Invoice fields identifying a JoFotara Status Summary bucket, and whether the invoice is counted
+SUMMARY_FIELDS = ("company", "posting_date", "jofotara_submission_status", "docstatus")
+
+# Whitelisted method serving the stored XML of an invoice
+XML_DOWNLOAD_URL = "/api/method/jofotara.api.invoice.download_xml?docname={}"
+
+
+def update_jofotara_fields(sales_invoice, values, comment=None):
+    """
+    Persist JoFotara fields of a Sales Invoice with a single UPDATE.
+
+    ``modified`` is left untouched so the write does not collide with users
+    editing the invoice. Fields missing from the site's Sales Invoice schema are
+    skipped. A status change of a submitted invoice also moves it between the
+    buckets of the JoFotara Status Summary, with the invoice row locked until
+    the transaction ends; cancelled invoices are not counted.
+    The timeline comment is only added when
+    ``jofotara_timeline_comments`` is not switched off in site config.
+
+    Args:
+        sales_invoice (Document | str): The Sales Invoice document or its name
+        values (dict): Field name -> value
+        comment (str): Optional timeline comment
+    """
+    meta = frappe.get_meta("Sales Invoice")
+    values = {field: value for field, value in values.items() if meta.has_field(field)}
+    name = sales_invoice if isinstance(sales_invoice, str) else sales_invoice.name
+
+    if values:
+        if "jofotara_submission_status" in values:
+            # The summary needs the status being left. It is read from the locked row, not
+            # from a possibly stale Document, so concurrent writers each move the invoice once
+            previous = frappe.db.get_value("Sales Invoice", name, list(SUMMARY_FIELDS), for_update=True)
+
+        frappe.db.set_value("Sales Invoice", name, values, update_modified=False)
+        if not isinstance(sales_invoice, str):
+            sales_invoice.update(values)
+
+        if "jofotara_submission_status" in values and previous and previous[3] == 1:
+            company, posting_date, old_status, _docstatus = previous
+            move_invoice(company, posting_date, old_status, values["jofotara_submission_status"])
+
+    if comment and cint(frappe.conf.get("jofotara_timeline_comments", 1)):
+        frappe.get_doc({
+            "doctype": "Comment",
+            "comment_type": "Info",
+            "reference_doctype": "Sales Invoice",
+            "reference_name": name,
+            "content": comment,
+        }).insert(ignore_permissions=True)
+
+
+def mark_xml_generated(sales_invoice, xml_digest, xml_hash=None, comment=None):
+    """Generated stage: the XML exists in the XML store under ``xml_digest``."""
+    name = sales_invoice if isinstance(sales_invoice, str) else sales_invoice.name
+    values = {
+        "jofotara_xml_generated": 1,
+        "jofotara_xml_digest": xml_digest,
+        "jofotara_xml_file": XML_DOWNLOAD_URL.format(quote(name)),
+    }
+    if xml_hash is not None:
+        values["jofotara_xml_hash"] = xml_hash
+    update_jofotara_fields(sales_invoice, values, comment)
+
+
+def mark_submission(sales_invoice, status, response=None, error=None, comment=None):
+    """
+    Submission stages: Pending, Submitted, Retry or Rejected.
+
+    Args:
+        sales_invoice (Document | str): The Sales Invoice document or its name
+        status (str): New ``jofotara_submission_status``
+        response (dict): Accepted API response, its QR code is stored as well
+        error (str): Error message of a failed attempt
+        comment (str): Optional timeline comment
+    """
+    values = {"jofotara_submission_status": status}
+
+    if status != "Pending":
+        timestamp = now()
+        values["jofotara_submission_time"] = timestamp
+        values["jofotara_submission_date"] = timestamp
+        values["jofotara_submission_response"] = str(response) if response is not None else error or "Unknown error"
+
+    if response and response.get("EINV_QR"):
+        values["jofotara_qr_code"] = response["EINV_QR"]
+
+    update_jofotara_fields(sales_invoice, values, comment)
@@ -0,0 +1,39 @@
+import uuid
+
+import frappe
+
+
+def get_invoice_uuid(sales_invoice):
+    """
+    Get the JoFotara UUID of a Sales Invoice, assigning and persisting one on
+    first use.
+
+    The same UUID is stamped into ``cbc:UUID`` on every generation, so a retry
+    after a timeout is recognised upstream as the same invoice.
+
+    Args:
+        sales_invoice (Document | dict): The Sales Invoice document or header row
+
+    Returns:
+        str: The invoice UUID
+    """
+    if sales_invoice.get("jofotara_uuid"):
+        return sales_invoice.jofotara_uuid
+
+    # Only fill an empty value, so concurrent first generations agree on one UUID
+    frappe.db.sql(
+        """
+        update `tabSales Invoice`
+        set jofotara_uuid = %s
+        where name = %s and ifnull(jofotara_uuid, '') = ''
+        """,
+        (str(uuid.uuid4()), sales_invoice.name),
+    )
+    sales_invoice.jofotara_uuid = frappe.db.get_value("Sales Invoice", sales_invoice.name, "jofotara_uuid")
+    return sales_invoice.jofotara_uuid
+
+
+def set_invoice_uuid(doc):
+    """Assign the JoFotara UUID inside the submit transaction, before any XML is generated."""
+    if not doc.get("jofotara_uuid"):
+        doc.jofotara_uuid = str(uuid.uuid4())
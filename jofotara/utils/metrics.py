@@ -0,0 +1,196 @@
+import frappe
+from frappe.utils import cint
+
+from jofotara.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, get_state
+from jofotara.utils.company_config import get_company_configs
+from jofotara.utils.rate_limiter import get_tokens
+
+# Histogram upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Outbox statuses reported as backlog: rows still waiting for delivery
+BACKLOG_STATUSES = ("Queued", "In Flight", "Retry")
+
+# Gauges written by refresh_outbox_gauges, the others are read live when rendering
+STORED_GAUGES = ("jofotara_outbox_invoices", "jofotara_invoices")
+
+# name -> (type, help)
+METRICS = {
+    "jofotara_submissions_total": ("counter", "Invoice submissions by company and outcome"),
+    "jofotara_http_responses_total": ("counter", "JoFotara API responses by HTTP status"),
+    "jofotara_generation_seconds": ("histogram", "XML generation time per invoice"),
+    "jofotara_submission_seconds": ("histogram", "JoFotara API request time per invoice"),
+    "jofotara_outbox_invoices": ("gauge", "JoFotara Outbox rows waiting for delivery by company and status"),
+    "jofotara_invoices": ("gauge", "Invoices in the JoFotara Status Summary by company and submission status"),
+    "jofotara_circuit_breaker_state": ("gauge", "Circuit breaker per endpoint: 0 closed, 1 half-open, 2 open"),
+    "jofotara_rate_limiter_tokens": ("gauge", "Tokens left in the rate limiter bucket at its last request"),
+}
+
+
+def record_submission(company, result, seconds=None):
+    """
+    Count one submission result and observe its request time.
+
+    Args:
+        company (str): Company of the invoice
+        result (dict): Result of ``post_to_jofotara`` or ``send_invoice_to_jofotara``
+        seconds (float): Request time, None when no request was sent
+    """
+    if not _enabled():
+        return
+
+    pipe = frappe.cache().pipeline()
+    pipe.hincrby(_key("jofotara_submissions_total"), _labels(company=company, outcome=get_outcome(result)), 1)
+    if result.get("http_status"):
+        pipe.hincrby(_key("jofotara_http_responses_total"), _labels(status=result["http_status"]), 1)
+    if seconds is not None:
+        _observe(pipe, "jofotara_submission_seconds", seconds, _labels(company=company))
+    pipe.execute()
+
+
+def observe_generation(company, seconds):
+    """Observe the time taken to generate the XML of one invoice."""
+    if not _enabled():
+        return
+
+    pipe = frappe.cache().pipeline()
+    _observe(pipe, "jofotara_generation_seconds", seconds, _labels(company=company))
+    pipe.execute()
+
+
+def get_outcome(result):
+    if result["status"] == "success":
+        return "duplicate" if result.get("duplicate") else "accepted"
+    if result.get("circuit_open"):
+        return "circuit_open"
+    if result.get("invalid"):
+        return "invalid"
+    return "retry" if result.get("retryable") else "rejected"
+
+
+def refresh_outbox_gauges():
+    """
+    Store the delivery backlog and the invoice counts per company and status in Redis.
+
+    Runs every minute from the scheduler, so a scrape reads Redis only. The
+    backlog comes from the status index of the small outbox table. Pending and
+    failed invoices come from the JoFotara Status Summary rather than from
+    outbox rows, which an invoice resubmitted by hand leaves Rejected; neither
+    query touches Sales Invoice.
+    """
+    outbox = frappe.db.sql(
+        """
+        select company, status, count(*)
+        from `tabJoFotara Outbox`
+        where status in %(statuses)s
+        group by company, status
+        """,
+        {"statuses": BACKLOG_STATUSES},
+    )
+    invoices = frappe.db.sql(
+        """
+        select company, status, sum(invoice_count)
+        from `tabJoFotara Status Summary`
+        group by company, status
+        having sum(invoice_count) > 0
+        """
+    )
+
+    pipe = frappe.cache().pipeline()
+    for name, rows in (("jofotara_outbox_invoices", outbox), ("jofotara_invoices", invoices)):
+        key = _key(name)
+        pipe.delete(key)
+        if rows:
+            pipe.hset(key, mapping={_labels(company=company, status=status): count for company, status, count in rows})
+    pipe.execute()
+
+
+def render_metrics():
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition document
+    """
+    pipe = frappe.cache().pipeline()
+    stored = [name for name, (kind, _help) in METRICS.items() if kind != "gauge" or name in STORED_GAUGES]
+    for name in stored:
+        pipe.hgetall(_key(name))
+    values = {name: _decode(fields) for name, fields in zip(stored, pipe.execute(), strict=True)}
+
+    # Breaker and limiter gauges are read live from their own Redis keys
+    companies = frappe.get_all("Company", filters={"enable_jofotara_integration": 1}, pluck="name")
+    configs = get_company_configs(companies).values()
+    states = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    values["jofotara_circuit_breaker_state"] = {
+        _labels(endpoint=endpoint): states.get(get_state(endpoint), 0) for endpoint in {c.endpoint for c in configs}
+    }
+    values["jofotara_rate_limiter_tokens"] = {
+        _labels(client_id=client_id): tokens
+        for client_id in {c.client_id for c in configs if c.client_id and c.rate_limit > 0}
+        if (tokens := get_tokens(client_id)) is not None
+    }
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            lines.extend(_render_histogram(name, values[name]))
+        else:
+            lines.extend(f"{name}{{{labels}}} {_format(value)}" for labels, value in sorted(values[name].items()))
+
+    return "\n".join(lines) + "\n"
+
+
+def _render_histogram(name, fields):
+    series = {}
+    for field, value in fields.items():
+        labels, _, part = field.rpartition("|")
+        series.setdefault(labels, {})[part] = value
+
+    for labels, parts in sorted(series.items()):
+        prefix = f"{labels}," if labels else ""
+        for bound in LATENCY_BUCKETS:
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {_format(parts.get(str(bound), 0))}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {_format(parts.get("count", 0))}'
+        yield f"{name}_sum{{{labels}}} {_format(parts.get('sum', 0))}"
+        yield f"{name}_count{{{labels}}} {_format(parts.get('count', 0))}"
+
+
+def _observe(pipe, name, seconds, labels):
+    """Buckets are stored cumulative, so rendering needs no arithmetic."""
+    key = _key(name)
+    for bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            pipe.hincrby(key, f"{labels}|{bound}", 1)
+    pipe.hincrbyfloat(key, f"{labels}|sum", seconds)
+    pipe.hincrby(key, f"{labels}|count", 1)
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _decode(fields):
+    return {
+        (field.decode() if isinstance(field, bytes) else field): float(value)
+        for field, value in (fields or {}).items()
+    }
+
+
+def _format(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _key(name):
+    return frappe.cache().make_key(f"jofotara_metrics|{name}")
+
+
+def _enabled():
+    return cint(frappe.conf.get("jofotara_metrics", 1))
@@ -0,0 +1,65 @@
+import frappe
+
+# Refills the bucket for the time elapsed since the last call, then reserves one
+# token. The balance may go negative: the caller waits until its token exists,
+# so concurrent callers are queued fairly instead of polling. Redis' own clock
+# is used so every worker host agrees on the time.
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+_scripts = {}
+
+
+def reserve(client_id, rate, burst):
+    """
+    Reserve one request from the token bucket of a JoFotara client ID.
+
+    The bucket lives in Redis, so the limit holds for all worker processes of
+    the site together.
+
+    Args:
+        client_id (str): JoFotara client ID the bucket belongs to
+        rate (float): Tokens added per second, 0 disables limiting
+        burst (int): Bucket capacity
+
+    Returns:
+        float: Seconds to wait before sending the request
+    """
+    if not rate or rate <= 0:
+        return 0.0
+
+    cache = frappe.cache()
+    script = _scripts.get(id(cache))
+    if not script:
+        script = _scripts[id(cache)] = cache.register_script(RESERVE_SCRIPT)
+
+    key = cache.make_key(f"jofotara_rate_limit|{client_id}")
+    return float(script(keys=[key], args=[rate, max(burst or 1, 1)]))
+
+
+def get_tokens(client_id):
+    """
+    Returns:
+        float: Tokens left in the bucket after its last reservation, None if it is idle
+    """
+    cache = frappe.cache()
+    # Raw HGET: RedisWrapper.hget would prefix the key again and unpickle the value
+    tokens = cache.execute_command("HGET", cache.make_key(f"jofotara_rate_limit|{client_id}"), "tokens")
+    return float(tokens) if tokens is not None else None
@@ -0,0 +1,58 @@
+import json
+import time
+from contextlib import nullcontext
+
+import frappe
+from frappe.utils import cint
+
+# Shared no-op returned while timing is off, so a disabled span costs one config lookup
+_DISABLED = nullcontext()
+
+
+def span(stage, sales_invoice=None, company=None):
+    """
+    Time one stage of the JoFotara pipeline.
+
+    Enabled with ``jofotara_timing: 1`` in site config. Each finished span is
+    written to the ``jofotara_timing`` log as one JSON record with the stage,
+    invoice, company, duration in milliseconds and whether it raised.
+
+    Usage::
+
+        with span("post", doc, doc.company):
+            ...
+
+    Args:
+        stage (str): Stage name, e.g. ``render`` or ``post``
+        sales_invoice (Document | str): The Sales Invoice document or its name
+        company (str): Company of the invoice
+
+    Returns:
+        A context manager
+    """
+    if not cint(frappe.conf.get("jofotara_timing")):
+        return _DISABLED
+    return _Span(stage, getattr(sales_invoice, "name", sales_invoice), company)
+
+
+class _Span:
+    __slots__ = ("company", "sales_invoice", "stage", "start")
+
+    def __init__(self, stage, sales_invoice, company):
+        self.stage = stage
+        self.sales_invoice = sales_invoice
+        self.company = company
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = (time.perf_counter() - self.start) * 1000
+        frappe.logger("jofotara_timing").info(json.dumps({
+            "stage": self.stage,
+            "sales_invoice": self.sales_invoice,
+            "company": self.company,
+            "duration_ms": round(duration, 3),
+            "error": exc_type.__name__ if exc_type else None,
+        }))
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import os
+
+import frappe
+from frappe.utils import cint
+
+# Directory below the site's private folder; it is not served by the web server
+STORE_DIR = "jofotara_xml"
+
+# gzip level used for new files, overridable with `jofotara_xml_compress_level` in site config
+DEFAULT_COMPRESS_LEVEL = 6
+
+# Bytes buffered by put_xml_stream before they are hashed and compressed
+WRITE_CHUNK_SIZE = 64 * 1024
+
+
+def put_xml(xml):
+    """
+    Store a generated XML document and return its content address.
+
+    Files are named by the SHA-256 of their content and sharded into two levels
+    of hash-prefix directories, so identical payloads are stored once and no
+    directory grows past a few hundred entries. Writes go through a temporary
+    file and an atomic rename, so readers never see a partial file.
+
+    Args:
+        xml (str | bytes): The XML document
+
+    Returns:
+        str: The content digest
+    """
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+
+    digest = hashlib.sha256(xml).hexdigest()
+    path = get_xml_path(digest)
+    if os.path.exists(path):
+        return digest
+
+    tmp_path = _get_tmp_path()
+    with _open_gzip(tmp_path) as gz:
+        gz.write(xml)
+    return _commit(tmp_path, digest)
+
+
+def put_xml_stream(write):
+    """
+    Store a document that ``write(sink)`` writes piece by piece, never holding it in memory.
+
+    The content is hashed and compressed into a temporary file as it is written,
+    then moved to its content address.
+
+    Args:
+        write (callable): Called with a text sink, e.g. ``lambda sink: write_xml_streaming(name, sink)``
+
+    Returns:
+        str: The content digest
+    """
+    tmp_path = _get_tmp_path()
+    try:
+        with _open_gzip(tmp_path) as gz:
+            sink = _HashingSink(gz)
+            write(sink)
+            sink.flush()
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    return _commit(tmp_path, sink.digest.hexdigest())
+
+
+def open_xml(digest):
+    """
+    Open a stored XML document for streaming.
+
+    Args:
+        digest (str): Content digest returned by put_xml
+
+    Returns:
+        gzip.GzipFile: Binary file object yielding the decompressed XML
+    """
+    return gzip.open(get_xml_path(digest), "rb")
+
+
+def has_xml(digest):
+    return bool(digest) and os.path.exists(get_xml_path(digest))
+
+
+class _HashingSink:
+    """Text sink that UTF-8 encodes, hashes and forwards writes in WRITE_CHUNK_SIZE blocks."""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= WRITE_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        data = "".join(self.parts).encode("utf-8")
+        self.digest.update(data)
+        self.f.write(data)
+        self.parts, self.size = [], 0
+
+
+def _get_tmp_path():
+    root = frappe.get_site_path("private", STORE_DIR)
+    os.makedirs(root, exist_ok=True)
+    return os.path.join(root, f"{frappe.generate_hash(length=16)}.tmp")
+
+
+def _open_gzip(path):
+    level = cint(frappe.conf.get("jofotara_xml_compress_level")) or DEFAULT_COMPRESS_LEVEL
+    return gzip.GzipFile(path, mode="wb", compresslevel=level, mtime=0)
+
+
+def _commit(tmp_path, digest):
+    """Move a finished temporary file to its content address, or drop it if that exists already."""
+    path = get_xml_path(digest)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return digest
+
+
+def get_xml_path(digest):
+    """Absolute path of a digest, e.g. ``private/jofotara_xml/ab/cd/abcd….xml.gz``."""
+    return frappe.get_site_path("private", STORE_DIR, digest[:2], digest[2:4], f"{digest}.xml.gz")
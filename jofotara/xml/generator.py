@@ -1,165 +1,491 @@
 import frappe
-import uuid
-from datetime import datetime
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from frappe.utils import getdate
+import hashlib
+import io
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+from frappe.utils import cint, getdate
 
-def generate_xml(sales_invoice):
+from jofotara.utils.company_config import get_company_config, get_company_configs
+from jofotara.utils.invoice_uuid import get_invoice_uuid
+from jofotara.utils.metrics import observe_generation
+from jofotara.utils.timing import span
+from jofotara.xml.writer import UBLWriter
+
+# Bump whenever a change to this module alters the generated XML, so cached documents are rebuilt
+GENERATOR_VERSION = 1
+
+# Invoices loaded per round of bulk queries in generate_xml_batch
+BATCH_CHUNK_SIZE = 500
+
+# Item rows fetched per query by write_xml_streaming
+ITEM_CHUNK_SIZE = 1000
+
+# Invoices with more lines are generated by write_xml_streaming, overridable with
+# `jofotara_streaming_line_threshold` in site config
+STREAMING_LINE_THRESHOLD = 5000
+
+# Rendered lines kept in memory by write_xml_streaming before spilling to a temporary file
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# Sales Invoice and Sales Invoice Item fields that end up in the XML
+HEADER_FIELDS = ("name", "company", "posting_date", "currency", "customer_name", "jofotara_uuid")
+ITEM_FIELDS = ("qty", "amount", "rate", "item_name")
+
+UBL_NAMESPACES = {
+    "xmlns": "urn:oasis:names:specification:ubl:schema:xsd:Invoice-2",
+    "xmlns:cac": "urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2",
+    "xmlns:cbc": "urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2",
+    "xmlns:ext": "urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2",
+}
+
+
+def generate_xml(sales_invoice, pretty=False):
     """
     Generate UBL 2.1 XML for JoFotara submission - Based on successful reference format
+
+    Args:
+        sales_invoice (Document | str): The Sales Invoice document or its name
+        pretty (bool): Indent the output, only meant for debugging and viewing
+
+    Returns:
+        str: The generated UBL XML string
+    """
+    sales_invoice = _get_invoice(sales_invoice)
+    company = get_company_config(sales_invoice.company)
+    return _render_timed(sales_invoice, company, pretty).decode("utf-8")
+
+
+def generate_xml_with_hash(sales_invoice, pretty=False, current_hash=None):
+    """
+    Generate UBL 2.1 XML together with the hash of its inputs.
+
+    The hash covers everything that ends up in the document: the invoice header
+    and item fields, the company config snapshot and GENERATOR_VERSION. It is
+    stored next to the digest of the saved file and computed before rendering,
+    so a document that would come out the same as the stored one is not
+    rendered at all.
+
+    Args:
+        sales_invoice (Document | str): The Sales Invoice document or its name
+        pretty (bool): Indent the output, only meant for debugging and viewing
+        current_hash (str): Input hash of the stored XML, if any
+
+    Returns:
+        tuple[bytes, str]: The generated UBL XML as UTF-8 bytes and its input hash.
+            The XML is None when the hash equals ``current_hash``.
+    """
+    sales_invoice = _get_invoice(sales_invoice)
+    company = get_company_config(sales_invoice.company)
+
+    # The UUID is part of the document, assign it before hashing
+    with span("hash", sales_invoice.name, company.company):
+        get_invoice_uuid(sales_invoice)
+        xml_hash = get_xml_hash(sales_invoice, sales_invoice.items, company, pretty)
+
+    if current_hash and xml_hash == current_hash:
+        return None, xml_hash
+    return _render_timed(sales_invoice, company, pretty), xml_hash
+
+
+def get_xml_hash(sales_invoice, items, company, pretty=False):
+    """
+    Hash the inputs that affect the XML of an invoice.
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256(
+        repr((
+            GENERATOR_VERSION,
+            pretty,
+            tuple(company),
+            [str(sales_invoice.get(field)) for field in HEADER_FIELDS],
+        )).encode("utf-8")
+    )
+    for item in items:
+        digest.update(repr([str(item.get(field)) for field in ITEM_FIELDS]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def generate_xml_batch(names, pretty=False, chunk_size=BATCH_CHUNK_SIZE, with_hash=False):
+    """
+    Generate UBL 2.1 XML for many Sales Invoices with bulk queries.
+
+    Invoices are loaded ``chunk_size`` at a time: one query for the headers, one
+    for their ``Sales Invoice Item`` rows and one for the companies whose settings
+    are not cached yet.
+    Only the current chunk is held in memory, so the batch size does not matter.
+
+    Args:
+        names (Iterable[str]): Sales Invoice names, consumed lazily
+        pretty (bool): Indent the output, only meant for debugging and viewing
+        chunk_size (int): Number of invoices loaded per round of queries
+        with_hash (bool): Also yield the input hash, see get_xml_hash
+
+    Yields:
+        tuple[str, bytes]: ``(name, xml)`` for every invoice that exists, or
+            ``(name, xml, xml_hash)`` with ``with_hash``
+    """
+    names = iter(names)
+
+    while chunk := list(islice(names, chunk_size)):
+        invoices = {
+            row.name: row
+            for row in frappe.get_all(
+                "Sales Invoice",
+                filters={"name": ["in", chunk]},
+                fields=list(HEADER_FIELDS),
+            )
+        }
+
+        items = defaultdict(list)
+        for row in frappe.get_all(
+            "Sales Invoice Item",
+            filters={"parenttype": "Sales Invoice", "parent": ["in", list(invoices)]},
+            fields=["parent", *ITEM_FIELDS],
+            order_by="parent asc, idx asc",
+        ):
+            items[row.parent].append(row)
+
+        companies = get_company_configs({row.company for row in invoices.values()})
+
+        for name in chunk:
+            invoice = invoices.get(name)
+            if not invoice:
+                continue
+
+            invoice_items = items.pop(name, [])
+            company = companies[invoice.company]
+            start = time.perf_counter()
+            xml = render_xml(invoice, invoice_items, company, pretty)
+            observe_generation(invoice.company, time.perf_counter() - start)
+
+            if with_hash:
+                # render_xml assigned the UUID, which the hash covers
+                yield name, xml, get_xml_hash(invoice, invoice_items, company, pretty)
+            else:
+                yield name, xml
+
+
+def render_xml(sales_invoice, items, company, pretty=False):
+    """
+    Render one invoice straight to UTF-8 bytes.
+
+    The writer's text goes through a TextIOWrapper that encodes it in blocks into
+    a BytesIO, so no str copy of the document is built and the result is the
+    buffer's own bytes object.
+
+    Args:
+        sales_invoice (Document | dict): Sales Invoice or its header row
+        items (list): Its item rows
+        company (CompanyConfig): Config of the invoice's company
+        pretty (bool): Indent the output, only meant for debugging and viewing
+
+    Returns:
+        bytes: The UBL XML
+    """
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    _write_invoice(sales_invoice, items, company, text, pretty)
+    # Flushes the last block and leaves the buffer open
+    text.detach()
+    return buffer.getvalue()
+
+
+def write_xml_streaming(sales_invoice, sink, pretty=False, chunk_size=ITEM_CHUNK_SIZE):
+    """
+    Stream UBL 2.1 XML into ``sink`` in constant memory, however many lines the invoice has.
+
+    Item rows are read ``chunk_size`` at a time and never loaded as a whole. The
+    totals precede the lines in the document, so lines are rendered into a
+    spool (kept in memory up to SPOOL_MAX_SIZE, then on disk) while the totals
+    are summed, and copied into ``sink`` after the header.
+
+    Args:
+        sales_invoice (dict | str): Sales Invoice header (HEADER_FIELDS) or its name
+        sink: Any object with a ``write(str)`` method
+        pretty (bool): Indent the output, only meant for debugging and viewing
+        chunk_size (int): Item rows per query
     """
     if isinstance(sales_invoice, str):
-        sales_invoice = frappe.get_doc("Sales Invoice", sales_invoice)
-    
-    # Create root element with proper namespaces (including ext namespace)
-    root = ET.Element("Invoice")
-    root.set("xmlns", "urn:oasis:names:specification:ubl:schema:xsd:Invoice-2")
-    root.set("xmlns:cac", "urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2")
-    root.set("xmlns:cbc", "urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2")
-    root.set("xmlns:ext", "urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2")
+        sales_invoice = frappe.db.get_value("Sales Invoice", sales_invoice, list(HEADER_FIELDS), as_dict=True)
 
-    # Get company
-    company = frappe.get_doc("Company", sales_invoice.company)
+    company = get_company_config(sales_invoice.company)
+    currency = {"currencyID": sales_invoice.currency}
 
-    # Basic invoice info
-    posting_date = getdate(sales_invoice.posting_date)
-    
-    # Use invoice type from reference (011 for freight/service invoices)
-    invoice_type_value = "388"  # Standard commercial invoice
-    
-    ET.SubElement(root, "cbc:ProfileID").text = "reporting:1.0"
-    ET.SubElement(root, "cbc:ID").text = sales_invoice.name
-    ET.SubElement(root, "cbc:UUID").text = str(uuid.uuid4())
-    ET.SubElement(root, "cbc:IssueDate").text = posting_date.strftime('%Y-%m-%d')
+    # newline="" keeps carriage returns in item names from being read back as line feeds
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+", encoding="utf-8", newline="") as spool:
+        lines = UBLWriter(spool, pretty=pretty)
+        lines.depth = 1
 
-    invoice_type_code = ET.SubElement(root, "cbc:InvoiceTypeCode")
-    invoice_type_code.set("name", "011")  # Changed to match reference
-    invoice_type_code.text = invoice_type_value
+        line_count, tax_exclusive_amount = 0, 0
+        for item in iter_items(sales_invoice.name, chunk_size):
+            line_count += 1
+            tax_exclusive_amount += item.amount
+            _write_line(lines, line_count, item, currency)
 
-    ET.SubElement(root, "cbc:Note").text = "NA"  # Added note as in reference
-    
-    # Use JOD currency code (JoFotara expects full code)
-    currency_code = sales_invoice.currency  # Keep original currency code
-    ET.SubElement(root, "cbc:DocumentCurrencyCode").text = currency_code
-    ET.SubElement(root, "cbc:TaxCurrencyCode").text = currency_code
+        w = UBLWriter(sink, pretty=pretty)
+        _write_header(w, sales_invoice, company, line_count, tax_exclusive_amount)
+        spool.seek(0)
+        shutil.copyfileobj(spool, sink)
+        w.end("Invoice")
 
-    # Add AdditionalDocumentReference (ICV) as in reference
-    additional_doc_ref = ET.SubElement(root, "cac:AdditionalDocumentReference")
-    ET.SubElement(additional_doc_ref, "cbc:ID").text = "ICV"
-    ET.SubElement(additional_doc_ref, "cbc:UUID").text = str(len(sales_invoice.items) + 1)
+
+def iter_items(sales_invoice, chunk_size=ITEM_CHUNK_SIZE):
+    """
+    Yield the XML fields of a Sales Invoice's item rows in order, ``chunk_size`` rows per query.
+
+    Pages are keyed on ``idx`` rather than an offset, so every query is as cheap as the first.
+    """
+    last_idx = 0
+    while True:
+        rows = frappe.get_all(
+            "Sales Invoice Item",
+            filters={"parenttype": "Sales Invoice", "parent": sales_invoice, "idx": [">", last_idx]},
+            fields=["idx", *ITEM_FIELDS],
+            order_by="idx asc",
+            limit=chunk_size,
+        )
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_idx = rows[-1].idx
+
+
+def use_streaming(sales_invoice):
+    """Whether a Sales Invoice has enough lines to be generated by write_xml_streaming."""
+    count = frappe.db.count("Sales Invoice Item", {"parenttype": "Sales Invoice", "parent": sales_invoice})
+    return count > get_streaming_threshold()
+
+
+def get_streaming_threshold():
+    """Line count above which an invoice is generated by write_xml_streaming."""
+    return cint(frappe.conf.get("jofotara_streaming_line_threshold")) or STREAMING_LINE_THRESHOLD
+
+
+def _get_invoice(sales_invoice):
+    if isinstance(sales_invoice, str):
+        with span("load", sales_invoice):
+            return frappe.get_doc("Sales Invoice", sales_invoice)
+    return sales_invoice
+
+
+def _render_timed(sales_invoice, company, pretty):
+    """render_xml of a loaded Sales Invoice, recorded in the generation metrics."""
+    with span("render", sales_invoice.name, company.company):
+        start = time.perf_counter()
+        xml = render_xml(sales_invoice, sales_invoice.items, company, pretty)
+    observe_generation(company.company, time.perf_counter() - start)
+    return xml
+
+
+@lru_cache(maxsize=256)
+def _get_company_fragments(company, pretty):
+    """
+    Pre-render the parts of the document that only depend on the company.
+
+    CompanyConfig is an immutable snapshot, so any settings change yields a new
+    key and the fragments are rendered again.
+
+    Returns:
+        tuple[str, str, str]: Declaration and root element up to ``cbc:ProfileID``;
+            the supplier party and the customer party up to its registration
+            name; the rest of the customer party and the seller supplier party
+    """
+    head = io.StringIO()
+    w = UBLWriter(head, pretty=pretty)
+    w.declaration()
+
+    # Create root element with proper namespaces (including ext namespace)
+    w.start("Invoice", UBL_NAMESPACES)
+    w.element("cbc:ProfileID", "reporting:1.0")
+
+    parties_start = io.StringIO()
+    w = UBLWriter(parties_start, pretty=pretty)
+    w.depth = 1
 
     # AccountingSupplierParty - Simplified structure like reference
-    supplier_party = ET.SubElement(root, "cac:AccountingSupplierParty")
-    supplier_party_elem = ET.SubElement(supplier_party, "cac:Party")
-    
+    w.start("cac:AccountingSupplierParty")
+    w.start("cac:Party")
+
     # Postal address - simplified
-    supplier_address = ET.SubElement(supplier_party_elem, "cac:PostalAddress")
-    supplier_country = ET.SubElement(supplier_address, "cac:Country")
-    ET.SubElement(supplier_country, "cbc:IdentificationCode").text = "JO"
-    
+    w.start("cac:PostalAddress")
+    w.start("cac:Country")
+    w.element("cbc:IdentificationCode", "JO")
+    w.end("cac:Country")
+    w.end("cac:PostalAddress")
+
     # Party tax scheme - seller tax number
     if company.tax_id:
         clean_tax_id = ''.join(filter(str.isdigit, company.tax_id))
         if clean_tax_id and len(clean_tax_id) <= 15:
-            supplier_tax = ET.SubElement(supplier_party_elem, "cac:PartyTaxScheme")
-            ET.SubElement(supplier_tax, "cbc:CompanyID").text = clean_tax_id
-            supplier_tax_scheme = ET.SubElement(supplier_tax, "cac:TaxScheme")
-            ET.SubElement(supplier_tax_scheme, "cbc:ID").text = "VAT"
-    
+            w.start("cac:PartyTaxScheme")
+            w.element("cbc:CompanyID", clean_tax_id)
+            w.start("cac:TaxScheme")
+            w.element("cbc:ID", "VAT")
+            w.end("cac:TaxScheme")
+            w.end("cac:PartyTaxScheme")
+
     # Party legal entity
-    supplier_legal = ET.SubElement(supplier_party_elem, "cac:PartyLegalEntity")
-    ET.SubElement(supplier_legal, "cbc:RegistrationName").text = company.company_name
+    w.start("cac:PartyLegalEntity")
+    w.element("cbc:RegistrationName", company.company_name)
+    w.end("cac:PartyLegalEntity")
+    w.end("cac:Party")
+    w.end("cac:AccountingSupplierParty")
 
     # AccountingCustomerParty - Following reference structure
-    customer_party = ET.SubElement(root, "cac:AccountingCustomerParty")
-    customer_party_elem = ET.SubElement(customer_party, "cac:Party")
-    
+    w.start("cac:AccountingCustomerParty")
+    w.start("cac:Party")
+
     # Customer party identification
-    customer_id = ET.SubElement(customer_party_elem, "cac:PartyIdentification")
-    ET.SubElement(customer_id, "cbc:ID", {"schemeID": "TN"}).text = "0"
-    
+    w.start("cac:PartyIdentification")
+    w.element("cbc:ID", "0", {"schemeID": "TN"})
+    w.end("cac:PartyIdentification")
+
     # Customer postal address
-    customer_address = ET.SubElement(customer_party_elem, "cac:PostalAddress")
-    ET.SubElement(customer_address, "cbc:PostalZone").text = "0"
-    ET.SubElement(customer_address, "cbc:CountrySubentityCode").text = "JO-AM"
-    customer_country = ET.SubElement(customer_address, "cac:Country")
-    ET.SubElement(customer_country, "cbc:IdentificationCode").text = "JO"
-    
+    w.start("cac:PostalAddress")
+    w.element("cbc:PostalZone", "0")
+    w.element("cbc:CountrySubentityCode", "JO-AM")
+    w.start("cac:Country")
+    w.element("cbc:IdentificationCode", "JO")
+    w.end("cac:Country")
+    w.end("cac:PostalAddress")
+
     # Customer tax scheme
-    customer_tax = ET.SubElement(customer_party_elem, "cac:PartyTaxScheme")
-    customer_tax_scheme = ET.SubElement(customer_tax, "cac:TaxScheme")
-    ET.SubElement(customer_tax_scheme, "cbc:ID").text = "VAT"
-    
+    w.start("cac:PartyTaxScheme")
+    w.start("cac:TaxScheme")
+    w.element("cbc:ID", "VAT")
+    w.end("cac:TaxScheme")
+    w.end("cac:PartyTaxScheme")
+
     # Customer legal entity
-    customer_legal = ET.SubElement(customer_party_elem, "cac:PartyLegalEntity")
-    ET.SubElement(customer_legal, "cbc:RegistrationName").text = sales_invoice.customer_name
+    w.start("cac:PartyLegalEntity")
+
+    parties_end = io.StringIO()
+    w = UBLWriter(parties_end, pretty=pretty)
+    w.depth = 4
+    w.end("cac:PartyLegalEntity")
+    w.end("cac:Party")
     
     # Customer contact
-    customer_contact = ET.SubElement(customer_party, "cac:AccountingContact")
-    ET.SubElement(customer_contact, "cbc:Telephone").text = "0"
+    w.start("cac:AccountingContact")
+    w.element("cbc:Telephone", "0")
+    w.end("cac:AccountingContact")
+    w.end("cac:AccountingCustomerParty")
 
     # SellerSupplierParty - This is where the activity number goes!
-    seller_supplier = ET.SubElement(root, "cac:SellerSupplierParty")
-    seller_supplier_party = ET.SubElement(seller_supplier, "cac:Party")
-    seller_supplier_id = ET.SubElement(seller_supplier_party, "cac:PartyIdentification")
+    w.start("cac:SellerSupplierParty")
+    w.start("cac:Party")
+    w.start("cac:PartyIdentification")
     
     # Activity number goes here - try the tax ID from reference XML
-    activity_number = getattr(company, 'jofotara_activity_number', None) or "40245896"  # Tax ID from reference XML
+    activity_number = company.activity_number or "40245896"  # Tax ID from reference XML
     activity_number = ''.join(filter(str.isdigit, activity_number))[:15]
-    ET.SubElement(seller_supplier_id, "cbc:ID").text = activity_number
+    w.element("cbc:ID", activity_number)
+    w.end("cac:PartyIdentification")
+    w.end("cac:Party")
+    w.end("cac:SellerSupplierParty")
+
+    return head.getvalue(), parties_start.getvalue(), parties_end.getvalue()
+
+
+def _write_invoice(sales_invoice, items, company, sink, pretty):
+    w = UBLWriter(sink, pretty=pretty)
+    _write_header(w, sales_invoice, company, len(items), sum(item.amount for item in items))
+
+    currency = {"currencyID": sales_invoice.currency}
+    for idx, item in enumerate(items, 1):
+        _write_line(w, idx, item, currency)
+
+    w.end("Invoice")
+
+
+def _write_header(w, sales_invoice, company, line_count, tax_exclusive_amount):
+    """Everything before the first InvoiceLine, leaving the root element open."""
+    head, parties_start, parties_end = _get_company_fragments(company, w.pretty)
+    w.raw(head, depth=1)
+
+    # Basic invoice info
+    posting_date = getdate(sales_invoice.posting_date)
+    
+    # Use invoice type from reference (011 for freight/service invoices)
+    invoice_type_value = "388"  # Standard commercial invoice
+    
+    w.element("cbc:ID", sales_invoice.name)
+    w.element("cbc:UUID", get_invoice_uuid(sales_invoice))
+    w.element("cbc:IssueDate", posting_date.strftime('%Y-%m-%d'))
+    w.element("cbc:InvoiceTypeCode", invoice_type_value, {"name": "011"})  # Changed to match reference
+    w.element("cbc:Note", "NA")  # Added note as in reference
+    
+    # Use JOD currency code (JoFotara expects full code)
+    currency_code = sales_invoice.currency  # Keep original currency code
+    currency = {"currencyID": currency_code}
+    w.element("cbc:DocumentCurrencyCode", currency_code)
+    w.element("cbc:TaxCurrencyCode", currency_code)
+
+    # Add AdditionalDocumentReference (ICV) as in reference
+    w.start("cac:AdditionalDocumentReference")
+    w.element("cbc:ID", "ICV")
+    w.element("cbc:UUID", str(line_count + 1))
+    w.end("cac:AdditionalDocumentReference")
+
+    # Company parties are pre-rendered, only the customer name is invoice specific
+    w.raw(parties_start, depth=4)
+    w.element("cbc:RegistrationName", sales_invoice.customer_name)
+    w.raw(parties_end, depth=1)
 
     # AllowanceCharge - As in reference
-    allowance_charge = ET.SubElement(root, "cac:AllowanceCharge")
-    ET.SubElement(allowance_charge, "cbc:ChargeIndicator").text = "false"
-    ET.SubElement(allowance_charge, "cbc:AllowanceChargeReason").text = "discount"
-    ET.SubElement(allowance_charge, "cbc:Amount", {"currencyID": currency_code}).text = "0.0"
+    w.start("cac:AllowanceCharge")
+    w.element("cbc:ChargeIndicator", "false")
+    w.element("cbc:AllowanceChargeReason", "discount")
+    w.element("cbc:Amount", "0.0", currency)
+    w.end("cac:AllowanceCharge")
 
     # LegalMonetaryTotal - Following reference structure exactly (no taxes for JoFotara)
     # Based on successful reference, all amounts should be equal (tax-exempt treatment)
-    tax_exclusive_amount = sum(item.amount for item in sales_invoice.items)
-    
     # For JoFotara, treat as tax-exempt - all amounts equal
     tax_inclusive_amount = tax_exclusive_amount
     payable_amount = tax_exclusive_amount
     
-    monetary_total = ET.SubElement(root, "cac:LegalMonetaryTotal")
-    ET.SubElement(monetary_total, "cbc:TaxExclusiveAmount", {"currencyID": currency_code}).text = f"{tax_exclusive_amount:.1f}"
-    ET.SubElement(monetary_total, "cbc:TaxInclusiveAmount", {"currencyID": currency_code}).text = f"{tax_inclusive_amount:.1f}"
-    ET.SubElement(monetary_total, "cbc:AllowanceTotalAmount", {"currencyID": currency_code}).text = "0.0"
-    ET.SubElement(monetary_total, "cbc:PrepaidAmount", {"currencyID": currency_code}).text = "0"
-    ET.SubElement(monetary_total, "cbc:PayableAmount", {"currencyID": currency_code}).text = f"{payable_amount:.1f}"
+    w.start("cac:LegalMonetaryTotal")
+    w.element("cbc:TaxExclusiveAmount", f"{tax_exclusive_amount:.1f}", currency)
+    w.element("cbc:TaxInclusiveAmount", f"{tax_inclusive_amount:.1f}", currency)
+    w.element("cbc:AllowanceTotalAmount", "0.0", currency)
+    w.element("cbc:PrepaidAmount", "0", currency)
+    w.element("cbc:PayableAmount", f"{payable_amount:.1f}", currency)
+    w.end("cac:LegalMonetaryTotal")
 
+
+def _write_line(w, idx, item, currency):
     # InvoiceLine - Following reference structure (no tax elements!)
-    for idx, item in enumerate(sales_invoice.items, 1):
-        invoice_line = ET.SubElement(root, "cac:InvoiceLine")
-        ET.SubElement(invoice_line, "cbc:ID").text = str(idx)
-        ET.SubElement(invoice_line, "cbc:InvoicedQuantity", {"unitCode": "PCE"}).text = f"{item.qty:.1f}"
-        ET.SubElement(invoice_line, "cbc:LineExtensionAmount", {"currencyID": currency_code}).text = f"{item.amount:.1f}"
-        
-        # Item
-        item_elem = ET.SubElement(invoice_line, "cac:Item")
-        ET.SubElement(item_elem, "cbc:Name").text = item.item_name
-        
-        # Price with allowance charge
-        price_elem = ET.SubElement(invoice_line, "cac:Price")
-        ET.SubElement(price_elem, "cbc:PriceAmount", {"currencyID": currency_code}).text = f"{item.rate:.1f}"
-        
-        price_allowance = ET.SubElement(price_elem, "cac:AllowanceCharge")
-        ET.SubElement(price_allowance, "cbc:ChargeIndicator").text = "false"
-        ET.SubElement(price_allowance, "cbc:AllowanceChargeReason").text = "DISCOUNT"
-        ET.SubElement(price_allowance, "cbc:Amount", {"currencyID": currency_code}).text = "0.0"
-
-    # Format XML
-    rough_string = ET.tostring(root, 'utf-8')
-    reparsed = minidom.parseString(rough_string)
-    pretty_xml = '\n'.join(line for line in reparsed.toprettyxml(indent="  ").split('\n') if line.strip())
-
-    return pretty_xml
-
-
-def generate_jofotara_invoice_xml(sales_invoice):
+    w.start("cac:InvoiceLine")
+    w.element("cbc:ID", str(idx))
+    w.element("cbc:InvoicedQuantity", f"{item.qty:.1f}", {"unitCode": "PCE"})
+    w.element("cbc:LineExtensionAmount", f"{item.amount:.1f}", currency)
+    
+    # Item
+    w.start("cac:Item")
+    w.element("cbc:Name", item.item_name)
+    w.end("cac:Item")
+    
+    # Price with allowance charge
+    w.start("cac:Price")
+    w.element("cbc:PriceAmount", f"{item.rate:.1f}", currency)
+    w.start("cac:AllowanceCharge")
+    w.element("cbc:ChargeIndicator", "false")
+    w.element("cbc:AllowanceChargeReason", "DISCOUNT")
+    w.element("cbc:Amount", "0.0", currency)
+    w.end("cac:AllowanceCharge")
+    w.end("cac:Price")
+    w.end("cac:InvoiceLine")
+
+
+def generate_jofotara_invoice_xml(sales_invoice, pretty=False):
     """
     Legacy function name for backward compatibility
     """
-    return generate_xml(sales_invoice)
+    return generate_xml(sales_invoice, pretty=pretty)
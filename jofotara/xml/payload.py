@@ -0,0 +1,60 @@
+import base64
+
+# Bytes read per step when an encoder is given a file object, a multiple of 3 so base64 chunks concatenate
+READ_CHUNK_SIZE = 3 * 16 * 1024
+
+# The JSON body around the base64 text, pre-encoded; base64 never needs JSON escaping
+ENVELOPE_START = b'{"invoice": "'
+ENVELOPE_END = b'"}'
+
+
+class Base64JSONEncoder:
+    """
+    JoFotara core API format: ``{"invoice": "<base64 XML>"}`` sent as JSON.
+
+    The body is assembled from bytes by a single join of the pre-encoded
+    envelope and the base64 output, so the XML is copied once into base64 and
+    once into the body, with no str round trip or JSON serialization.
+    """
+
+    content_type = "application/json"
+
+    def encode(self, xml):
+        if hasattr(xml, "read"):
+            # Base64 is streamed chunk by chunk, the decoded XML is never held in memory
+            encoded = [base64.b64encode(chunk) for chunk in _read_chunks(xml)]
+        else:
+            if isinstance(xml, str):
+                xml = xml.encode("utf-8")
+            encoded = [base64.b64encode(xml)]
+        return b"".join([ENVELOPE_START, *encoded, ENVELOPE_END])
+
+
+class RawXMLEncoder:
+    """Legacy format: the XML document itself is the request body."""
+
+    content_type = "application/xml"
+
+    def encode(self, xml):
+        if hasattr(xml, "read"):
+            return xml.read()
+        if isinstance(xml, str):
+            xml = xml.encode("utf-8")
+        return xml
+
+
+BASE64_JSON = Base64JSONEncoder()
+RAW_XML = RawXMLEncoder()
+
+
+def _read_chunks(f):
+    """Read a binary file object in READ_CHUNK_SIZE chunks, only the last one may be shorter."""
+    buffer = b""
+    while chunk := f.read(READ_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) >= READ_CHUNK_SIZE:
+            size = len(buffer) - len(buffer) % 3
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
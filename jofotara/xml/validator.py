@@ -0,0 +1,319 @@
+import io
+import re
+from functools import lru_cache
+from xml.etree import ElementTree
+
+import frappe
+from frappe.utils import cint
+
+# Longest seller tax number JoFotara accepts, the generator drops longer ones
+TAX_ID_MAX_LENGTH = 15
+
+# Documents up to this size are parsed in one go; larger ones and files are read
+# with iterparse, which is slower per element but keeps memory flat
+PARSE_MAX_SIZE = 1024 * 1024
+
+# Errors reported per document, a bad many-line invoice would otherwise produce one per line
+MAX_ERRORS = 20
+
+# Redis key of the site's currency codes, cleared whenever a Currency is saved, renamed or deleted
+CURRENCY_CODES_CACHE_KEY = "jofotara_currency_codes"
+
+CURRENCY_CODE = re.compile(r"[A-Z]{3}")
+DIGITS = re.compile(r"[0-9]+")
+
+INV = "{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}"
+CAC = "{urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2}"
+CBC = "{urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2}"
+
+
+def preflight(xml):
+    """
+    Validate an invoice before it is sent, unless ``jofotara_preflight_validation: 0`` is set in site config.
+
+    Args:
+        xml (str | bytes | file): The generated UBL XML, or a seekable binary
+            file object, which is rewound afterwards
+
+    Returns:
+        list[str]: Validation errors, empty if the invoice can be sent
+    """
+    if not cint(frappe.conf.get("jofotara_preflight_validation", 1)):
+        return []
+
+    errors = validate_xml(xml)
+    if hasattr(xml, "seek"):
+        xml.seek(0)
+    return errors
+
+
+def validate_xml(xml):
+    """
+    Check a generated invoice against the UBL 2.1 Invoice schema and the JoFotara business rules.
+
+    Documents above PARSE_MAX_SIZE and file objects are read with iterparse and
+    every top-level element is dropped once checked, so memory use does not
+    depend on the number of lines. The schema is only checked when
+    ``jofotara_ubl_xsd_path`` is set, see get_schema.
+
+    Rules:
+        - the seller tax number is present, digits only and at most TAX_ID_MAX_LENGTH long
+        - the activity number (seller supplier party ID) is present and digits only
+        - document, tax and amount currencies are one known currency code
+        - line amounts match quantity times price, the tax exclusive amount
+          matches the sum of the lines, and the payable amount matches the tax
+          inclusive amount less the prepaid amount, within the rounding of the
+          printed amounts
+
+    Args:
+        xml (str | bytes | file): The generated UBL XML, or a binary file object
+
+    Returns:
+        list[str]: Validation errors, empty if the invoice is valid
+    """
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+
+    checker = _InvoiceChecker(get_currency_codes())
+    schema = get_schema()
+    try:
+        if hasattr(xml, "read") or len(xml) > PARSE_MAX_SIZE:
+            source = xml if hasattr(xml, "read") else io.BytesIO(xml)
+            checker.feed(_iterparse(source, schema))
+        else:
+            checker.check_root(_parse(xml, schema))
+    except SyntaxError as e:
+        # ElementTree's ParseError and lxml's XMLSyntaxError, which also covers schema violations
+        return [f"Invalid XML: {e}"]
+
+    return checker.finish()
+
+
+def _parse(xml, schema):
+    if schema is None:
+        return ElementTree.fromstring(xml)
+
+    from lxml import etree
+
+    return etree.fromstring(xml, etree.XMLParser(schema=schema))
+
+
+def _iterparse(source, schema):
+    if schema is None:
+        return ElementTree.iterparse(source, events=("start", "end"))
+
+    from lxml import etree
+
+    return etree.iterparse(source, events=("start", "end"), schema=schema)
+
+
+def validate_batch(names, chunk_size=None):
+    """
+    Generate and validate many Sales Invoices without sending anything.
+
+    XML is generated with bulk queries by generate_xml_batch and checked in the
+    same pass, so bad invoices can be filtered out before a bulk submission.
+
+    Args:
+        names (Iterable[str]): Sales Invoice names, consumed lazily
+        chunk_size (int): Invoices generated per round of queries
+
+    Yields:
+        tuple[str, list[str]]: ``(name, errors)`` for every invoice that exists
+    """
+    from jofotara.xml.generator import BATCH_CHUNK_SIZE, generate_xml_batch
+
+    for name, xml in generate_xml_batch(names, chunk_size=chunk_size or BATCH_CHUNK_SIZE):
+        yield name, validate_xml(xml)
+
+
+def get_schema():
+    """
+    Get the compiled UBL 2.1 Invoice schema, or None when no schema is configured.
+
+    Set ``jofotara_ubl_xsd_path`` in site config to ``maindoc/UBL-Invoice-2.1.xsd``
+    of the unpacked OASIS UBL 2.1 distribution; the files it imports are
+    resolved relative to it. Checking the schema needs lxml. The schema is
+    compiled once per process and path.
+    """
+    path = frappe.conf.get("jofotara_ubl_xsd_path")
+    return _load_schema(path) if path else None
+
+
+@lru_cache(maxsize=4)
+def _load_schema(path):
+    try:
+        from lxml import etree
+    except ImportError:
+        # Logged once per process, the business rules are still checked
+        frappe.logger("jofotara").error("jofotara_ubl_xsd_path is set but lxml is not installed, skipping the UBL schema")
+        return None
+
+    return etree.XMLSchema(etree.parse(path))
+
+
+def get_currency_codes():
+    """Codes of the site's Currency records, cached in Redis and per request."""
+    return frappe.cache().get_value(
+        CURRENCY_CODES_CACHE_KEY, generator=lambda: frappe.get_all("Currency", pluck="name")
+    )
+
+
+def clear_currency_codes():
+    """Drop the cached currency codes, every worker reloads them on its next validation."""
+    frappe.cache().delete_value(CURRENCY_CODES_CACHE_KEY)
+
+
+class _InvoiceChecker:
+    """Business rules applied to the top-level elements of an Invoice as they are parsed."""
+
+    def __init__(self, currencies):
+        self.currencies = set(currencies or ())
+        self.errors = []
+        self.currency = None
+        self.line_count = 0
+        self.line_total = 0.0
+        self.line_rounding = 0.0
+        self.totals = {}
+        self.seen = set()
+
+    def check_root(self, root):
+        self.check_tag(root)
+        for elem in root:
+            self.check(elem)
+
+    def feed(self, events):
+        """Check the top-level elements of ``(event, element)`` pairs from iterparse as they end."""
+        depth = 0
+        root = None
+        for event, elem in events:
+            if event == "start":
+                if depth == 0:
+                    root = elem
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1:
+                self.check(elem)
+                # Only the checked values are kept, not the tree
+                root.remove(elem)
+            elif depth == 0:
+                self.check_tag(elem)
+
+    def check_tag(self, root):
+        if root.tag != f"{INV}Invoice":
+            self.error(f"Root element is {root.tag}, not a UBL Invoice")
+
+    def check(self, elem):
+        tag = elem.tag
+        self.seen.add(tag)
+        if tag == f"{CBC}DocumentCurrencyCode":
+            self.currency = elem.text
+            if not CURRENCY_CODE.fullmatch(elem.text or "") or (self.currencies and elem.text not in self.currencies):
+                self.error(f"Unknown currency code {elem.text!r}")
+        elif tag == f"{CBC}TaxCurrencyCode":
+            self.check_currency(elem.text, "TaxCurrencyCode")
+        elif tag == f"{CAC}AccountingSupplierParty":
+            tax_id = elem.findtext(f"{CAC}Party/{CAC}PartyTaxScheme/{CBC}CompanyID")
+            if not tax_id:
+                self.error("Seller tax number is missing")
+            elif not DIGITS.fullmatch(tax_id) or len(tax_id) > TAX_ID_MAX_LENGTH:
+                self.error(f"Seller tax number {tax_id!r} must be up to {TAX_ID_MAX_LENGTH} digits")
+        elif tag == f"{CAC}SellerSupplierParty":
+            activity_number = elem.findtext(f"{CAC}Party/{CAC}PartyIdentification/{CBC}ID")
+            if not DIGITS.fullmatch(activity_number or ""):
+                self.error(f"Activity number {activity_number!r} must be digits only")
+        elif tag == f"{CAC}AllowanceCharge":
+            self.check_amount_currencies(elem)
+        elif tag == f"{CAC}LegalMonetaryTotal":
+            self.check_amount_currencies(elem)
+            self.check_totals(elem)
+        elif tag == f"{CAC}InvoiceLine":
+            self.check_line(elem)
+
+    def check_line(self, elem):
+        self.line_count += 1
+        line_id = elem.findtext(f"{CBC}ID") or self.line_count
+        self.check_amount_currencies(elem)
+
+        qty = self.amount(elem, f"{CBC}InvoicedQuantity", f"Line {line_id}")
+        amount = self.amount(elem, f"{CBC}LineExtensionAmount", f"Line {line_id}")
+        price = self.amount(elem, f"{CAC}Price/{CBC}PriceAmount", f"Line {line_id}")
+        if None in (qty, amount, price):
+            return
+
+        (qty, qty_unit), (amount, amount_unit), (price, price_unit) = qty, amount, price
+        self.line_total += amount
+        self.line_rounding += amount_unit
+        tolerance = abs(qty) * price_unit + abs(price) * qty_unit + qty_unit * price_unit + amount_unit
+        if abs(qty * price - amount) > tolerance:
+            self.error(f"Line {line_id}: amount {amount} does not match quantity {qty} times price {price}")
+
+    def check_totals(self, elem):
+        """Keep the document totals, they are compared with the lines in finish."""
+        for field in ("TaxExclusiveAmount", "TaxInclusiveAmount", "PrepaidAmount", "PayableAmount"):
+            value = self.amount(elem, f"{CBC}{field}", "LegalMonetaryTotal")
+            if value is not None:
+                self.totals[field] = value
+
+    def check_amount_currencies(self, elem):
+        for child in elem.iter():
+            currency = child.get("currencyID")
+            if currency is not None:
+                self.check_currency(currency, f"{child.tag.rpartition('}')[2]} currencyID")
+
+    def check_currency(self, currency, where):
+        if self.currency is not None and currency != self.currency:
+            self.error(f"{where} {currency!r} differs from the document currency {self.currency!r}")
+
+    def amount(self, elem, path, where):
+        """
+        Returns:
+            tuple[float, float]: The number and half a unit of its last printed digit, or None if invalid
+        """
+        text = elem.findtext(path)
+        name = path.rpartition("}")[2]
+        if not text:
+            self.error(f"{where}: {name} is missing")
+            return None
+        try:
+            value = float(text)
+        except ValueError:
+            self.error(f"{where}: {name} {text!r} is not a number")
+            return None
+        decimals = len(text.partition(".")[2])
+        return value, 0.5 * 10 ** -decimals
+
+    def error(self, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    def finish(self):
+        """Check what can only be checked once the whole document is read."""
+        for tag, label in (
+            (f"{CBC}DocumentCurrencyCode", "DocumentCurrencyCode"),
+            (f"{CAC}AccountingSupplierParty", "AccountingSupplierParty"),
+            (f"{CAC}SellerSupplierParty", "SellerSupplierParty (activity number)"),
+            (f"{CAC}LegalMonetaryTotal", "LegalMonetaryTotal"),
+        ):
+            if tag not in self.seen:
+                self.error(f"{label} is missing")
+
+        if not self.line_count:
+            self.error("Invoice has no lines")
+
+        if len(self.totals) == 4:
+            exclusive, exclusive_unit = self.totals["TaxExclusiveAmount"]
+            inclusive, inclusive_unit = self.totals["TaxInclusiveAmount"]
+            prepaid, prepaid_unit = self.totals["PrepaidAmount"]
+            payable, payable_unit = self.totals["PayableAmount"]
+
+            if abs(exclusive - self.line_total) > exclusive_unit + self.line_rounding:
+                self.error(f"TaxExclusiveAmount {exclusive} does not match the sum of the lines {self.line_total:.3f}")
+            if inclusive < exclusive - exclusive_unit - inclusive_unit:
+                self.error(f"TaxInclusiveAmount {inclusive} is less than TaxExclusiveAmount {exclusive}")
+            if abs(inclusive - prepaid - payable) > inclusive_unit + prepaid_unit + payable_unit:
+                self.error(f"PayableAmount {payable} does not match TaxInclusiveAmount {inclusive} less PrepaidAmount {prepaid}")
+
+        return self.errors
@@ -0,0 +1,71 @@
+from xml.sax.saxutils import escape
+
+# Entities on top of the &, < and > handled by escape(); quotes are escaped in text
+# too so the output matches what minidom used to produce
+TEXT_ENTITIES = {'"': "&quot;"}
+ATTRIBUTE_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+
+
+class UBLWriter:
+    """
+    Single-pass XML writer for UBL 2.1 documents.
+
+    Elements are escaped and written straight into ``sink`` (any object with a
+    ``write(str)`` method, e.g. ``io.StringIO`` or an open text file) instead of
+    building an ElementTree first. With ``pretty=True`` the elements are laid out
+    line for line as the old minidom ``toprettyxml`` round trip did, which is only
+    meant for debugging and viewing. The XML declaration differs: minidom wrote
+    ``<?xml version="1.0" ?>``, this one names the UTF-8 encoding the document is
+    sent in.
+    """
+
+    def __init__(self, sink, pretty=False, indent="  "):
+        self._write = sink.write
+        self.pretty = pretty
+        self.indent = indent
+        self.depth = 0
+
+    def declaration(self):
+        self._line('<?xml version="1.0" encoding="UTF-8"?>')
+
+    def start(self, tag, attrib=None):
+        """Open ``tag``; every call must be matched by ``end(tag)``."""
+        self._line(f"<{tag}{self._attributes(attrib)}>")
+        self.depth += 1
+
+    def end(self, tag):
+        self.depth -= 1
+        self._line(f"</{tag}>")
+
+    def element(self, tag, text=None, attrib=None):
+        """Write a leaf element; empty text produces a self-closing tag like minidom does."""
+        if text is None or text == "":
+            self._line(f"<{tag}{self._attributes(attrib)}/>")
+        else:
+            self._line(f"<{tag}{self._attributes(attrib)}>{escape(str(text), TEXT_ENTITIES)}</{tag}>")
+
+    def raw(self, fragment, depth=None):
+        """
+        Write an already rendered and escaped fragment as-is.
+
+        Args:
+            fragment (str): Markup rendered at the current depth with the same ``pretty`` setting
+            depth (int): Nesting depth after the fragment, if it leaves elements open or closes them
+        """
+        self._write(fragment)
+        if depth is not None:
+            self.depth = depth
+
+    def _line(self, markup):
+        if self.pretty:
+            self._write(f"{self.indent * self.depth}{markup}\n")
+        else:
+            self._write(markup)
+
+    @staticmethod
+    def _attributes(attrib):
+        if not attrib:
+            return ""
+        return "".join(
+            f' {name}="{escape(str(value), ATTRIBUTE_ENTITIES)}"' for name, value in attrib.items()
+        )